@@ -1,8 +1,466 @@
+import asyncio
+import hashlib
 import httpx
 import json
-from typing import Dict, Any, List
+import importlib.util
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, AsyncIterator
 from config import settings
-from unit_kerja_service import unit_kerja_service
+from unit_kerja_service import unit_kerja_service, UnitCatalog
+from unit_router import unit_similarity_index
+from token_usage import token_usage
+from metrics import arkmodel_request_duration, arkmodel_queue_wait, arkmodel_responses, arkmodel_retries, arkmodel_tokens
+from tracing import tracer, SPAN_KIND_CLIENT
+
+class HTTPClientManager:
+    """Mengelola satu httpx.AsyncClient bersama (connection pool) per proses"""
+    
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """Membuat AsyncClient dengan keep-alive dan limit dari Settings"""
+        # HTTP/2 hanya bisa dipakai jika package h2 terinstall
+        self._http2 = settings.arkmodel_http2 and importlib.util.find_spec("h2") is not None
+        limits = httpx.Limits(
+            max_connections=settings.arkmodel_max_connections,
+            max_keepalive_connections=settings.arkmodel_max_keepalive_connections,
+            keepalive_expiry=settings.arkmodel_keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            http2=self._http2,
+            limits=limits,
+            timeout=settings.arkmodel_timeout
+        )
+    
+    async def start(self):
+        """Buat client saat startup aplikasi"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+    
+    async def close(self):
+        """Tutup client saat shutdown aplikasi"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+    
+    def get_client(self) -> httpx.AsyncClient:
+        """Get shared client (dibuat lazily jika startup belum dijalankan)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistik connection pool: koneksi terbuka, idle dan request yang menunggu"""
+        if self._client is None or self._client.is_closed:
+            return {
+                "status": "closed",
+                "open_connections": 0,
+                "idle_connections": 0,
+                "waiting_requests": 0
+            }
+        
+        # httpx tidak mengekspos statistik pool secara publik, ambil dari internal httpcore.
+        # Atribut internal bisa berubah antar versi: jika tidak ada, statistik pool dilaporkan tidak tersedia
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        open_connections = idle_connections = waiting = 0
+        try:
+            connections = list(getattr(pool, "connections", None) or [])
+            open_connections = len(connections)
+            idle_connections = sum(1 for conn in connections if getattr(conn, "is_idle", lambda: False)())
+            for pool_request in list(getattr(pool, "_requests", None) or []):
+                if hasattr(pool_request, "is_queued"):
+                    waiting += 1 if pool_request.is_queued() else 0
+                elif getattr(pool_request, "connection", None) is None:
+                    waiting += 1
+        except Exception as e:
+            print(f"Error reading HTTP pool stats: {e}")
+            pool = None
+        
+        return {
+            "status": "open",
+            "http2": self._http2,
+            "pool_stats_available": pool is not None,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "waiting_requests": waiting,
+            "max_connections": settings.arkmodel_max_connections,
+            "max_keepalive_connections": settings.arkmodel_max_keepalive_connections
+        }
+
+# Global instance
+http_client_manager = HTTPClientManager()
+
+class SingleFlight:
+    """Menggabungkan request identik yang sedang berjalan menjadi satu panggilan upstream"""
+    
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def make_key(self, endpoint: str, payload: Dict[str, Any]) -> str:
+        """Key dari endpoint dan payload yang diserialisasi secara deterministik"""
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{endpoint}\x1f{serialized}".encode("utf-8")).hexdigest()
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Jalankan fn sekali untuk semua pemanggil dengan key yang sama"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        
+        # Shield agar pembatalan satu pemanggil tidak membatalkan pemanggil lain
+        return await asyncio.shield(task)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.arkmodel_single_flight,
+            "in_flight": len(self._in_flight),
+            "upstream_calls": self.leaders,
+            "coalesced_requests": self.coalesced
+        }
+
+# Global instance
+single_flight = SingleFlight()
+
+class TokenBucket:
+    """Token bucket per menit; kapasitas sama dengan kuota per menit (burst maksimal satu menit)"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def time_until(self, amount: float) -> float:
+        """Detik sampai amount token tersedia (0 jika sudah tersedia)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+    
+    def adjust(self, amount: float):
+        """Koreksi setelah pemakaian sebenarnya diketahui (positif = kembalikan token); boleh negatif"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateGovernor:
+    """
+    Pembatas request ke ArkModel: token bucket RPM dan TPM (estimasi) serta batas request in-flight.
+    Pemanggil mengantre FIFO sampai ARKMODEL_QUEUE_TIMEOUT, bukan langsung gagal karena kuota upstream.
+    """
+    
+    # Estimasi kasar jumlah token dari panjang karakter prompt
+    CHARS_PER_TOKEN = 4
+    
+    def __init__(self, rpm_limit: int, tpm_limit: int, max_in_flight: int, queue_timeout: float):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.rpm_bucket = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self.tpm_bucket = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        # asyncio.Lock membangunkan waiter secara FIFO: hanya kepala antrean yang menunggu bucket
+        self._bucket_lock = asyncio.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.throttled = 0
+    
+    def estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Token prompt (estimasi dari jumlah karakter) ditambah max_tokens output"""
+        chars = sum(len(message.get("content") or "") for message in payload.get("messages", []))
+        return chars // self.CHARS_PER_TOKEN + int(payload.get("max_tokens") or 0)
+    
+    async def _wait_buckets(self, estimated_tokens: int, deadline: float):
+        async with self._bucket_lock:
+            while True:
+                wait = 0.0
+                if self.rpm_bucket is not None:
+                    wait = max(wait, self.rpm_bucket.time_until(1))
+                if self.tpm_bucket is not None:
+                    wait = max(wait, self.tpm_bucket.time_until(estimated_tokens))
+                if wait <= 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    raise asyncio.TimeoutError()
+                self.throttled += 1
+                await asyncio.sleep(wait)
+            
+            if self.rpm_bucket is not None:
+                self.rpm_bucket.take(1)
+            if self.tpm_bucket is not None:
+                self.tpm_bucket.take(estimated_tokens)
+    
+    async def acquire(self, estimated_tokens: int):
+        """Tunggu slot in-flight dan kuota bucket, atau raise jika melewati deadline antrean"""
+        start_time = time.monotonic()
+        deadline = start_time + self.queue_timeout
+        self.waiting += 1
+        holding_slot = False
+        try:
+            if self._semaphore is not None:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+                holding_slot = True
+            await asyncio.wait_for(
+                self._wait_buckets(estimated_tokens, deadline),
+                max(0.0, deadline - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            if holding_slot:
+                self._semaphore.release()
+            self.timeouts += 1
+            raise Exception(f"ArkModel rate limit queue timeout after {self.queue_timeout}s")
+        except BaseException:
+            if holding_slot:
+                self._semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+        
+        wait_time = time.monotonic() - start_time
+        arkmodel_queue_wait.observe(wait_time)
+        self.acquired += 1
+        self.in_flight += 1
+        self.wait_total += wait_time
+        self.wait_max = max(self.wait_max, wait_time)
+    
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None):
+        """Lepas slot in-flight dan koreksi bucket TPM dengan pemakaian sebenarnya"""
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+        if self.tpm_bucket is not None and actual_tokens is not None:
+            self.tpm_bucket.adjust(estimated_tokens - actual_tokens)
+    
+    @asynccontextmanager
+    async def limit(self, payload: Dict[str, Any]):
+        """Context untuk satu request upstream; isi usage["total_tokens"] dari response jika ada"""
+        estimated_tokens = self.estimate_tokens(payload)
+        with tracer.span("arkmodel.queue_wait", {"arkmodel.estimated_tokens": estimated_tokens}):
+            await self.acquire(estimated_tokens)
+        usage: Dict[str, Any] = {}
+        try:
+            yield usage
+        finally:
+            self.release(estimated_tokens, usage.get("total_tokens"))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rpm_limit": self.rpm_limit,
+            "tpm_limit": self.tpm_limit,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "queue_timeouts": self.timeouts,
+            "queue_wait_avg": self.wait_total / self.acquired if self.acquired else 0.0,
+            "queue_wait_max": self.wait_max,
+            "rpm_available": round(self.rpm_bucket.tokens, 2) if self.rpm_bucket is not None else None,
+            "tpm_available": round(self.tpm_bucket.tokens, 2) if self.tpm_bucket is not None else None
+        }
+
+# Global instance
+rate_governor = RateGovernor(
+    rpm_limit=settings.arkmodel_rpm_limit,
+    tpm_limit=settings.arkmodel_tpm_limit,
+    max_in_flight=settings.arkmodel_max_in_flight,
+    queue_timeout=settings.arkmodel_queue_timeout
+)
+
+# Status HTTP yang layak dicoba ulang: rate limit upstream dan error sementara server
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Header Retry-After dalam detik (angka atau HTTP-date), None jika tidak ada/tidak valid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def parse_sse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Decode satu baris "data: {...}" dari stream SSE; None untuk baris lain dan penanda [DONE]"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    return json.loads(data)
+
+def record_token_usage(operation: str, usage: Optional[Dict[str, Any]], model: str, from_field: Optional[str] = None, type: Optional[str] = None):
+    """Catat field usage dari response ArkModel: counter token per operasi dan akuntansi per from_field/type"""
+    if not usage:
+        return
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(key)
+        if value:
+            arkmodel_tokens.inc(value, operation=operation, type=key[:-len("_tokens")])
+    token_usage.record(from_field, type, operation, model, usage)
+
+def transport_error_status(error: Exception) -> str:
+    """Label status untuk kegagalan tanpa response HTTP"""
+    return "timeout" if isinstance(error, httpx.TimeoutException) else "error"
+
+class RetryPolicy:
+    """Retry dengan exponential backoff + full jitter; Retry-After dari upstream didahulukan"""
+    
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.exhausted = 0
+        self.retry_after_honoured = 0
+    
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Jeda sebelum percobaan berikutnya, atau None jika tidak boleh dicoba lagi"""
+        if attempt > self.max_retries:
+            self.exhausted += 1
+            return None
+        if retry_after is not None:
+            # Upstream meminta menunggu lebih lama dari batas kita: gagal sekarang saja
+            if retry_after > self.max_delay:
+                self.exhausted += 1
+                return None
+            self.retry_after_honoured += 1
+            self.retries += 1
+            return retry_after
+        self.retries += 1
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_retries": self.max_retries,
+            "retries": self.retries,
+            "retry_after_honoured": self.retry_after_honoured,
+            "exhausted": self.exhausted
+        }
+
+class CircuitBreaker:
+    """
+    Circuit breaker untuk ArkModel: terbuka setelah sejumlah kegagalan berturut-turut (5xx/timeout/koneksi),
+    menolak request secara langsung selama recovery timeout, lalu mengizinkan satu request percobaan (half-open).
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.opened_count = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+    
+    def allow_request(self) -> bool:
+        if not self.enabled or self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def release_probe(self):
+        """Request percobaan dibatalkan sebelum ada hasil, izinkan percobaan berikutnya"""
+        self._probe_in_flight = False
+    
+    def record_failure(self, error: str):
+        self.last_failure = error[:200]
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if not self.enabled:
+            return
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+    
+    def retry_in(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_in": round(self.retry_in(), 2),
+            "opened_count": self.opened_count,
+            "rejected_requests": self.rejected,
+            "last_failure": self.last_failure
+        }
+
+# Global instances
+retry_policy = RetryPolicy(
+    max_retries=settings.arkmodel_max_retries,
+    base_delay=settings.arkmodel_retry_base_delay,
+    max_delay=settings.arkmodel_retry_max_delay
+)
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.arkmodel_breaker_failure_threshold,
+    recovery_timeout=settings.arkmodel_breaker_recovery_timeout
+)
+
+EXTRACTION_SYSTEM_PROMPT = "Anda adalah AI agent yang ahli dalam menganalisis dan mengekstrak informasi dari teks aduan/laporan dalam bahasa Indonesia."
+CLASSIFICATION_SYSTEM_PROMPT = "Anda adalah AI agent yang ahli dalam mengklasifikasi aduan/laporan ke unit kerja yang tepat berdasarkan konten dan konteks."
+COMBINED_SYSTEM_PROMPT = "Anda adalah AI agent yang ahli dalam menganalisis, mengekstrak informasi, dan mengklasifikasi aduan/laporan dalam bahasa Indonesia ke unit kerja yang tepat."
 
 class ArkModelClient:
     def __init__(self):
@@ -14,148 +472,361 @@ class ArkModelClient:
             "Content-Type": "application/json"
         }
     
-    async def _make_request(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Membuat request ke ArkModel API"""
+    def _build_url(self, endpoint: str) -> str:
         # Pastikan tidak ada double slash
         if self.base_url.endswith('/'):
-            url = f"{self.base_url}{endpoint}"
-        else:
-            url = f"{self.base_url}/{endpoint}"
+            return f"{self.base_url}{endpoint}"
+        return f"{self.base_url}/{endpoint}"
+    
+    async def _make_request(self, endpoint: str, payload: Dict[str, Any], operation: str = "chat", from_field: Optional[str] = None, type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Membuat request ke ArkModel API, request identik yang bersamaan digabung.
+        Pemakaian token request gabungan dicatat atas from_field/type pemanggil pertama.
+        """
+        with tracer.span("ArkModelClient._make_request", {"arkmodel.operation": operation, "from_field": from_field, "type": type}) as span:
+            payload = await token_usage.admit(payload, from_field)
+            span.set_attribute("arkmodel.model", payload["model"])
+            if not settings.arkmodel_single_flight:
+                return await self._send_request(endpoint, payload, operation, from_field, type)
+            
+            key = single_flight.make_key(endpoint, payload)
+            return await single_flight.do(key, lambda: self._send_request(endpoint, payload, operation, from_field, type))
+    
+    async def _send_request(self, endpoint: str, payload: Dict[str, Any], operation: str = "chat", from_field: Optional[str] = None, type: Optional[str] = None) -> Dict[str, Any]:
+        """Kirim request ke ArkModel API dengan retry untuk 429/5xx/timeout dan circuit breaker"""
+        url = self._build_url(endpoint)
         
-        async with httpx.AsyncClient() as client:
+        attempt = 0
+        while True:
+            attempt += 1
+            if not circuit_breaker.allow_request():
+                raise Exception(f"ArkModel circuit breaker is open, failing fast (retry in {circuit_breaker.retry_in():.1f}s)")
+            
+            retry_after = None
             try:
+                result = await self._send_once(url, payload, operation, from_field, type)
+                circuit_breaker.record_success()
+                return result
+            except asyncio.CancelledError:
+                circuit_breaker.release_probe()
+                raise
+            except httpx.HTTPStatusError as e:
+                status_code = e.response.status_code
+                error = Exception(f"HTTP error: {status_code} - {e.response.text}")
+                retryable = status_code in RETRYABLE_STATUS_CODES
+                # 429 berarti upstream hidup tetapi membatasi kita, bukan tanda gangguan
+                if status_code >= 500:
+                    circuit_breaker.record_failure(str(error))
+                else:
+                    circuit_breaker.record_success()
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+            except httpx.TransportError as e:
+                # Timeout dan error koneksi/jaringan
+                arkmodel_responses.inc(operation=operation, status=transport_error_status(e))
+                error = Exception(f"Request error: {e.__class__.__name__} {str(e)}")
+                retryable = True
+                circuit_breaker.record_failure(str(error))
+            except httpx.RequestError as e:
+                error = Exception(f"Request error: {str(e)}")
+                retryable = False
+                circuit_breaker.record_success()
+            except Exception as e:
+                error = Exception(f"Unexpected error: {str(e)}")
+                retryable = False
+                circuit_breaker.record_success()
+            
+            delay = retry_policy.get_delay(attempt, retry_after) if retryable else None
+            if delay is None:
+                raise error
+            arkmodel_retries.inc(operation=operation)
+            with tracer.span("arkmodel.retry_backoff", {"attempt": attempt, "delay": delay, "error": str(error)[:200]}):
+                await asyncio.sleep(delay)
+    
+    async def _send_once(self, url: str, payload: Dict[str, Any], operation: str = "chat", from_field: Optional[str] = None, type: Optional[str] = None) -> Dict[str, Any]:
+        """Satu percobaan request, dibatasi oleh rate governor"""
+        client = http_client_manager.get_client()
+        async with rate_governor.limit(payload) as usage:
+            with arkmodel_request_duration.time(operation=operation, mode="request"), tracer.span("arkmodel.http", {"arkmodel.operation": operation, "url.full": url}, kind=SPAN_KIND_CLIENT) as span:
                 response = await client.post(
                     url,
                     headers=self.headers,
-                    json=payload,
-                    timeout=30.0
+                    json=payload
                 )
-                
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                raise Exception(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            except httpx.RequestError as e:
-                raise Exception(f"Request error: {str(e)}")
-            except Exception as e:
-                raise Exception(f"Unexpected error: {str(e)}")
+                span.set_attribute("http.response.status_code", response.status_code)
+                if response.status_code >= 400:
+                    span.set_error(f"HTTP {response.status_code}")
+            arkmodel_responses.inc(operation=operation, status=response.status_code)
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            # Koreksi bucket TPM dengan jumlah token sebenarnya
+            usage["total_tokens"] = (result.get("usage") or {}).get("total_tokens")
+            record_token_usage(operation, result.get("usage"), payload["model"], from_field, type)
+            return result
     
-    async def extract_data(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> Dict[str, Any]:
-        """Ekstraksi data dari konten aduan"""
-        prompt = f"""
-        Sebagai AI agent untuk ekstraksi data aduan/laporan, analisis konten berikut dan ekstrak informasi berikut dalam format JSON:
-
-        Konten: {content}
-
-        Ekstrak informasi berikut:
-        1. Topik utama aduan (bukan kalimat ringkasan, namun kata kunci/keyword dari inti aduan/laporan)
-        2. Sentimen (positive, negative, neutral) dengan skor 0-1
-        3. Emosi yang terdeteksi (anger, fear, joy, sadness, surprise, disgust, anticipation, trust) dengan skor confidence
-        4. Entity (nama orang, perusahaan, organisasi) dengan tipe dan confidence
-        5. Lokasi yang disebutkan (hanya ambil lokasi setingkat provinsi)
-        6. Hashtag yang disebutkan
-        7. Ringkasan singkat yang memuat inti aduan/laporan (5-10 kalimat)
-
-        Format output JSON:
-        {{
-            "topic": ["string"],
-            "sentiment": "string",
-            "sentiment_score": float,
-            "emotions": [{{"emotion": "string", "confidence": float}}],
-            "entities": [{{"name": "string", "type": "string", "confidence": float}}],
-            "locations": ["string"],
-            "hashtags": ["string"],
-            "summary": "string"
-        }}
+    async def _stream_request(self, endpoint: str, payload: Dict[str, Any], operation: str = "chat", from_field: Optional[str] = None, type: Optional[str] = None) -> AsyncIterator[str]:
         """
+        Request chat-completions dengan stream: true, yield potongan content dari setiap event SSE.
+        Tanpa retry: potongan yang sudah diteruskan ke client tidak bisa ditarik kembali.
+        Jika streaming dinonaktifkan, content dari request biasa di-yield sekaligus.
+        """
+        if not settings.arkmodel_streaming_enabled:
+            response = await self._make_request(endpoint, payload, operation, from_field, type)
+            yield response.get("choices", [{}])[0].get("message", {}).get("content", "{}")
+            return
         
-        payload = {
-            "model": self.model_name,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Anda adalah AI agent yang ahli dalam menganalisis dan mengekstrak informasi dari teks aduan/laporan dalam bahasa Indonesia."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 1000
-        }
-        
-        return await self._make_request("v3/chat/completions", payload)
-    
-    async def classify_content(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> Dict[str, Any]:
-        """Klasifikasi konten untuk menentukan unit kerja yang tepat"""
+        payload = await token_usage.admit(payload, from_field)
+        if not circuit_breaker.allow_request():
+            raise Exception(f"ArkModel circuit breaker is open, failing fast (retry in {circuit_breaker.retry_in():.1f}s)")
         
-        # Get unit kerja data from database
+        url = self._build_url(endpoint)
+        payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        client = http_client_manager.get_client()
+        start_time = None
         try:
-            unit_kerja_data = await unit_kerja_service.get_unit_kerja_data()
+            async with rate_governor.limit(payload) as usage:
+                start_time = time.perf_counter()
+                async with client.stream("POST", url, headers=self.headers, json=payload) as response:
+                    arkmodel_responses.inc(operation=operation, status=response.status_code)
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    
+                    async for line in response.aiter_lines():
+                        chunk = parse_sse_line(line)
+                        if chunk is None:
+                            continue
+                        # Chunk terakhir membawa usage (stream_options.include_usage)
+                        if chunk.get("usage"):
+                            usage["total_tokens"] = chunk["usage"].get("total_tokens")
+                            record_token_usage(operation, chunk["usage"], payload["model"], from_field, type)
+                        for choice in chunk.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client memutus stream, bukan kegagalan upstream
+            circuit_breaker.release_probe()
+            raise
+        except httpx.HTTPStatusError as e:
+            status_code = e.response.status_code
+            error = Exception(f"HTTP error: {status_code} - {e.response.text}")
+            if status_code >= 500:
+                circuit_breaker.record_failure(str(error))
+            else:
+                circuit_breaker.record_success()
+            raise error
+        except httpx.TransportError as e:
+            arkmodel_responses.inc(operation=operation, status=transport_error_status(e))
+            error = Exception(f"Request error: {e.__class__.__name__} {str(e)}")
+            circuit_breaker.record_failure(str(error))
+            raise error
+        except httpx.RequestError as e:
+            circuit_breaker.record_success()
+            raise Exception(f"Request error: {str(e)}")
         except Exception as e:
-            print(f"Error getting unit kerja data: {e}")
-            # Use fallback data
-            from config import FALLBACK_UNIT_KERJA_DATA
-            unit_kerja_data = FALLBACK_UNIT_KERJA_DATA
-        
-        # Build unit kerja info string
-        unit_kerja_info = "Unit Kerja yang tersedia:\n"
-        for i, (name, data) in enumerate(unit_kerja_data.items(), 1):
-            keywords_str = ", ".join(data["keywords"])
-            unit_kerja_info += f"{i}. {name} ({data['email']}) - {data['description']}\n"
-            unit_kerja_info += f"   Keywords: {keywords_str}\n"
+            circuit_breaker.record_success()
+            raise Exception(f"Unexpected error: {str(e)}")
+        finally:
+            # Durasi seluruh stream, dari request dikirim sampai chunk terakhir
+            if start_time is not None:
+                arkmodel_request_duration.observe(time.perf_counter() - start_time, operation=operation, mode="stream")
         
-        prompt = f"""
-        Sebagai AI agent untuk klasifikasi aduan, analisis konten berikut untuk menentukan unit kerja yang paling tepat:
-
-        Konten: {content}
-        
-        {unit_kerja_info}
+        circuit_breaker.record_success()
+    
+    def _build_extraction_instructions(self, skip_local_fields: bool = False) -> Tuple[str, str]:
+        """Instruksi dan format output JSON untuk ekstraksi; skip_local_fields menghilangkan field yang diekstrak lokal"""
+        items = [
+            "Topik utama aduan (bukan kalimat ringkasan, namun kata kunci/keyword dari inti aduan/laporan)",
+            "Sentimen (positive, negative, neutral) dengan skor 0-1",
+            "Emosi yang terdeteksi (anger, fear, joy, sadness, surprise, disgust, anticipation, trust) dengan skor confidence",
+            "Entity (nama orang, perusahaan, organisasi) dengan tipe dan confidence"
+        ]
+        fields = [
+            '"topic": ["string"]',
+            '"sentiment": "string"',
+            '"sentiment_score": float',
+            '"emotions": [{"emotion": "string", "confidence": float}]',
+            '"entities": [{"name": "string", "type": "string", "confidence": float}]'
+        ]
+        if not skip_local_fields:
+            items += ["Lokasi yang disebutkan (hanya ambil lokasi setingkat provinsi)", "Hashtag yang disebutkan"]
+            fields += ['"locations": ["string"]', '"hashtags": ["string"]']
+        items.append("Ringkasan singkat yang memuat inti aduan/laporan (5-10 kalimat)")
+        fields.append('"summary": "string"')
         
+        instructions = "\n        Ekstrak informasi berikut:\n"
+        instructions += "".join(f"        {i}. {item}\n" for i, item in enumerate(items, 1))
+        instructions += "        "
+        output_format = "{\n" + ",\n".join(f"            {field}" for field in fields) + "\n        }"
+        return instructions, output_format
+    
+    def _build_classification_instructions(self) -> Tuple[str, str]:
+        """Instruksi dan format output JSON untuk klasifikasi"""
+        return """
         Berdasarkan analisis konten, tentukan:
         1. Unit kerja yang paling sesuai (BSrE atau Dalinfo)
         2. Confidence score (0-1)
         3. Kata kunci yang cocok dari konten
         4. Alasan klasifikasi
         5. Unit kerja alternatif jika ada
-        
-        Format output JSON:
-        {{
-            "recommended_unit": {{
+        """, """{
+            "recommended_unit": {
                 "name": "string",
                 "email": "string", 
                 "description": "string",
                 "confidence": float,
                 "matched_keywords": ["string"]
-            }},
+            },
             "alternative_units": [
-                {{
+                {
                     "name": "string",
                     "email": "string",
                     "description": "string", 
                     "confidence": float,
                     "matched_keywords": ["string"]
-                }}
+                }
             ],
             "classification_reason": "string"
-        }}
-        """
+        }"""
+    
+    def _select_units(self, content: str, catalog: UnitCatalog) -> Optional[List[str]]:
+        """Batasi katalog ke top-K unit paling mirip dengan konten (index TF-IDF lokal); None berarti seluruh katalog"""
+        if not settings.unit_router_enabled or len(catalog.data) <= settings.unit_router_top_k:
+            return None
         
-        payload = {
+        candidates = unit_similarity_index.select_candidates(
+            content,
+            top_k=settings.unit_router_top_k,
+            min_score=settings.unit_router_min_score
+        )
+        selected = [name for name in candidates or [] if name in catalog.data]
+        return selected or None
+    
+    async def get_catalog(self) -> UnitCatalog:
+        """Get katalog unit kerja yang sudah dirender dari database (dengan cache)"""
+        try:
+            return await unit_kerja_service.get_catalog()
+        except Exception as e:
+            print(f"Error getting unit kerja data: {e}")
+            # Use fallback data
+            return unit_kerja_service.get_fallback_catalog()
+    
+    async def _build_unit_kerja_info(self, content: str, catalog: Optional[UnitCatalog] = None) -> str:
+        """Daftar unit kerja kandidat untuk prompt klasifikasi, dari fragmen yang sudah dirender"""
+        if catalog is None:
+            catalog = await self.get_catalog()
+        return catalog.render(self._select_units(content, catalog))
+    
+    def _build_payload(self, system_prompt: str, prompt: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """Bangun payload chat-completions"""
+        return {
             "model": self.model_name,
             "messages": [
                 {
                     "role": "system",
-                    "content": "Anda adalah AI agent yang ahli dalam mengklasifikasi aduan/laporan ke unit kerja yang tepat berdasarkan konten dan konteks."
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            "temperature": 0.2,
-            "max_tokens": 800
+            "temperature": temperature,
+            "max_tokens": max_tokens
         }
+    
+    def _build_extraction_payload(self, content: str, skip_local_fields: bool = False) -> Dict[str, Any]:
+        """Payload ekstraksi data dari konten aduan"""
+        instructions, output_format = self._build_extraction_instructions(skip_local_fields)
+        
+        prompt = f"""
+        Sebagai AI agent untuk ekstraksi data aduan/laporan, analisis konten berikut dan ekstrak informasi berikut dalam format JSON:
+        
+        Konten: {content}
+        {instructions}
+        Format output JSON:
+        {output_format}
+        """
+        
+        return self._build_payload(EXTRACTION_SYSTEM_PROMPT, prompt, temperature=0.3, max_tokens=1000)
+    
+    async def _build_classification_payload(self, content: str, catalog: Optional[UnitCatalog] = None) -> Dict[str, Any]:
+        """Payload klasifikasi konten ke unit kerja"""
+        unit_kerja_info = await self._build_unit_kerja_info(content, catalog)
+        instructions, output_format = self._build_classification_instructions()
+        
+        prompt = f"""
+        Sebagai AI agent untuk klasifikasi aduan, analisis konten berikut untuk menentukan unit kerja yang paling tepat:
+        
+        Konten: {content}
+        
+        {unit_kerja_info}
+        {instructions}
+        Format output JSON:
+        {output_format}
+        """
+        
+        return self._build_payload(CLASSIFICATION_SYSTEM_PROMPT, prompt, temperature=0.2, max_tokens=800)
+    
+    async def _build_combined_payload(self, content: str, catalog: Optional[UnitCatalog] = None, skip_local_fields: bool = False) -> Dict[str, Any]:
+        """Payload ekstraksi dan klasifikasi dalam satu prompt"""
+        unit_kerja_info = await self._build_unit_kerja_info(content, catalog)
+        extraction_instructions, extraction_format = self._build_extraction_instructions(skip_local_fields)
+        classification_instructions, classification_format = self._build_classification_instructions()
         
-        return await self._make_request("v3/chat/completions", payload)
+        prompt = f"""
+        Sebagai AI agent untuk ekstraksi dan klasifikasi aduan/laporan, analisis konten berikut satu kali dan kerjakan dua tugas sekaligus.
+        
+        Konten: {content}
+        
+        {unit_kerja_info}
+        Tugas A - Ekstraksi:
+        {extraction_instructions}
+        Tugas B - Klasifikasi:
+        {classification_instructions}
+        Format output JSON:
+        {{
+            "extraction": {extraction_format},
+            "classification": {classification_format}
+        }}
+        """
+        
+        return self._build_payload(COMBINED_SYSTEM_PROMPT, prompt, temperature=0.2, max_tokens=1800)
+    
+    async def extract_data(self, content: str, language: str = "id", from_field: str = None, type: str = None, skip_local_fields: bool = False) -> Dict[str, Any]:
+        """Ekstraksi data dari konten aduan"""
+        payload = self._build_extraction_payload(content, skip_local_fields)
+        
+        return await self._make_request("v3/chat/completions", payload, "extract", from_field, type)
+    
+    async def classify_content(self, content: str, language: str = "id", from_field: str = None, type: str = None, catalog: Optional[UnitCatalog] = None) -> Dict[str, Any]:
+        """Klasifikasi konten untuk menentukan unit kerja yang tepat"""
+        payload = await self._build_classification_payload(content, catalog)
+        
+        return await self._make_request("v3/chat/completions", payload, "classify", from_field, type)
+    
+    async def process_combined(self, content: str, language: str = "id", from_field: str = None, type: str = None, catalog: Optional[UnitCatalog] = None, skip_local_fields: bool = False) -> Dict[str, Any]:
+        """Ekstraksi dan klasifikasi dalam satu request (mode combined)"""
+        payload = await self._build_combined_payload(content, catalog, skip_local_fields)
+        
+        return await self._make_request("v3/chat/completions", payload, "combined", from_field, type)
+    
+    async def stream_extract_data(self, content: str, language: str = "id", skip_local_fields: bool = False, from_field: str = None, type: str = None) -> AsyncIterator[str]:
+        """Seperti extract_data, tetapi yield potongan teks JSON selagi di-generate"""
+        payload = self._build_extraction_payload(content, skip_local_fields)
+        async for delta in self._stream_request("v3/chat/completions", payload, "extract", from_field, type):
+            yield delta
+    
+    async def stream_classify_content(self, content: str, language: str = "id", catalog: Optional[UnitCatalog] = None, from_field: str = None, type: str = None) -> AsyncIterator[str]:
+        """Seperti classify_content, tetapi yield potongan teks JSON selagi di-generate"""
+        payload = await self._build_classification_payload(content, catalog)
+        async for delta in self._stream_request("v3/chat/completions", payload, "classify", from_field, type):
+            yield delta
+    
+    async def stream_process_combined(self, content: str, language: str = "id", catalog: Optional[UnitCatalog] = None, skip_local_fields: bool = False, from_field: str = None, type: str = None) -> AsyncIterator[str]:
+        """Seperti process_combined, tetapi yield potongan teks JSON selagi di-generate"""
+        payload = await self._build_combined_payload(content, catalog, skip_local_fields)
+        async for delta in self._stream_request("v3/chat/completions", payload, "combined", from_field, type):
+            yield delta
@@ -0,0 +1,4 @@
+"""
+Benchmark suite: stub ArkModel lokal, fixture PostgreSQL dan load generator.
+Jalankan dari root project, mis. python -m benchmark.run_benchmark
+"""
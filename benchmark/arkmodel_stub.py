@@ -0,0 +1,212 @@
+"""
+Stub lokal yang meniru API chat-completions ArkModel untuk benchmark.
+Latency, error 5xx dan 429 bisa diatur; output JSON mengikuti format yang diminta prompt
+(ekstraksi, klasifikasi atau combined) sehingga seluruh jalur parsing di API ikut teruji.
+
+    python -m benchmark.arkmodel_stub --port 8911 --latency lognormal:0.8,0.4 --error-rate 0.01 --rate-limit-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+from typing import Dict, Any, List, Optional, Tuple
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+UNIT_LINE_PATTERN = re.compile(r"^\s*\d+\. (.+?) \(([^)]+)\) - (.*)$", re.MULTILINE)
+CONTENT_PATTERN = re.compile(r"Konten: (.*)")
+WORD_PATTERN = re.compile(r"[a-zA-Z]{5,}")
+CHARS_PER_TOKEN = 4
+
+class LatencyDistribution:
+    """
+    Distribusi latency dari spesifikasi "nama:parameter" (detik):
+    fixed:0.5, uniform:0.2,1.0, normal:0.8,0.2, lognormal:median,sigma, exponential:mean
+    """
+    
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        name, _, params = spec.partition(":")
+        self.name = name.strip().lower()
+        self.params = [float(param) for param in params.split(",") if param.strip()]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+        if self.name not in expected or len(self.params) != expected[self.name]:
+            raise ValueError(f"Invalid latency distribution '{spec}'")
+    
+    def sample(self) -> float:
+        if self.name == "fixed":
+            return self.params[0]
+        if self.name == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        if self.name == "normal":
+            return max(0.0, self.rng.gauss(self.params[0], self.params[1]))
+        if self.name == "lognormal":
+            return self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return self.rng.expovariate(1.0 / self.params[0])
+
+class StubConfig:
+    def __init__(self, latency: str, error_rate: float, rate_limit_rate: float, retry_after: float, stream_chunk_size: int, stream_chunk_delay: float, seed: int):
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_chunk_size = stream_chunk_size
+        self.stream_chunk_delay = stream_chunk_delay
+        self.seed = seed
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "retry_after": self.retry_after,
+            "stream_chunk_size": self.stream_chunk_size,
+            "stream_chunk_delay": self.stream_chunk_delay,
+            "seed": self.seed
+        }
+
+def _units(prompt: str) -> List[Tuple[str, str, str]]:
+    """Unit kandidat dari daftar unit kerja di prompt (urutan hasil router dipertahankan)"""
+    return UNIT_LINE_PATTERN.findall(prompt)
+
+def _unit(name: str, email: str, description: str, confidence: float, keywords: List[str]) -> Dict[str, Any]:
+    return {"name": name, "email": email, "description": description, "confidence": confidence, "matched_keywords": keywords}
+
+def build_extraction(content: str, rng: random.Random, include_local_fields: bool) -> Dict[str, Any]:
+    words = list(dict.fromkeys(word.lower() for word in WORD_PATTERN.findall(content)))
+    score = round(rng.uniform(0.05, 0.95), 2)
+    data = {
+        "topic": words[:3] or ["aduan"],
+        "sentiment": "negative" if score < 0.4 else ("neutral" if score < 0.6 else "positive"),
+        "sentiment_score": score,
+        "emotions": [{"emotion": rng.choice(["anger", "fear", "sadness", "trust"]), "confidence": round(rng.uniform(0.5, 0.95), 2)}],
+        "entities": [{"name": "BSSN", "type": "organization", "confidence": 0.9}]
+    }
+    if include_local_fields:
+        data["locations"] = []
+        data["hashtags"] = []
+    data["summary"] = " ".join(content.split()[:40])
+    return data
+
+def build_classification(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    units = _units(prompt) or [("BSrE", "aduanbsre@bssn.go.id", "Sertifikat elektronik")]
+    name, email, description = units[0]
+    alternatives = [
+        _unit(alt_name, alt_email, alt_description, round(rng.uniform(0.1, 0.4), 2), [])
+        for alt_name, alt_email, alt_description in units[1:3]
+    ]
+    return {
+        "recommended_unit": _unit(name, email, description, round(rng.uniform(0.6, 0.95), 2), []),
+        "alternative_units": alternatives,
+        "classification_reason": f"Konten aduan paling sesuai dengan layanan {name}"
+    }
+
+def build_content(payload: Dict[str, Any], rng: random.Random) -> str:
+    """Output JSON sesuai tugas di prompt: combined, klasifikasi atau ekstraksi"""
+    prompt = payload["messages"][-1]["content"]
+    match = CONTENT_PATTERN.search(prompt)
+    content = match.group(1) if match else ""
+    include_local_fields = '"locations"' in prompt
+    if '"extraction":' in prompt:
+        data = {
+            "extraction": build_extraction(content, rng, include_local_fields),
+            "classification": build_classification(prompt, rng)
+        }
+    elif '"recommended_unit"' in prompt:
+        data = build_classification(prompt, rng)
+    else:
+        data = build_extraction(content, rng, include_local_fields)
+    return json.dumps(data, ensure_ascii=False)
+
+def build_usage(payload: Dict[str, Any], text: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(message.get("content") or "") for message in payload["messages"]) // CHARS_PER_TOKEN
+    completion_tokens = len(text) // CHARS_PER_TOKEN
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="ArkModel Stub")
+    
+    @app.get("/stats")
+    async def stats():
+        return {"requests": config.requests, "errors": config.errors, "rate_limited": config.rate_limited, "config": config.as_dict()}
+    
+    @app.post("/{path:path}")
+    async def chat_completions(path: str, request: Request):
+        payload = await request.json()
+        config.requests += 1
+        await asyncio.sleep(config.latency.sample())
+        
+        roll = config.rng.random()
+        if roll < config.rate_limit_rate:
+            config.rate_limited += 1
+            return JSONResponse(
+                {"error": {"code": "RateLimitExceeded", "message": "Too many requests"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            config.errors += 1
+            return JSONResponse({"error": {"code": "InternalServiceError", "message": "Stub error"}}, status_code=500)
+        
+        text = build_content(payload, config.rng)
+        usage = build_usage(payload, text)
+        model = payload.get("model", "stub")
+        if not payload.get("stream"):
+            return {
+                "id": f"stub-{config.requests}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+        
+        async def events():
+            for i in range(0, len(text), config.stream_chunk_size):
+                chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": text[i:i + config.stream_chunk_size]}}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if config.stream_chunk_delay > 0:
+                    await asyncio.sleep(config.stream_chunk_delay)
+            yield f"data: {json.dumps({'model': model, 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(events(), media_type="text/event-stream")
+    
+    return app
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stub lokal API chat-completions ArkModel")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8911)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="fixed:s | uniform:min,max | normal:mean,sd | lognormal:median,sigma | exponential:mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraksi response 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraksi response 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Header Retry-After pada 429 (detik)")
+    parser.add_argument("--stream-chunk-size", type=int, default=16, help="Karakter per event SSE")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.005, help="Jeda antar event SSE (detik)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    config = StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        stream_chunk_size=args.stream_chunk_size,
+        stream_chunk_delay=args.stream_chunk_delay,
+        seed=args.seed
+    )
+    print(f"ArkModel stub on http://{args.host}:{args.port} {json.dumps(config.as_dict())}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Korpus aduan sintetis yang deterministik untuk benchmark.
+Setiap aduan disusun dari kalimat acak, sehingga aduan berbeda tidak saling terdeteksi
+sebagai near-duplicate dan tidak mengenai result cache kecuali memang diulang.
+Riwayat yang di-seed ke database memakai kumpulan kalimat terpisah (HISTORY_SENTENCES)
+agar tidak menjadi near-duplicate dari trafik load test.
+"""
+import random
+from typing import List
+
+SENTENCES = [
+    "Sertifikat elektronik saya tidak bisa dipakai untuk tanda tangan digital dokumen kantor",
+    "Aplikasi tanda tangan elektronik selalu gagal memverifikasi sertifikat yang baru diterbitkan",
+    "Beredar berita hoax di media sosial tentang pemblokiran aplikasi pesan singkat",
+    "Akun palsu mengatasnamakan pejabat menyebarkan disinformasi di grup percakapan warga",
+    "Situs pemerintah daerah kami diretas dan tampilannya diganti dengan pesan provokatif",
+    "Server dinas mengalami serangan ransomware sejak tadi malam dan layanan berhenti total",
+    "Kami memerlukan koordinasi keamanan siber untuk pemerintah kabupaten yang baru dibentuk",
+    "Tim CSIRT kementerian meminta pendampingan penanganan insiden kebocoran data pegawai",
+    "Saya ingin menanyakan jadwal penerimaan mahasiswa baru program persandian",
+    "Orang tua calon taruna menanyakan persyaratan pendaftaran dan batas usia peserta",
+    "Jaringan internal untuk layanan publik sering terputus pada jam kerja",
+    "Kami mengajukan permohonan kunjungan industri dan kuliah umum untuk mahasiswa",
+    "Terdapat aktivitas mencurigakan berupa login berulang dari alamat luar negeri",
+    "Email phishing yang meniru instansi resmi diterima oleh banyak pegawai",
+    "Instansi kami membutuhkan modul sandi data untuk mengamankan basis data kependudukan",
+    "Mohon dilakukan pengujian keamanan terhadap aplikasi mobile layanan perizinan",
+    "Hasil pemindaian menunjukkan kerentanan kritis pada portal pengaduan masyarakat",
+    "Sekolah kami ingin berkunjung ke museum sandi untuk kegiatan edukasi sejarah",
+    "Video manipulasi yang menampilkan tokoh publik tersebar luas di berbagai platform",
+    "Pesan berantai berisi tautan undian palsu meminta data pribadi dan kode OTP",
+    "Dokumen rahasia diduga bocor dan diperjualbelikan di forum daring",
+    "Laman resmi kampus disusupi iklan judi daring pada beberapa halaman",
+    "Pegawai kesulitan memperpanjang masa berlaku sertifikat tanda tangan elektronik",
+    "Perangkat jaringan di kantor cabang terinfeksi malware penambang kripto",
+    "Warga melaporkan konten ujaran kebencian yang memicu keresahan di lingkungan",
+    "Kami meminta klarifikasi resmi atas informasi palsu mengenai bantuan sosial",
+    "Sistem informasi rumah sakit daerah lambat diakses setelah pembaruan",
+    "Mohon bantuan respons insiden karena situs layanan kependudukan tidak dapat diakses",
+    "Kontak layanan bantuan tidak merespons laporan yang kami kirim minggu lalu",
+    "Aplikasi pemerintah meminta izin akses berlebihan ke data perangkat pengguna"
+]
+
+HISTORY_SENTENCES = [
+    "Token kriptografi untuk digital signature pegawai hilang dan perlu diblokir",
+    "Permohonan certificate baru untuk server surat elektronik belum diproses",
+    "Grup alumni menyebarkan fake news tentang kenaikan tarif listrik",
+    "Misinformasi soal vaksin beredar di kanal video dan perlu diluruskan",
+    "Pemda kami meminta pendampingan menyusun rencana keamanan siber daerah",
+    "Dinas provinsi mengusulkan forum koordinasi dengan bssn daerah setiap triwulan",
+    "Lembaga kami melaporkan insiden siber pada sistem kepegawaian pusat",
+    "Gov csirt diminta menganalisis log dari kementerian yang terkena pembobolan",
+    "Alumni poltek ssn menanyakan program pendidikan lanjutan bidang kriptanalisis",
+    "Peserta seleksi menanyakan materi ujian penerimaan mahasiswa jalur afirmasi",
+    "Operasional ti di gedung pusat terganggu karena pendingin ruang server rusak",
+    "Pusdatik diminta memeriksa sistem bssn yang tidak bisa diakses dari luar kantor",
+    "Kampus kami meminta dokumentasi dan publikasi bersama untuk acara seminar",
+    "Humas daerah mengundang narasumber untuk kuliah umum literasi digital",
+    "Tim respons cepat dibutuhkan karena halaman depan aplikasi desa berubah",
+    "Bantuan 70 kami hubungi terkait incident response pada perangkat kasir",
+    "Basis data pasien membutuhkan proteksi data dan modul sandi yang tersertifikasi",
+    "Kami meminta assessment keamanan untuk aplikasi pembayaran retribusi",
+    "Tim internal menemukan vulnerability pada layanan unggah berkas dan meminta pentest",
+    "Komunitas pelajar ingin melihat pameran sejarah persandian di akhir pekan",
+    "Guru meminta materi edukasi budaya keamanan informasi untuk kelas sembilan"
+]
+
+LOCATIONS = ["Jakarta", "Bandung", "Surabaya", "Makassar", "Medan", "Denpasar", "Pontianak", "Jayapura", "Semarang", "Palembang"]
+
+class ComplaintCorpus:
+    SOURCES = ["twitter", "email", "instagram", "web", "whatsapp"]
+    TYPES = ["aduan", "laporan", "pertanyaan"]
+    
+    def __init__(self, seed: int, sentences: List[str] = SENTENCES):
+        self.seed = seed
+        self.sentences = sentences
+    
+    def generate(self, index: int) -> str:
+        """Aduan ke-index; index yang sama selalu menghasilkan teks yang sama"""
+        rng = random.Random(f"{self.seed}:{index}")
+        sentences = rng.sample(self.sentences, rng.randint(3, 5))
+        sentences.insert(rng.randint(0, len(sentences)), f"Kejadian di {rng.choice(LOCATIONS)} tanggal {rng.randint(1, 28)} nomor laporan {rng.randint(100000, 999999)}")
+        return ". ".join(sentences) + "."
+    
+    def generate_many(self, count: int, start: int = 0) -> List[str]:
+        return [self.generate(index) for index in range(start, start + count)]
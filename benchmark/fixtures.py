@@ -0,0 +1,95 @@
+"""
+Fixture PostgreSQL untuk benchmark: membuat seluruh tabel (database_setup), mengisi unit_kerja,
+dan opsional mengosongkan tabel hasil serta mengisi riwayat extraction_data secara deterministik.
+Koneksi memakai DB_HOST/DB_PORT/DB_NAME/DB_USER/DB_PASSWORD yang sama dengan API.
+
+    python -m benchmark.fixtures --reset --history 5000 --seed 42
+"""
+import argparse
+import asyncio
+import random
+from typing import List, Optional
+from config import settings
+from database import db_pool, fetch_unit_kerja
+import database_setup
+from keyword_classifier import KeywordClassifier
+from benchmark.corpus import ComplaintCorpus, HISTORY_SENTENCES
+
+# Tabel yang diisi oleh API selama benchmark; dikosongkan dengan --reset
+RESULT_TABLES = ["raw_data", "extraction_data", "log_data", "result_cache", "processing_jobs", "token_usage"]
+
+HISTORY_COLUMNS = [
+    "content", "language", "from_field", "type", "topic", "sentiment", "sentiment_score",
+    "summary", "recommended_unit_name", "recommended_unit_confidence", "classification_reason", "processing_time"
+]
+
+async def create_schema():
+    """Tabel dan data unit_kerja dari database_setup (idempotent)"""
+    await database_setup.create_unit_kerja_table()
+    await database_setup.create_unit_kerja_notify_trigger()
+    await database_setup.create_raw_data_table()
+    await database_setup.create_processing_jobs_table()
+    await database_setup.create_log_data_table()
+    await database_setup.create_extraction_data_table()
+    await database_setup.create_result_cache_table()
+    await database_setup.create_token_usage_table()
+
+async def reset_results():
+    async with db_pool.acquire() as conn:
+        await conn.execute(f"TRUNCATE {', '.join(RESULT_TABLES)} RESTART IDENTITY")
+    print(f"✅ Truncated {', '.join(RESULT_TABLES)}")
+
+async def seed_history(count: int, seed: int):
+    """
+    Riwayat extraction_data (mis. untuk rebuild index near-duplicate saat startup).
+    Kalimatnya tidak beririsan dengan korpus load test, dan unit rekomendasinya diturunkan
+    dari kecocokan kata kunci pada isi aduan agar riwayat konsisten dengan kontennya.
+    """
+    rng = random.Random(seed)
+    corpus = ComplaintCorpus(seed, HISTORY_SENTENCES)
+    keywords = KeywordClassifier()
+    keywords.rebuild({unit["name"]: unit for unit in await fetch_unit_kerja()})
+    async with db_pool.acquire() as conn:
+        records = []
+        for i in range(count):
+            content = corpus.generate(i)
+            scores = keywords.score(content)
+            unit_name, confidence, reason = None, None, "Riwayat benchmark, tanpa kata kunci yang cocok"
+            if scores:
+                unit_name, confidence, matched = scores[0]
+                confidence = round(confidence, 2)
+                reason = f"Riwayat benchmark, kata kunci: {', '.join(matched)}"
+            records.append((
+                content, "id", rng.choice(corpus.SOURCES), rng.choice(corpus.TYPES),
+                content.split()[:3], rng.choice(["negative", "neutral", "positive"]), round(rng.random(), 2),
+                " ".join(content.split()[:40]), unit_name, confidence, reason, round(rng.uniform(0.5, 3.0), 3)
+            ))
+        await conn.copy_records_to_table("extraction_data", records=records, columns=HISTORY_COLUMNS)
+    print(f"✅ Seeded {count} extraction_data rows")
+
+async def prepare(reset: bool = False, history: int = 0, seed: int = 42):
+    try:
+        await create_schema()
+        if reset:
+            await reset_results()
+        if history > 0:
+            await seed_history(history, seed)
+    finally:
+        await db_pool.close()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Siapkan database PostgreSQL untuk benchmark")
+    parser.add_argument("--reset", action="store_true", help=f"Kosongkan {', '.join(RESULT_TABLES)}")
+    parser.add_argument("--history", type=int, default=0, help="Jumlah baris extraction_data riwayat")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="Izinkan --reset pada database yang namanya tidak mengandung 'bench' atau 'test'")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.reset and not args.force and not any(marker in settings.db_name.lower() for marker in ("bench", "test")):
+        raise SystemExit(f"Refusing to truncate database '{settings.db_name}'; use a benchmark database or pass --force")
+    asyncio.run(prepare(args.reset, args.history, args.seed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Load generator untuk API: menjalankan skenario (/extract, /classify, /process, /units, ...) pada beberapa
+level concurrency (closed loop) dan menulis RPS serta latency p50/p95/p99 sebagai JSON.
+Dengan --baseline, hasil dibandingkan dengan run sebelumnya dan exit code 1 jika ada regresi.
+
+    python -m benchmark.load_test --base-url http://127.0.0.1:8000 --concurrency 1,8,32 --duration 20 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from benchmark.corpus import ComplaintCorpus
+
+SCENARIOS = {
+    "extract": ("POST", "/extract"),
+    "classify": ("POST", "/classify"),
+    "process": ("POST", "/process"),
+    "process_combined": ("POST", "/process"),
+    "units": ("GET", "/units"),
+    "units_refresh": ("POST", "/units/refresh")
+}
+DEFAULT_SCENARIOS = ["extract", "classify", "process", "units"]
+
+# Indeks korpus load test dimulai jauh dari riwayat yang diisi benchmark.fixtures
+CORPUS_OFFSET = 1_000_000
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile nearest-rank, sama dengan statistik batch di services"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+class RequestFactory:
+    """Body request per skenario; duplicate_ratio mengatur porsi konten yang diulang (result cache hit)"""
+    
+    def __init__(self, corpus: ComplaintCorpus, duplicate_ratio: float, seed: int):
+        self.corpus = corpus
+        self.duplicate_ratio = duplicate_ratio
+        self.rng = random.Random(seed)
+        self.next_index = CORPUS_OFFSET
+        self.sources = ComplaintCorpus.SOURCES
+        self.types = ComplaintCorpus.TYPES
+    
+    def _content(self) -> str:
+        if self.next_index > CORPUS_OFFSET and self.rng.random() < self.duplicate_ratio:
+            return self.corpus.generate(self.rng.randrange(CORPUS_OFFSET, self.next_index))
+        self.next_index += 1
+        return self.corpus.generate(self.next_index - 1)
+    
+    def build(self, scenario: str) -> Optional[Dict[str, Any]]:
+        if scenario in ("units", "units_refresh"):
+            return None
+        body = {
+            "content": self._content(),
+            "language": "id",
+            "from_field": self.rng.choice(self.sources),
+            "type": self.rng.choice(self.types)
+        }
+        if scenario == "process":
+            body["mode"] = "separate"
+        elif scenario == "process_combined":
+            body["mode"] = "combined"
+        return body
+
+async def run_level(client: httpx.AsyncClient, scenario: str, concurrency: int, duration: float, warmup: float,
+                    max_requests: Optional[int], factory: RequestFactory) -> Dict[str, Any]:
+    """Closed loop: concurrency worker mengirim request berturut-turut selama warmup + duration"""
+    method, path = SCENARIOS[scenario]
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    sent = [0]
+    
+    async def worker():
+        while loop.time() < deadline and (max_requests is None or sent[0] < max_requests):
+            sent[0] += 1
+            body = factory.build(scenario)
+            request_start = loop.time()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = None
+                error = e.__class__.__name__
+            request_end = loop.time()
+            if request_start < measure_from:
+                continue
+            if status is None:
+                errors[error] = errors.get(error, 0) + 1
+                continue
+            status_codes[status] = status_codes.get(status, 0) + 1
+            latencies.append(request_end - request_start)
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = max(1e-9, min(loop.time(), deadline) - measure_from) if max_requests is None else max(1e-9, loop.time() - measure_from)
+    
+    succeeded = sum(count for status, count in status_codes.items() if status.startswith("2"))
+    completed = len(latencies) + sum(errors.values())
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": completed,
+        "succeeded": succeeded,
+        "failed": completed - succeeded,
+        "status_codes": status_codes,
+        "errors": errors,
+        "duration": round(elapsed, 3),
+        "rps": round(succeeded / elapsed, 3),
+        "latency": {
+            "mean": round(sum(latencies) / len(latencies), 6) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 6),
+            "p95": round(percentile(latencies, 95), 6),
+            "p99": round(percentile(latencies, 99), 6),
+            "max": round(max(latencies), 6) if latencies else 0.0
+        }
+    }
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+async def run_benchmark(base_url: str, scenarios: List[str], concurrency_levels: List[int], duration: float, warmup: float,
+                        max_requests: Optional[int], duplicate_ratio: float, seed: int, timeout: float,
+                        extra_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    factory = RequestFactory(ComplaintCorpus(seed), duplicate_ratio, seed)
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for scenario in scenarios:
+            for concurrency in concurrency_levels:
+                result = await run_level(client, scenario, concurrency, duration, warmup, max_requests, factory)
+                results.append(result)
+                latency = result["latency"]
+                print(
+                    f"{scenario:<16} c={concurrency:<4} rps={result['rps']:<9} "
+                    f"p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s p99={latency['p99']:.3f}s "
+                    f"ok={result['succeeded']} failed={result['failed']}",
+                    file=sys.stderr
+                )
+    
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git": git_revision(),
+            "base_url": base_url,
+            "seed": seed,
+            "duration": duration,
+            "warmup": warmup,
+            "max_requests": max_requests,
+            "duplicate_ratio": duplicate_ratio,
+            "python": platform.python_version(),
+            **(extra_meta or {})
+        },
+        "results": results
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> Tuple[List[Dict[str, Any]], bool]:
+    """Bandingkan per (scenario, concurrency): regresi jika p95 naik atau RPS turun lebih dari max_regression"""
+    previous = {(result["scenario"], result["concurrency"]): result for result in baseline.get("results", [])}
+    rows = []
+    regressed = False
+    for result in report["results"]:
+        base = previous.get((result["scenario"], result["concurrency"]))
+        if base is None:
+            continue
+        p95_change = (result["latency"]["p95"] - base["latency"]["p95"]) / base["latency"]["p95"] if base["latency"]["p95"] else 0.0
+        rps_change = (result["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        row_regressed = p95_change > max_regression or rps_change < -max_regression
+        regressed = regressed or row_regressed
+        rows.append({
+            "scenario": result["scenario"],
+            "concurrency": result["concurrency"],
+            "p95_change": round(p95_change, 4),
+            "rps_change": round(rps_change, 4),
+            "regressed": row_regressed
+        })
+    return rows, regressed
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"Pilihan: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Level concurrency, dipisah koma")
+    parser.add_argument("--duration", type=float, default=20.0, help="Detik pengukuran per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Detik pemanasan per level (tidak diukur)")
+    parser.add_argument("--requests", type=int, default=None, help="Batas jumlah request per level (opsional)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="Porsi konten yang mengulang konten sebelumnya")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout per request (detik)")
+    parser.add_argument("--output", default=None, help="File JSON hasil (default stdout)")
+    parser.add_argument("--baseline", default=None, help="File JSON run sebelumnya untuk perbandingan")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Batas kenaikan p95 / penurunan RPS relatif")
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def finish(report: Dict[str, Any], args: argparse.Namespace) -> int:
+    """Tulis laporan dan bandingkan dengan baseline; kembalikan exit code"""
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressed = compare(report, baseline, args.max_regression)
+        report["comparison"] = {
+            "baseline": args.baseline,
+            "baseline_commit": baseline.get("meta", {}).get("git", {}).get("commit"),
+            "max_regression": args.max_regression,
+            "results": rows,
+            "regressed": regressed
+        }
+        exit_code = 1 if regressed else 0
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return exit_code
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load generator untuk Smart Reporting API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    add_load_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    scenarios = parse_list(args.scenarios)
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    
+    report = asyncio.run(run_benchmark(
+        args.base_url, scenarios, [int(level) for level in parse_list(args.concurrency)],
+        args.duration, args.warmup, args.requests, args.duplicate_ratio, args.seed, args.timeout
+    ))
+    return finish(report, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Menjalankan benchmark lengkap dalam satu perintah: stub ArkModel, fixture database (atau tanpa database),
+API (uvicorn) yang diarahkan ke stub, lalu load generator. Semua proses dihentikan setelah selesai.
+
+    python -m benchmark.run_benchmark --concurrency 1,8,32 --duration 20 --output bench.json
+    python -m benchmark.run_benchmark --no-db --baseline bench.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+from benchmark.load_test import SCENARIOS, add_load_arguments, parse_list, run_benchmark, finish
+
+# Port tertutup: API tidak bisa terhubung ke database dan memakai data unit kerja fallback
+NO_DB_PORT = "1"
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+def stop(process: Optional[subprocess.Popen]):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def build_api_env(args: argparse.Namespace) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "ARKMODEL_BASE_URL": f"http://127.0.0.1:{args.stub_port}/api",
+        "ARKMODEL_API_KEY": env.get("ARKMODEL_API_KEY", "benchmark"),
+        "DEBUG": "False"
+    })
+    if args.no_db:
+        # Tanpa PostgreSQL: unit kerja dari fallback, persistence/job/token flush dimatikan
+        env.update({
+            "DB_PORT": NO_DB_PORT,
+            "PERSIST_ENABLED": "False",
+            "JOB_WORKERS": "0",
+            "RESULT_CACHE_BACKEND": "memory",
+            "TOKEN_USAGE_ENABLED": "False",
+            "UNIT_KERJA_LISTEN_ENABLED": "False"
+        })
+    return env
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end dengan stub ArkModel lokal")
+    parser.add_argument("--api-port", type=int, default=8900)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--stub-port", type=int, default=8911)
+    parser.add_argument("--stub-latency", default="lognormal:0.8,0.4")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--stub-retry-after", type=float, default=1.0)
+    parser.add_argument("--no-db", action="store_true", help="Jalankan API tanpa PostgreSQL")
+    parser.add_argument("--reset-db", action="store_true", help="Kosongkan tabel hasil sebelum benchmark (lihat benchmark.fixtures)")
+    parser.add_argument("--history", type=int, default=0, help="Baris extraction_data riwayat yang diisi fixture")
+    add_load_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    scenarios = parse_list(args.scenarios)
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    
+    stub_args = [
+        "--port", str(args.stub_port),
+        "--latency", args.stub_latency,
+        "--error-rate", str(args.stub_error_rate),
+        "--rate-limit-rate", str(args.stub_rate_limit_rate),
+        "--retry-after", str(args.stub_retry_after),
+        "--seed", str(args.seed)
+    ]
+    env = build_api_env(args)
+    stub_process = api_process = None
+    try:
+        stub_process = subprocess.Popen([sys.executable, "-m", "benchmark.arkmodel_stub"] + stub_args)
+        wait_until_ready(f"http://127.0.0.1:{args.stub_port}/stats", stub_process)
+        
+        if not args.no_db:
+            fixture_args = ["--history", str(args.history), "--seed", str(args.seed)]
+            if args.reset_db:
+                fixture_args.append("--reset")
+            subprocess.run([sys.executable, "-m", "benchmark.fixtures"] + fixture_args, env=env, check=True)
+        
+        api_process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.api_port),
+             "--workers", str(args.api_workers), "--log-level", "warning"],
+            env=env
+        )
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        wait_until_ready(f"{base_url}/health", api_process, timeout=60.0)
+        
+        report = asyncio.run(run_benchmark(
+            base_url, scenarios, [int(level) for level in parse_list(args.concurrency)],
+            args.duration, args.warmup, args.requests, args.duplicate_ratio, args.seed, args.timeout,
+            extra_meta={
+                "api_workers": args.api_workers,
+                "database": "none" if args.no_db else "postgres",
+                "stub": {
+                    "latency": args.stub_latency,
+                    "error_rate": args.stub_error_rate,
+                    "rate_limit_rate": args.stub_rate_limit_rate,
+                    "retry_after": args.stub_retry_after
+                }
+            }
+        ))
+        # Jumlah request, 5xx dan 429 yang benar-benar dikirim stub selama benchmark
+        report["meta"]["stub_stats"] = httpx.get(f"http://127.0.0.1:{args.stub_port}/stats", timeout=5.0).json()
+    finally:
+        stop(api_process)
+        stop(stub_process)
+    
+    return finish(report, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
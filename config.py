@@ -8,6 +8,111 @@ class Settings(BaseSettings):
     arkmodel_base_url: str = os.getenv("ARKMODEL_BASE_URL", "https://ark.ap-southeast.bytepluses.com/api")
     arkmodel_model_name: str = os.getenv("ARKMODEL_MODEL_NAME", "seed-1-6-250915")
     
+    # ArkModel HTTP Connection Pool Configuration
+    arkmodel_timeout: float = float(os.getenv("ARKMODEL_TIMEOUT", "30.0"))
+    arkmodel_http2: bool = os.getenv("ARKMODEL_HTTP2", "True").lower() == "true"
+    arkmodel_max_connections: int = int(os.getenv("ARKMODEL_MAX_CONNECTIONS", "100"))
+    arkmodel_max_keepalive_connections: int = int(os.getenv("ARKMODEL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    arkmodel_keepalive_expiry: float = float(os.getenv("ARKMODEL_KEEPALIVE_EXPIRY", "30.0"))
+    
+    # Gabungkan request ArkModel identik yang sedang berjalan (single-flight)
+    arkmodel_single_flight: bool = os.getenv("ARKMODEL_SINGLE_FLIGHT", "True").lower() == "true"
+    
+    # /process/stream memanggil ArkModel dengan stream: true (SSE); False = satu response penuh
+    arkmodel_streaming_enabled: bool = os.getenv("ARKMODEL_STREAMING_ENABLED", "True").lower() == "true"
+    
+    # Rate governor ArkModel: kuota per menit (0 = tanpa batas), batas request in-flight,
+    # dan berapa lama request boleh mengantre sebelum gagal
+    arkmodel_rpm_limit: int = int(os.getenv("ARKMODEL_RPM_LIMIT", "0"))
+    arkmodel_tpm_limit: int = int(os.getenv("ARKMODEL_TPM_LIMIT", "0"))
+    arkmodel_max_in_flight: int = int(os.getenv("ARKMODEL_MAX_IN_FLIGHT", "64"))
+    arkmodel_queue_timeout: float = float(os.getenv("ARKMODEL_QUEUE_TIMEOUT", "30.0"))
+    
+    # Retry ArkModel untuk 429/5xx/timeout (exponential backoff + jitter, Retry-After dihormati)
+    arkmodel_max_retries: int = int(os.getenv("ARKMODEL_MAX_RETRIES", "2"))
+    arkmodel_retry_base_delay: float = float(os.getenv("ARKMODEL_RETRY_BASE_DELAY", "0.5"))
+    arkmodel_retry_max_delay: float = float(os.getenv("ARKMODEL_RETRY_MAX_DELAY", "10.0"))
+    
+    # Circuit breaker ArkModel: terbuka setelah N kegagalan berturut-turut (0 = nonaktif)
+    arkmodel_breaker_failure_threshold: int = int(os.getenv("ARKMODEL_BREAKER_FAILURE_THRESHOLD", "5"))
+    arkmodel_breaker_recovery_timeout: float = float(os.getenv("ARKMODEL_BREAKER_RECOVERY_TIMEOUT", "30.0"))
+    
+    # Processing Configuration
+    # "fail": seluruh request gagal jika salah satu tahap gagal
+    # "partial": kembalikan tahap yang berhasil beserta error untuk tahap yang gagal
+    process_failure_mode: str = os.getenv("PROCESS_FAILURE_MODE", "fail")
+    # "separate": dua request ArkModel paralel, "combined": satu prompt untuk ekstraksi + klasifikasi
+    process_mode: str = os.getenv("PROCESS_MODE", "separate")
+    
+    # Batch Processing Configuration
+    batch_default_concurrency: int = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    
+    # Keyword Pre-classifier Configuration
+    # /classify langsung dijawab lokal jika confidence unit teratas >= threshold
+    keyword_preclassifier_enabled: bool = os.getenv("KEYWORD_PRECLASSIFIER_ENABLED", "True").lower() == "true"
+    keyword_confidence_threshold: float = float(os.getenv("KEYWORD_CONFIDENCE_THRESHOLD", "0.75"))
+    
+    # Local Extraction Configuration
+    # "merge": hashtag/mention/URL/provinsi diekstrak lokal lalu digabung dengan hasil ArkModel
+    # "skip": seperti merge, tetapi prompt ArkModel tidak lagi meminta locations dan hashtags
+    # "off": hanya hasil ArkModel
+    local_extraction_mode: str = os.getenv("LOCAL_EXTRACTION_MODE", "merge")
+    
+    # Degraded Mode Configuration
+    # Jika ArkModel gagal, klasifikasi memakai fallback lokal (keyword + kemiripan deskripsi)
+    degraded_fallback_enabled: bool = os.getenv("DEGRADED_FALLBACK_ENABLED", "True").lower() == "true"
+    
+    # Near-duplicate Detection Configuration (MinHash + LSH di depan ArkModel)
+    # Hasil aduan yang hampir sama (estimasi Jaccard >= threshold) dalam jendela waktu dipakai ulang
+    near_duplicate_enabled: bool = os.getenv("NEAR_DUPLICATE_ENABLED", "True").lower() == "true"
+    near_duplicate_threshold: float = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+    near_duplicate_num_perm: int = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "128"))
+    near_duplicate_shingle_size: int = int(os.getenv("NEAR_DUPLICATE_SHINGLE_SIZE", "3"))
+    near_duplicate_max_entries: int = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "20000"))
+    near_duplicate_window: int = int(os.getenv("NEAR_DUPLICATE_WINDOW", "86400"))
+    
+    # Unit Router Configuration
+    # Hanya top-K unit paling mirip (TF-IDF lokal) yang dikirim di prompt klasifikasi
+    unit_router_enabled: bool = os.getenv("UNIT_ROUTER_ENABLED", "True").lower() == "true"
+    unit_router_top_k: int = int(os.getenv("UNIT_ROUTER_TOP_K", "5"))
+    unit_router_min_score: float = float(os.getenv("UNIT_ROUTER_MIN_SCORE", "0.05"))
+    
+    # Unit Kerja Cache Configuration
+    # Setelah interval ini data dianggap stale: tetap dipakai sambil di-refresh di background
+    unit_kerja_refresh_interval: float = float(os.getenv("UNIT_KERJA_REFRESH_INTERVAL", "300"))
+    # Jeda sebelum mencoba lagi setelah refresh gagal; berlipat dua setiap kegagalan berturut-turut
+    # (maksimal sepanjang interval refresh) agar database yang mati tidak dibanjiri query
+    unit_kerja_retry_interval: float = float(os.getenv("UNIT_KERJA_RETRY_INTERVAL", "5"))
+    # LISTEN/NOTIFY: perubahan tabel unit_kerja langsung me-refresh cache di setiap worker,
+    # sehingga selama koneksi LISTEN aktif interval polling bisa jauh lebih panjang
+    unit_kerja_listen_enabled: bool = os.getenv("UNIT_KERJA_LISTEN_ENABLED", "True").lower() == "true"
+    unit_kerja_listen_refresh_interval: float = float(os.getenv("UNIT_KERJA_LISTEN_REFRESH_INTERVAL", "3600"))
+    
+    # Result Cache Configuration
+    # "memory", "postgres" (memory + tabel result_cache) atau "none"
+    result_cache_backend: str = os.getenv("RESULT_CACHE_BACKEND", "memory")
+    result_cache_ttl: int = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+    result_cache_max_entries: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Persistence (write-behind ke raw_data, extraction_data dan log_data)
+    persist_enabled: bool = os.getenv("PERSIST_ENABLED", "True").lower() == "true"
+    persist_queue_max_size: int = int(os.getenv("PERSIST_QUEUE_MAX_SIZE", "10000"))
+    persist_batch_size: int = int(os.getenv("PERSIST_BATCH_SIZE", "200"))
+    persist_flush_interval: float = float(os.getenv("PERSIST_FLUSH_INTERVAL", "1.0"))
+    
+    # Job Queue Configuration (/jobs)
+    job_workers: int = int(os.getenv("JOB_WORKERS", "4"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    job_visibility_timeout: int = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+    job_retry_delay: float = float(os.getenv("JOB_RETRY_DELAY", "5.0"))
+    job_poll_interval: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    # Callback hasil job: hanya http/https; jika diisi, host harus ada di daftar ini (dipisah koma,
+    # ".example.com" = seluruh subdomain). Alamat IP privat/loopback/link-local selalu ditolak kecuali tercantum
+    job_callback_allowed_hosts: str = os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "")
+    job_callback_timeout: float = float(os.getenv("JOB_CALLBACK_TIMEOUT", "5.0"))
+    
     # Database Configuration
     db_host: str = os.getenv("DB_HOST", "103.67.244.224")
     db_port: int = int(os.getenv("DB_PORT", "5432"))
@@ -15,6 +120,49 @@ class Settings(BaseSettings):
     db_user: str = os.getenv("DB_USER", "postgres")
     db_password: str = os.getenv("DB_PASSWORD", "password")
     
+    # Database Connection Pool Configuration
+    db_pool_min_size: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    db_pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    db_pool_acquire_timeout: float = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10.0"))
+    
+    # Token Usage Accounting Configuration
+    # Pemakaian token per from_field/type diagregasi in-memory dan di-flush berkala ke tabel token_usage
+    token_usage_enabled: bool = os.getenv("TOKEN_USAGE_ENABLED", "True").lower() == "true"
+    token_usage_flush_interval: float = float(os.getenv("TOKEN_USAGE_FLUSH_INTERVAL", "60"))
+    token_usage_period: int = int(os.getenv("TOKEN_USAGE_PERIOD", "3600"))
+    # Budget token per source (from_field) dalam jendela geser, JSON:
+    # {"twitter": 200000, "email": {"tokens": 50000, "action": "cheap_model"}, "*": 100000}
+    # Action "throttle": tunggu bucket tertua kedaluwarsa jika sebelum TOKEN_BUDGET_MAX_WAIT, selain itu langsung gagal
+    # (fallback degraded mengambil alih);
+    # "cheap_model": request memakai TOKEN_BUDGET_CHEAP_MODEL (throttle jika kosong)
+    token_budgets: str = os.getenv("TOKEN_BUDGETS", "")
+    token_budget_window: int = int(os.getenv("TOKEN_BUDGET_WINDOW", "3600"))
+    token_budget_action: str = os.getenv("TOKEN_BUDGET_ACTION", "throttle")
+    token_budget_max_wait: float = float(os.getenv("TOKEN_BUDGET_MAX_WAIT", "10.0"))
+    token_budget_cheap_model: str = os.getenv("TOKEN_BUDGET_CHEAP_MODEL", "")
+    
+    # Metrics Configuration (/metrics, format teks Prometheus)
+    # False = endpoint /metrics, middleware latency HTTP dan logger query database dinonaktifkan
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
+    # Tracing Configuration (span per request, format OTLP)
+    # Trace selalu diekspor jika error atau durasinya >= TRACING_SLOW_THRESHOLD detik (0 = nonaktif),
+    # selebihnya disampling dengan TRACING_SAMPLE_RATE (0.0 - 1.0). Header X-Request-ID tetap dikirim walau nonaktif
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    tracing_sample_rate: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+    tracing_slow_threshold: float = float(os.getenv("TRACING_SLOW_THRESHOLD", "30.0"))
+    # "none" (default), "file" = OTLP JSON per baris ke TRACING_FILE, "otlp" = OTLP/HTTP JSON ke TRACING_OTLP_ENDPOINT
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_file: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    # Jika TRACING_FILE melewati batas ini, file dipindah ke TRACING_FILE.1 (menimpa yang lama); 0 = tanpa batas
+    tracing_file_max_bytes: int = int(os.getenv("TRACING_FILE_MAX_BYTES", "52428800"))
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    tracing_export_interval: float = float(os.getenv("TRACING_EXPORT_INTERVAL", "5.0"))
+    tracing_max_queue: int = int(os.getenv("TRACING_MAX_QUEUE", "1000"))
+    tracing_max_spans: int = int(os.getenv("TRACING_MAX_SPANS", "256"))
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "smart-reporting-api")
+    
     # Application Configuration
     app_name: str = "Centralized Smart Reporting System API"
     app_version: str = "1.0.0"
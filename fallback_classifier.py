@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, Tuple
+from models import ClassificationResult, UnitKerja
+from keyword_classifier import KeywordClassifier
+from unit_router import UnitSimilarityIndex
+from unit_kerja_service import unit_kerja_service, UnitCatalog
+
+DEGRADED_REASON_PREFIX = "Mode degraded (ArkModel tidak tersedia)"
+
+class FallbackClassifier:
+    """
+    Klasifikasi lokal untuk mode degraded (ArkModel tidak tersedia).
+    Skor gabungan kecocokan keyword (Aho-Corasick) dan kemiripan deskripsi (TF-IDF),
+    tanpa akses jaringan maupun database sehingga aman dipakai untuk seluruh trafik saat gangguan.
+    """
+    
+    # Bobot keyword lebih besar: kecocokan kata kunci adalah sinyal yang paling bisa dipercaya
+    KEYWORD_WEIGHT = 0.7
+    SIMILARITY_WEIGHT = 0.3
+    MAX_ALTERNATIVES = 3
+    
+    def __init__(self):
+        self._indexes: Dict[str, Tuple[KeywordClassifier, UnitSimilarityIndex]] = {}
+    
+    def _get_catalog(self) -> UnitCatalog:
+        """Katalog yang sedang di-cache, atau FALLBACK_UNIT_KERJA_DATA jika belum pernah dimuat dari database"""
+        catalog = unit_kerja_service.get_cached_catalog()
+        if catalog is not None and catalog.data:
+            return catalog
+        return unit_kerja_service.get_fallback_catalog()
+    
+    def _get_indexes(self, catalog: UnitCatalog) -> Tuple[KeywordClassifier, UnitSimilarityIndex]:
+        """Index per versi katalog, dibangun sekali lalu dipakai ulang"""
+        indexes = self._indexes.get(catalog.version)
+        if indexes is None:
+            keywords = KeywordClassifier()
+            keywords.rebuild(catalog.data, catalog.version)
+            similarity = UnitSimilarityIndex()
+            similarity.rebuild(catalog.data)
+            indexes = (keywords, similarity)
+            # Cukup simpan versi terbaru
+            self._indexes = {catalog.version: indexes}
+        return indexes
+    
+    def score(self, content: str, catalog: Optional[UnitCatalog] = None) -> List[Tuple[str, float, List[str]]]:
+        """Skor gabungan per unit: (nama, confidence, keyword yang cocok), diurutkan dari tertinggi"""
+        catalog = catalog or self._get_catalog()
+        keywords, similarity = self._get_indexes(catalog)
+        
+        keyword_scores = {name: (confidence, matched) for name, confidence, matched in keywords.score(content)}
+        similarity_scores = dict(similarity.rank(content))
+        
+        scores = []
+        for name in catalog.data:
+            keyword_confidence, matched = keyword_scores.get(name, (0.0, []))
+            confidence = (self.KEYWORD_WEIGHT * keyword_confidence
+                          + self.SIMILARITY_WEIGHT * max(0.0, similarity_scores.get(name, 0.0)))
+            scores.append((name, confidence, matched))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+    
+    def classify(self, content: str) -> ClassificationResult:
+        """Hasil klasifikasi degraded; confidence 0 jika tidak ada sinyal sama sekali"""
+        catalog = self._get_catalog()
+        scores = self.score(content, catalog)
+        
+        units = [
+            UnitKerja(
+                name=name,
+                email=catalog.data[name].get("email", ""),
+                description=catalog.data[name].get("description", ""),
+                confidence=round(confidence, 4),
+                matched_keywords=matched
+            )
+            for name, confidence, matched in scores
+        ]
+        recommended = units[0]
+        alternatives = [unit for unit in units[1:] if unit.confidence > 0][:self.MAX_ALTERNATIVES]
+        
+        if recommended.matched_keywords:
+            reason = f"kata kunci yang cocok: {', '.join(recommended.matched_keywords)}"
+        elif recommended.confidence > 0:
+            reason = "kemiripan konten dengan deskripsi unit kerja"
+        else:
+            reason = "tidak ada kata kunci atau deskripsi yang cocok"
+        
+        return ClassificationResult(
+            recommended_unit=recommended,
+            alternative_units=alternatives,
+            classification_reason=f"{DEGRADED_REASON_PREFIX}: klasifikasi lokal berdasarkan {reason}. Perlu verifikasi manual.",
+            source="fallback",
+            catalog_version=catalog.version,
+            degraded=True
+        )
+
+# Global instance
+fallback_classifier = FallbackClassifier()
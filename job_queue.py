@@ -0,0 +1,347 @@
+import asyncio
+import ipaddress
+import json
+import socket
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import httpx
+from config import settings
+from database import db_pool
+from models import ProcessingRequest, callback_host_allowed
+
+JOBS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS processing_jobs (
+        id VARCHAR(36) PRIMARY KEY,
+        content TEXT NOT NULL,
+        language VARCHAR(10) NOT NULL,
+        from_field VARCHAR(255),
+        type VARCHAR(255),
+        failure_mode VARCHAR(20),
+        mode VARCHAR(20),
+        callback_url TEXT,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        result TEXT,
+        error TEXT,
+        callback_status VARCHAR(100),
+        visible_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        locked_until TIMESTAMP,
+        completed_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+JOBS_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_processing_jobs_pending
+    ON processing_jobs (status, visible_at)
+"""
+
+class JobQueue:
+    """
+    Antrean job di tabel processing_jobs yang dikerjakan oleh worker async in-process.
+    Job yang sedang diproses dikunci selama visibility timeout dan lock-nya diperpanjang
+    selama worker masih berjalan; jika worker mati, job akan diambil ulang oleh worker lain
+    setelah timeout habis. Update status hanya berlaku untuk pemegang lock (status running
+    dengan attempts yang sama), sehingga worker yang kehilangan lock tidak menimpa hasil.
+    """
+    
+    def __init__(self, processing_service):
+        self.processing_service = processing_service
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.callbacks_sent = 0
+        self.callbacks_failed = 0
+        self.lost_leases = 0
+        self._callback_client: Optional[httpx.AsyncClient] = None
+    
+    async def start(self):
+        """Pastikan tabel ada lalu jalankan worker"""
+        if self._workers or settings.job_workers <= 0:
+            return
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute(JOBS_TABLE_SQL)
+                await conn.execute(JOBS_INDEX_SQL)
+        except Exception as e:
+            print(f"Error preparing processing_jobs table: {e}")
+        
+        # Client terpisah dari client ArkModel: timeout pendek, tanpa header auth ArkModel
+        self._callback_client = httpx.AsyncClient(timeout=settings.job_callback_timeout, follow_redirects=False)
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        for _ in range(settings.job_workers):
+            self._workers.append(asyncio.create_task(self._worker()))
+    
+    async def stop(self):
+        """Hentikan worker; job yang sedang berjalan akan diambil ulang setelah visibility timeout"""
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+            self._callback_client = None
+    
+    async def submit(self, request: ProcessingRequest, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Simpan job baru dan bangunkan worker"""
+        job_id = str(uuid.uuid4())
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                INSERT INTO processing_jobs
+                    (id, content, language, from_field, type, failure_mode, mode, callback_url, max_attempts)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                RETURNING id, status, created_at
+            """, job_id, request.content, request.language or "id", request.from_field, request.type,
+                request.failure_mode, request.mode, callback_url, settings.job_max_attempts)
+        
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return dict(row)
+    
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job berdasarkan id"""
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT id, status, attempts, max_attempts, result, error, callback_url, callback_status,
+                       created_at, updated_at, completed_at
+                FROM processing_jobs WHERE id = $1
+            """, job_id)
+        
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+    
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """Ambil satu job yang siap diproses (atau yang lock-nya kedaluwarsa)"""
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                UPDATE processing_jobs SET
+                    status = 'running',
+                    attempts = attempts + 1,
+                    locked_until = CURRENT_TIMESTAMP + $1 * INTERVAL '1 second',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM processing_jobs
+                    WHERE (status = 'queued' AND visible_at <= CURRENT_TIMESTAMP)
+                       OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+                    ORDER BY created_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, content, language, from_field, type, failure_mode, mode,
+                          callback_url, attempts, max_attempts
+            """, float(settings.job_visibility_timeout))
+        return dict(row) if row is not None else None
+    
+    async def _worker(self):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                print(f"Error claiming job: {e}")
+                job = None
+            
+            if job is None:
+                # Tunggu job baru atau interval polling
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self._run_job(job)
+    
+    async def _run_job(self, job: Dict[str, Any]):
+        if job["attempts"] > job["max_attempts"]:
+            # Lock kedaluwarsa berulang kali (worker mati di tengah proses)
+            await self._finish(job, "failed", error="Visibility timeout exceeded on every attempt")
+            return
+        
+        self.processed += 1
+        heartbeat = asyncio.create_task(self._extend_lease(job))
+        try:
+            result = await self.processing_service.process(
+                content=job["content"],
+                language=job["language"],
+                from_field=job["from_field"],
+                type=job["type"],
+                failure_mode=job["failure_mode"],
+                mode=job["mode"]
+            )
+        except Exception as e:
+            await self._handle_failure(job, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+        
+        await self._finish(job, "succeeded", result=result.json())
+    
+    async def _extend_lease(self, job: Dict[str, Any]):
+        """Perpanjang locked_until selama job diproses, agar proses lambat tidak diambil worker lain"""
+        interval = max(1.0, settings.job_visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with db_pool.acquire() as conn:
+                    status = await conn.execute("""
+                        UPDATE processing_jobs SET
+                            locked_until = CURRENT_TIMESTAMP + $3 * INTERVAL '1 second',
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = $1 AND status = 'running' AND attempts = $2
+                    """, job["id"], job["attempts"], float(settings.job_visibility_timeout))
+            except Exception as e:
+                print(f"Error extending lease for job {job['id']}: {e}")
+                continue
+            if status != "UPDATE 1":
+                print(f"Lost lease for job {job['id']} (attempt {job['attempts']})")
+                self.lost_leases += 1
+                return
+    
+    async def _handle_failure(self, job: Dict[str, Any], error: str):
+        """Jadwalkan ulang dengan backoff eksponensial, atau tandai gagal jika percobaan habis"""
+        if job["attempts"] >= job["max_attempts"]:
+            await self._finish(job, "failed", error=error)
+            return
+        
+        delay = settings.job_retry_delay * (2 ** (job["attempts"] - 1))
+        try:
+            async with db_pool.acquire() as conn:
+                status = await conn.execute("""
+                    UPDATE processing_jobs SET
+                        status = 'queued',
+                        error = $3,
+                        locked_until = NULL,
+                        visible_at = CURRENT_TIMESTAMP + $4 * INTERVAL '1 second',
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = $1 AND status = 'running' AND attempts = $2
+                """, job["id"], job["attempts"], error, float(delay))
+        except Exception as e:
+            print(f"Error rescheduling job {job['id']}: {e}")
+            return
+        if status == "UPDATE 1":
+            self.retried += 1
+        else:
+            self.lost_leases += 1
+    
+    async def _finish(self, job: Dict[str, Any], status: str, result: Optional[str] = None, error: Optional[str] = None):
+        try:
+            async with db_pool.acquire() as conn:
+                update_status = await conn.execute("""
+                    UPDATE processing_jobs SET
+                        status = $3,
+                        result = $4,
+                        error = $5,
+                        locked_until = NULL,
+                        completed_at = CURRENT_TIMESTAMP,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = $1 AND status = 'running' AND attempts = $2
+                """, job["id"], job["attempts"], status, result, error)
+        except Exception as e:
+            print(f"Error finishing job {job['id']}: {e}")
+            return
+        
+        if update_status != "UPDATE 1":
+            # Lock sudah diambil worker lain; hasil dan callback menjadi milik worker tersebut
+            print(f"Discarding result of job {job['id']} attempt {job['attempts']}: lease lost")
+            self.lost_leases += 1
+            return
+        
+        if status == "succeeded":
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if job["callback_url"]:
+            await self._send_callback(job, status, result, error)
+    
+    async def _send_callback(self, job: Dict[str, Any], status: str, result: Optional[str], error: Optional[str]):
+        """Kirim hasil job ke callback URL"""
+        payload = {
+            "job_id": job["id"],
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            url, headers, extensions = await self._resolve_callback(job["callback_url"])
+            response = await self._callback_client.post(url, json=payload, headers=headers, extensions=extensions)
+            callback_status = f"HTTP {response.status_code}"
+            self.callbacks_sent += 1
+        except Exception as e:
+            callback_status = f"error: {str(e)}"[:100]
+            self.callbacks_failed += 1
+        
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE processing_jobs SET callback_status = $2 WHERE id = $1",
+                    job["id"], callback_status
+                )
+        except Exception as e:
+            print(f"Error saving callback status for job {job['id']}: {e}")
+    
+    async def _resolve_callback(self, url: str) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """
+        Resolve host callback tepat sebelum koneksi; tolak jika ada alamat yang bukan global.
+        Request dikirim ke IP yang sudah dicek (Host header dan SNI tetap memakai hostname)
+        agar DNS rebinding tidak bisa menukar alamat setelah pengecekan.
+        """
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        if callback_host_allowed(host):
+            return url, {}, {}
+        
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            raise Exception(f"Cannot resolve callback host '{host}': {e}")
+        # Buang zone id IPv6 (fe80::1%eth0) sebelum di-parse
+        addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+        if not addresses or any(not address.is_global for address in addresses):
+            raise Exception(f"Callback host '{host}' resolves to an internal address")
+        
+        address = addresses[0]
+        netloc = f"[{address}]" if address.version == 6 else str(address)
+        if parts.port:
+            netloc = f"{netloc}:{parts.port}"
+        headers = {"Host": f"{host}:{parts.port}" if parts.port else host}
+        extensions = {"sni_hostname": host} if parts.scheme == "https" else {}
+        return urlunsplit((parts.scheme, netloc, parts.path, parts.query, "")), headers, extensions
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Kedalaman antrean per status dan counter worker"""
+        stats = {
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "lost_leases": self.lost_leases,
+            "callbacks_sent": self.callbacks_sent,
+            "callbacks_failed": self.callbacks_failed,
+            "queue_depth": {},
+            "oldest_queued_age": None
+        }
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch("SELECT status, COUNT(*) AS total FROM processing_jobs GROUP BY status")
+            oldest = await conn.fetchval("""
+                SELECT EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - MIN(created_at)))
+                FROM processing_jobs WHERE status = 'queued'
+            """)
+        stats["queue_depth"] = {row["status"]: row["total"] for row in rows}
+        stats["oldest_queued_age"] = float(oldest) if oldest is not None else None
+        return stats
@@ -0,0 +1,128 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+WHITESPACE = " \t\r\n"
+
+class IncrementalJSONParser:
+    """
+    Parser JSON inkremental untuk output ArkModel yang di-stream.
+    Setiap member object yang nilainya sudah lengkap langsung dikembalikan beserta path-nya,
+    sehingga field bisa diteruskan ke client sebelum seluruh JSON selesai di-generate.
+    Teks sebelum "{" pertama (mis. pembuka ```json) diabaikan.
+    """
+    
+    def __init__(self, max_depth: int = 1):
+        self.max_depth = max_depth
+        self._buffer = ""
+        self._position = 0
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        # Satu frame per container yang masih terbuka
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+    
+    @property
+    def complete(self) -> bool:
+        return self._root_end is not None
+    
+    def feed(self, text: str) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Tambahkan potongan teks; kembalikan (path, nilai) untuk member yang baru lengkap"""
+        self._buffer += text
+        completed: List[Tuple[Tuple[str, ...], Any]] = []
+        buffer = self._buffer
+        index = self._position
+        
+        while index < len(buffer) and self._root_end is None:
+            char = buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._end_string(index + 1, completed)
+            elif self._root_start is None:
+                if char == "{":
+                    self._root_start = index
+                    self._stack.append(self._new_frame(True, ()))
+            elif char in WHITESPACE:
+                self._end_scalar(index, completed)
+            elif char == '"':
+                self._begin_value(index)
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._begin_value(index)
+                parent = self._stack[-1]
+                path = parent["path"] + ((parent["key"],) if parent["object"] else (None,))
+                self._stack.append(self._new_frame(char == "{", path))
+            elif char in "}]":
+                self._end_scalar(index, completed)
+                self._stack.pop()
+                if not self._stack:
+                    self._root_end = index + 1
+                elif self._stack[-1]["object"]:
+                    self._complete_member(self._stack[-1], index + 1, completed)
+            elif char == ":":
+                self._stack[-1]["expect_key"] = False
+            elif char == ",":
+                self._end_scalar(index, completed)
+                if self._stack[-1]["object"]:
+                    self._stack[-1]["expect_key"] = True
+                    self._stack[-1]["key"] = None
+            elif self._scalar_start is None:
+                # Awal number, true, false atau null
+                self._begin_value(index)
+                self._scalar_start = index
+            index += 1
+        
+        self._position = index
+        return completed
+    
+    def result(self) -> Any:
+        """Seluruh object JSON; error jika stream berakhir sebelum JSON lengkap"""
+        if self._root_start is None:
+            return json.loads(self._buffer)
+        if self._root_end is None:
+            raise ValueError("Incomplete JSON in streamed response")
+        return json.loads(self._buffer[self._root_start:self._root_end])
+    
+    def _new_frame(self, is_object: bool, path: Tuple[Optional[str], ...]) -> Dict[str, Any]:
+        return {"object": is_object, "path": path, "key": None, "expect_key": is_object, "value_start": None}
+    
+    def _begin_value(self, index: int):
+        frame = self._stack[-1]
+        if frame["object"] and not frame["expect_key"]:
+            frame["value_start"] = index
+    
+    def _end_string(self, end: int, completed: List[Tuple[Tuple[str, ...], Any]]):
+        frame = self._stack[-1]
+        if not frame["object"]:
+            return
+        if frame["expect_key"]:
+            frame["key"] = json.loads(self._buffer[self._string_start:end])
+        else:
+            self._complete_member(frame, end, completed)
+    
+    def _end_scalar(self, end: int, completed: List[Tuple[Tuple[str, ...], Any]]):
+        if self._scalar_start is None:
+            return
+        self._scalar_start = None
+        if self._stack[-1]["object"]:
+            self._complete_member(self._stack[-1], end, completed)
+    
+    def _complete_member(self, frame: Dict[str, Any], end: int, completed: List[Tuple[Tuple[str, ...], Any]]):
+        """Member object selesai; hanya member sampai kedalaman max_depth yang di-decode"""
+        path = frame["path"] + (frame["key"],)
+        if frame["value_start"] is None or len(path) > self.max_depth or None in path:
+            return
+        try:
+            completed.append((path, json.loads(self._buffer[frame["value_start"]:end])))
+        except ValueError:
+            # Nilai tidak valid; error sebenarnya dilaporkan oleh result()
+            pass
+        frame["value_start"] = None
@@ -0,0 +1,160 @@
+import re
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+from models import ClassificationResult, UnitKerja
+from unit_kerja_service import UnitCatalog
+
+def normalize_text(text: str) -> str:
+    """Huruf kecil, non-alfanumerik jadi spasi, dan diapit spasi agar pola hanya cocok per kata utuh"""
+    return " " + " ".join(re.sub(r"[^\w]+", " ", (text or "").casefold()).split()) + " "
+
+class AhoCorasick:
+    """Automaton multi-pattern: seluruh keyword dicari dalam satu kali scan teks"""
+    
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self.patterns = patterns
+        
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(pattern_id)
+        
+        # Bangun failure link secara BFS
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def search(self, text: str) -> List[int]:
+        """Kembalikan id pattern untuk setiap kemunculan di teks"""
+        matches = []
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                matches.extend(self._output[state])
+        return matches
+    
+    def search_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Seperti search, tetapi mengembalikan (indeks karakter terakhir, id pattern) untuk setiap kemunculan"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern_id in self._output[state]:
+                matches.append((index, pattern_id))
+        return matches
+
+class KeywordClassifier:
+    """Pre-classifier lokal berdasarkan keyword unit_kerja, dibangun ulang setiap versi katalog berubah"""
+    
+    # Prior pada penyebut agar satu kecocokan saja tidak menghasilkan confidence tinggi
+    SCORE_PRIOR = 1.0
+    # Satu frasa (mis. "tanda tangan digital" saja) bisa mencapai threshold lewat bobot multi-kata,
+    # jadi ArkModel hanya dilewati jika unit teratas cocok dengan minimal sekian keyword berbeda
+    MIN_KEYWORD_MATCHES = 2
+    
+    def __init__(self):
+        self._automaton: Optional[AhoCorasick] = None
+        self._pattern_keywords: List[List[Tuple[str, str]]] = []
+        self._units: Dict[str, Dict[str, Any]] = {}
+        self.catalog_version: Optional[str] = None
+    
+    def rebuild(self, unit_kerja_data: Dict[str, Dict[str, Any]], catalog_version: Optional[str] = None):
+        """Bangun automaton dari katalog unit kerja"""
+        owners: Dict[str, List[Tuple[str, str]]] = {}
+        for name, data in unit_kerja_data.items():
+            for keyword in data.get("keywords", []):
+                pattern = normalize_text(keyword)
+                if pattern.strip():
+                    owners.setdefault(pattern, []).append((name, keyword))
+        
+        patterns = list(owners.keys())
+        self._pattern_keywords = [owners[pattern] for pattern in patterns]
+        self._automaton = AhoCorasick(patterns) if patterns else None
+        self._units = unit_kerja_data
+        self.catalog_version = catalog_version
+    
+    def ensure_catalog(self, catalog: UnitCatalog):
+        """Bangun ulang automaton hanya jika versi katalog berbeda dari yang terakhir dipakai"""
+        if self._automaton is None or self.catalog_version != catalog.version:
+            self.rebuild(catalog.data, catalog.version)
+    
+    @property
+    def ready(self) -> bool:
+        return self._automaton is not None
+    
+    def score(self, content: str) -> List[Tuple[str, float, List[str]]]:
+        """Skor per unit: (nama, confidence, keyword yang cocok), diurutkan dari skor tertinggi"""
+        if self._automaton is None:
+            return []
+        
+        text = normalize_text(content)
+        raw_scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        for pattern_id in set(self._automaton.search(text)):
+            owners = self._pattern_keywords[pattern_id]
+            # Keyword multi-kata lebih spesifik; keyword yang dimiliki banyak unit dibagi rata
+            weight = len(self._automaton.patterns[pattern_id].split()) / len(owners)
+            for name, keyword in owners:
+                raw_scores[name] = raw_scores.get(name, 0.0) + weight
+                matched.setdefault(name, []).append(keyword)
+        
+        total = sum(raw_scores.values()) + self.SCORE_PRIOR
+        scores = [(name, raw / total, matched[name]) for name, raw in raw_scores.items()]
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+    
+    def classify(self, content: str, catalog: UnitCatalog) -> Optional[ClassificationResult]:
+        """Kembalikan hasil klasifikasi dengan katalog yang diberikan jika unit teratas melewati threshold, selain itu None"""
+        self.ensure_catalog(catalog)
+        scores = self.score(content)
+        if not scores or scores[0][1] < settings.keyword_confidence_threshold:
+            return None
+        if len(set(scores[0][2])) < self.MIN_KEYWORD_MATCHES:
+            return None
+        
+        units = [self._build_unit(name, confidence, keywords) for name, confidence, keywords in scores]
+        recommended = units[0]
+        return ClassificationResult(
+            recommended_unit=recommended,
+            alternative_units=units[1:],
+            classification_reason=f"Klasifikasi lokal berdasarkan kata kunci yang cocok: {', '.join(recommended.matched_keywords)}",
+            source="keyword",
+            catalog_version=catalog.version
+        )
+    
+    def _build_unit(self, name: str, confidence: float, keywords: List[str]) -> UnitKerja:
+        data = self._units.get(name, {})
+        return UnitKerja(
+            name=name,
+            email=data.get("email", ""),
+            description=data.get("description", ""),
+            confidence=round(confidence, 4),
+            matched_keywords=keywords
+        )
+
+# Global instance
+keyword_classifier = KeywordClassifier()
@@ -0,0 +1,137 @@
+import re
+from typing import Dict, List, Optional
+from keyword_classifier import AhoCorasick, normalize_text
+
+# Provinsi Indonesia beserta alias (singkatan, ejaan lain, ibu kota dan kota besar).
+# Nama kota yang juga kata umum (mis. "medan", "padang", "malang", "serang", "solo") hanya dipakai dengan awalan "kota".
+PROVINCE_GAZETTEER: Dict[str, List[str]] = {
+    "Aceh": ["aceh", "nad", "nanggroe aceh darussalam", "banda aceh"],
+    "Sumatera Utara": ["sumatera utara", "sumatra utara", "sumut", "kota medan", "deli serdang"],
+    "Sumatera Barat": ["sumatera barat", "sumatra barat", "sumbar", "kota padang", "bukittinggi"],
+    "Riau": ["riau", "pekanbaru"],
+    "Kepulauan Riau": ["kepulauan riau", "kepri", "batam", "tanjungpinang", "tanjung pinang"],
+    "Jambi": ["jambi"],
+    "Sumatera Selatan": ["sumatera selatan", "sumatra selatan", "sumsel", "palembang"],
+    "Kepulauan Bangka Belitung": ["kepulauan bangka belitung", "bangka belitung", "babel", "bangka", "belitung", "pangkalpinang", "pangkal pinang"],
+    "Bengkulu": ["bengkulu"],
+    "Lampung": ["lampung", "bandar lampung"],
+    "DKI Jakarta": ["dki jakarta", "jakarta", "dki", "jkt"],
+    "Jawa Barat": ["jawa barat", "jabar", "bandung", "bekasi", "bogor", "depok", "cirebon", "sukabumi", "tasikmalaya", "karawang"],
+    "Banten": ["banten", "tangerang", "tangerang selatan", "tangsel", "cilegon", "kota serang"],
+    "Jawa Tengah": ["jawa tengah", "jateng", "semarang", "surakarta", "kota solo", "magelang", "pekalongan", "tegal"],
+    "DI Yogyakarta": ["di yogyakarta", "daerah istimewa yogyakarta", "diy", "yogyakarta", "jogjakarta", "jogja", "yogya", "sleman", "bantul"],
+    "Jawa Timur": ["jawa timur", "jatim", "surabaya", "kota malang", "sidoarjo", "kediri", "jember"],
+    "Bali": ["bali", "denpasar"],
+    "Nusa Tenggara Barat": ["nusa tenggara barat", "ntb", "mataram", "lombok"],
+    "Nusa Tenggara Timur": ["nusa tenggara timur", "ntt", "kupang", "flores"],
+    "Kalimantan Barat": ["kalimantan barat", "kalbar", "pontianak"],
+    "Kalimantan Tengah": ["kalimantan tengah", "kalteng", "palangkaraya", "palangka raya"],
+    "Kalimantan Selatan": ["kalimantan selatan", "kalsel", "banjarmasin", "banjarbaru"],
+    "Kalimantan Timur": ["kalimantan timur", "kaltim", "samarinda", "balikpapan", "ikn"],
+    "Kalimantan Utara": ["kalimantan utara", "kaltara", "tarakan", "tanjung selor"],
+    "Sulawesi Utara": ["sulawesi utara", "sulut", "manado"],
+    "Gorontalo": ["gorontalo"],
+    "Sulawesi Tengah": ["sulawesi tengah", "sulteng", "kota palu"],
+    "Sulawesi Barat": ["sulawesi barat", "sulbar", "mamuju"],
+    "Sulawesi Selatan": ["sulawesi selatan", "sulsel", "makassar"],
+    "Sulawesi Tenggara": ["sulawesi tenggara", "sultra", "kendari"],
+    "Maluku": ["maluku", "ambon"],
+    "Maluku Utara": ["maluku utara", "malut", "ternate", "sofifi"],
+    "Papua": ["papua", "jayapura"],
+    "Papua Barat": ["papua barat", "manokwari"],
+    "Papua Selatan": ["papua selatan", "merauke"],
+    "Papua Tengah": ["papua tengah", "nabire"],
+    "Papua Pegunungan": ["papua pegunungan", "wamena", "jayawijaya"],
+    "Papua Barat Daya": ["papua barat daya", "sorong"]
+}
+
+HASHTAG_PATTERN = re.compile(r"(?<![\w#])#(\w*[^\W\d_]\w*)")
+MENTION_PATTERN = re.compile(r"(?<![\w.@])@([A-Za-z0-9_](?:[A-Za-z0-9_.]{0,28}[A-Za-z0-9_])?)")
+URL_PATTERN = re.compile(r"\b(?:https?://|www\.)[^\s<>\"']+", re.IGNORECASE)
+URL_TRAILING_PUNCTUATION = ".,;:!?)]}'\""
+
+def _unique(values: List[str]) -> List[str]:
+    """Buang duplikat (tanpa membedakan huruf besar/kecil) dengan urutan kemunculan tetap"""
+    seen = set()
+    result = []
+    for value in values:
+        key = value.casefold()
+        if key not in seen:
+            seen.add(key)
+            result.append(value)
+    return result
+
+class LocalExtractor:
+    """
+    Ekstraksi deterministik tanpa LLM: hashtag, mention, URL dan lokasi setingkat provinsi.
+    Alias provinsi dikompilasi sekali ke automaton Aho-Corasick (trie dengan failure link).
+    """
+    
+    def __init__(self, gazetteer: Dict[str, List[str]]):
+        owners: Dict[str, str] = {}
+        for province, aliases in gazetteer.items():
+            for alias in [province] + aliases:
+                pattern = normalize_text(alias)
+                if pattern.strip():
+                    owners.setdefault(pattern, province)
+        
+        self._patterns = list(owners.keys())
+        self._provinces = [owners[pattern] for pattern in self._patterns]
+        self._automaton = AhoCorasick(self._patterns)
+        self._aliases = {pattern.strip(): province for pattern, province in owners.items()}
+    
+    def find_provinces(self, content: str) -> List[str]:
+        """Provinsi yang disebut di konten; alias yang tumpang tindih diambil yang terpanjang"""
+        text = normalize_text(content)
+        spans = []
+        for end, pattern_id in self._automaton.search_spans(text):
+            # Pattern diapit spasi; spasi pembatas boleh dipakai bersama oleh dua kecocokan berurutan
+            length = len(self._patterns[pattern_id])
+            spans.append((end - length + 2, end - 1, pattern_id))
+        
+        provinces = []
+        last_end = -1
+        for start, end, pattern_id in sorted(spans, key=lambda span: (span[0], -(span[1] - span[0]))):
+            if start <= last_end:
+                continue
+            provinces.append(self._provinces[pattern_id])
+            last_end = end
+        return _unique(provinces)
+    
+    def canonicalize_location(self, location: str) -> Optional[str]:
+        """Nama provinsi baku untuk sebuah lokasi (mis. "Bandung" -> "Jawa Barat"), None jika tidak dikenal"""
+        return self._aliases.get(normalize_text(location).strip())
+    
+    def extract(self, content: str) -> Dict[str, List[str]]:
+        """Hashtag, mention, URL dan provinsi yang ditemukan di konten"""
+        urls = []
+        for match in URL_PATTERN.finditer(content or ""):
+            urls.append(match.group(0).rstrip(URL_TRAILING_PUNCTUATION))
+        
+        # URL dihapus dulu agar fragmen "#..." dan "@..." di dalamnya tidak terbaca sebagai hashtag/mention
+        text = URL_PATTERN.sub(" ", content or "")
+        return {
+            "hashtags": _unique(["#" + tag for tag in HASHTAG_PATTERN.findall(text)]),
+            "mentions": _unique(["@" + mention for mention in MENTION_PATTERN.findall(text)]),
+            "urls": _unique(urls),
+            "locations": self.find_provinces(text)
+        }
+    
+    def merge_hashtags(self, local_hashtags: List[str], llm_hashtags: List[str]) -> List[str]:
+        """Gabungkan hashtag lokal dan hasil LLM, semuanya dalam format #tag"""
+        merged = list(local_hashtags)
+        for hashtag in llm_hashtags:
+            if isinstance(hashtag, str) and hashtag.strip("# "):
+                merged.append("#" + hashtag.strip().lstrip("#"))
+        return _unique(merged)
+    
+    def merge_locations(self, local_locations: List[str], llm_locations: List[str]) -> List[str]:
+        """Gabungkan lokasi lokal dan hasil LLM; lokasi LLM yang dikenal dinormalisasi ke nama provinsi"""
+        merged = list(local_locations)
+        for location in llm_locations:
+            if isinstance(location, str) and location.strip():
+                merged.append(self.canonicalize_location(location) or location.strip())
+        return _unique(merged)
+
+# Global instance
+local_extractor = LocalExtractor(PROVINCE_GAZETTEER)
@@ -1,19 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
+from starlette.requests import ClientDisconnect
 from datetime import datetime
+import asyncio
+import json
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, AsyncIterator, Union
 
 from models import (
     ProcessingRequest, 
     ProcessingResponse, 
     ExtractionRequest, 
     ClassificationRequest,
+    BatchProcessingRequest,
+    BatchProcessingResponse,
+    JobSubmitRequest,
+    JobSubmitResponse,
+    JobStatusResponse,
     ErrorResponse
 )
-from services import DataExtractionService, ContentClassificationService
+from services import DataExtractionService, ContentClassificationService, ComplaintProcessingService
+from arkmodel_client import http_client_manager, single_flight, rate_governor, retry_policy, circuit_breaker
+from database import db_pool
+from result_cache import result_cache
+from write_behind import write_behind, persist_result
+from job_queue import JobQueue
 from config import settings
 from unit_kerja_service import unit_kerja_service
+from near_duplicate import near_duplicate_index
+from metrics import registry, MetricsMiddleware
+from token_usage import token_usage
+from tracing import tracer, TracingMiddleware
 
 # Inisialisasi FastAPI
 app = FastAPI(
@@ -29,11 +47,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Metrics middleware (di luar CORS, agar latency mencakup middleware lain)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Request id (X-Request-ID) dan root span per request; ditambahkan terakhir sehingga menjadi middleware terluar
+app.add_middleware(TracingMiddleware)
+
 # Inisialisasi services
 extraction_service = DataExtractionService()
 classification_service = ContentClassificationService()
+processing_service = ComplaintProcessingService(extraction_service, classification_service)
+job_queue = JobQueue(processing_service)
+
+# Gauge dibaca saat /metrics dipanggil, bukan di jalur request
+CIRCUIT_BREAKER_STATES = {circuit_breaker.CLOSED: 0, circuit_breaker.HALF_OPEN: 1, circuit_breaker.OPEN: 2}
+registry.gauge("arkmodel_in_flight_requests", "Request ArkModel yang sedang berjalan").set_function(lambda: rate_governor.in_flight)
+registry.gauge("arkmodel_queue_depth", "Request yang menunggu di rate governor ArkModel").set_function(lambda: rate_governor.waiting)
+registry.gauge("arkmodel_circuit_breaker_state", "State circuit breaker ArkModel (0=closed, 1=half_open, 2=open)").set_function(lambda: CIRCUIT_BREAKER_STATES[circuit_breaker.state])
+registry.gauge("db_pool_size", "Jumlah koneksi di pool database").set_function(lambda: db_pool.get_stats()["size"])
+registry.gauge("db_pool_idle_connections", "Koneksi idle di pool database").set_function(lambda: db_pool.get_stats()["idle_connections"])
+registry.gauge("unit_kerja_cache_last_refresh_age_seconds", "Detik sejak cache unit kerja terakhir dimuat dari database").set_function(unit_kerja_service.get_cache_age)
+registry.gauge("write_behind_queue_size", "Hasil yang menunggu ditulis ke database").set_function(lambda: write_behind.get_stats()["queued"])
+
+@app.on_event("startup")
+async def startup_event():
+    """Inisialisasi resource bersama saat aplikasi start"""
+    await http_client_manager.start()
+    await db_pool.start()
+    await unit_kerja_service.start()
+    # Index near-duplicate dibangun ulang dari extraction_data di background
+    near_duplicate_index.start()
+    await write_behind.start()
+    await token_usage.start()
+    await tracer.start()
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Tutup resource bersama saat aplikasi berhenti"""
+    await job_queue.stop()
+    await near_duplicate_index.stop()
+    await unit_kerja_service.stop()
+    await http_client_manager.close()
+    # Flush antrean write-behind dan agregat token sebelum pool database ditutup
+    await write_behind.stop()
+    await token_usage.stop()
+    await db_pool.close()
+    await tracer.stop()
 
 @app.get("/")
 async def root():
@@ -48,14 +112,31 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {
-        "status": "healthy",
+        # Circuit breaker terbuka: API tetap jalan tetapi request ke ArkModel ditolak
+        "status": "healthy" if circuit_breaker.state == circuit_breaker.CLOSED else "degraded",
         "timestamp": datetime.now(),
         "services": {
             "extraction": "ready",
             "classification": "ready"
-        }
+        },
+        "arkmodel_http_pool": http_client_manager.get_stats(),
+        "arkmodel_single_flight": single_flight.get_stats(),
+        "arkmodel_rate_limiter": rate_governor.get_stats(),
+        "arkmodel_retry": retry_policy.get_stats(),
+        "arkmodel_circuit_breaker": circuit_breaker.get_stats(),
+        "tracing": tracer.get_stats()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Endpoint metrics dalam format teks Prometheus (histogram latency dan counter upstream)
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    
+    return Response(content=registry.render(), media_type=registry.CONTENT_TYPE)
+
 @app.post("/extract", response_model=Dict[str, Any])
 async def extract_data(request: ExtractionRequest):
     """
@@ -65,7 +146,7 @@ async def extract_data(request: ExtractionRequest):
         start_time = time.time()
         
         # Ekstraksi data
-        extraction_result = await extraction_service.extract_from_content(
+        extraction_result, cache_hit = await extraction_service.extract_cached(
             content=request.content,
             language=request.language,
             from_field=request.from_field,
@@ -74,14 +155,22 @@ async def extract_data(request: ExtractionRequest):
         
         processing_time = time.time() - start_time
         
+        persist_result(
+            "extract", request.content, request.language, request.from_field, request.type,
+            extraction=extraction_result,
+            processing_time=processing_time
+        )
+        
         return {
             "success": True,
             "data": extraction_result.dict(),
+            "cache_hit": cache_hit,
             "processing_time": processing_time,
             "timestamp": datetime.now()
         }
-        
+    
     except Exception as e:
+        persist_result("extract", request.content, request.language, request.from_field, request.type, error=str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error during extraction: {str(e)}"
@@ -96,7 +185,7 @@ async def classify_content(request: ClassificationRequest):
         start_time = time.time()
         
         # Klasifikasi konten
-        classification_result = await classification_service.classify_content(
+        classification_result, cache_hit = await classification_service.classify_cached(
             content=request.content,
             language=request.language,
             from_field=request.from_field,
@@ -105,58 +194,272 @@ async def classify_content(request: ClassificationRequest):
         
         processing_time = time.time() - start_time
         
+        persist_result(
+            "classify", request.content, request.language, request.from_field, request.type,
+            classification=classification_result,
+            processing_time=processing_time
+        )
+        
         return {
             "success": True,
             "data": classification_result.dict(),
+            "cache_hit": cache_hit,
             "processing_time": processing_time,
             "timestamp": datetime.now()
         }
-        
+    
     except Exception as e:
+        persist_result("classify", request.content, request.language, request.from_field, request.type, error=str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Error during classification: {str(e)}"
         )
 
 @app.post("/process", response_model=ProcessingResponse)
+@tracer.traced("process_complaint")
 async def process_complaint(request: ProcessingRequest):
     """
     Endpoint utama untuk memproses aduan/laporan secara lengkap
-    Melakukan ekstraksi dan klasifikasi dalam satu request
+    Melakukan ekstraksi dan klasifikasi secara bersamaan dalam satu request
     """
     try:
-        start_time = time.time()
-        
-        # Step 1: Ekstraksi data
-        extraction_result = await extraction_service.extract_from_content(
+        return await processing_service.process(
             content=request.content,
             language=request.language,
             from_field=request.from_field,
-            type=request.type
+            type=request.type,
+            failure_mode=request.failure_mode,
+            mode=request.mode
         )
-        
-        # Step 2: Klasifikasi konten
-        classification_result = await classification_service.classify_content(
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error during processing: {str(e)}"
+        )
+
+@app.post("/process/stream")
+async def process_complaint_stream(request: ProcessingRequest):
+    """
+    Endpoint /process dengan response streaming NDJSON
+    Setiap baris adalah satu event: "field" segera setelah sebuah field dari ArkModel lengkap,
+    "error" untuk tahap yang gagal (mode partial), lalu "result" berisi ProcessingResponse final.
+    """
+    async def generate():
+        async for event in processing_service.process_stream(
             content=request.content,
             language=request.language,
             from_field=request.from_field,
-            type=request.type
+            type=request.type,
+            failure_mode=request.failure_mode,
+            mode=request.mode
+        ):
+            yield event.json() + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.post("/process/batch", response_model=BatchProcessingResponse)
+async def process_batch(request: BatchProcessingRequest):
+    """
+    Endpoint untuk memproses banyak aduan/laporan sekaligus
+    Item diproses paralel dengan concurrency terbatas, hasil dikembalikan sesuai urutan input
+    """
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.items)} items (max {settings.batch_max_items})"
         )
-        
-        processing_time = time.time() - start_time
-        
-        return ProcessingResponse(
-            extraction=extraction_result,
-            classification=classification_result,
-            processing_time=processing_time,
-            timestamp=datetime.now()
+    
+    return await processing_service.process_batch(request.items, request.concurrency)
+
+class IncrementalStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse yang tidak mendengarkan receive() untuk deteksi disconnect.
+    StreamingResponse bawaan membaca receive() secara paralel sehingga mengambil potongan
+    body request yang masih dibaca bertahap oleh generator NDJSON. Disconnect dideteksi oleh
+    generator sendiri lewat NDJSONBodyReader atau request.is_disconnected().
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+class NDJSONBodyReader:
+    """
+    Satu-satunya pembaca receive() untuk body NDJSON: potongan body diteruskan lewat antrean
+    terbatas (backpressure tetap berlaku), lalu setelah body habis menunggu http.disconnect
+    sehingga client yang putus terdeteksi walaupun item masih diproses.
+    """
+    
+    MAX_PENDING_CHUNKS = 4
+    
+    def __init__(self, request: Request):
+        self._chunks: asyncio.Queue = asyncio.Queue(self.MAX_PENDING_CHUNKS)
+        self._disconnected = asyncio.Event()
+        self._task = asyncio.create_task(self._read(request))
+    
+    async def _read(self, request: Request):
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await self._chunks.put(chunk)
+            await self._chunks.put(None)
+            while (await request.receive())["type"] != "http.disconnect":
+                pass
+        except ClientDisconnect as e:
+            await self._chunks.put(e)
+        self._disconnected.set()
+    
+    def is_disconnected(self) -> bool:
+        return self._disconnected.is_set()
+    
+    async def items(self) -> AsyncIterator[Union[ProcessingRequest, Exception]]:
+        """Satu ProcessingRequest per baris"""
+        buffer = b""
+        while True:
+            chunk = await self._chunks.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_ndjson_line(line)
+        if buffer.strip():
+            yield _parse_ndjson_line(buffer)
+    
+    def close(self):
+        self._task.cancel()
+
+def _parse_ndjson_line(line: bytes) -> Union[ProcessingRequest, Exception]:
+    """Parse satu baris NDJSON, error dikembalikan agar menjadi entri error item tersebut"""
+    try:
+        return ProcessingRequest(**json.loads(line))
+    except Exception as e:
+        return e
+
+async def _iter_list_items(items):
+    for item in items:
+        yield item
+
+@app.post("/process/batch/stream")
+async def process_batch_stream(request: Request, concurrency: Optional[int] = None):
+    """
+    Endpoint batch dengan response streaming NDJSON
+    Setiap baris berisi hasil satu item (dengan index input) segera setelah item selesai diproses.
+    Body dapat berupa JSON BatchProcessingRequest atau NDJSON (satu ProcessingRequest per baris,
+    Content-Type application/x-ndjson) yang dibaca secara bertahap.
+    """
+    content_type = request.headers.get("content-type", "")
+    reader = None
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        reader = NDJSONBodyReader(request)
+        items = reader.items()
+    else:
+        try:
+            batch_request = BatchProcessingRequest(**(await request.json()))
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Invalid batch request: {str(e)}")
+        if len(batch_request.items) > settings.batch_max_items:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large: {len(batch_request.items)} items (max {settings.batch_max_items})"
+            )
+        items = _iter_list_items(batch_request.items)
+        concurrency = concurrency or batch_request.concurrency
+    
+    async def is_disconnected() -> bool:
+        # Body JSON sudah terbaca habis sehingga receive() aman dipakai langsung
+        return reader.is_disconnected() if reader is not None else await request.is_disconnected()
+    
+    async def generate():
+        results = processing_service.stream_batch(items, concurrency)
+        try:
+            async for result in results:
+                yield result.json() + "\n"
+                # Client yang sudah putus tidak perlu diproses lagi (kuota dan budget token ArkModel)
+                if await is_disconnected():
+                    print("Client disconnected from batch stream, cancelling remaining items")
+                    break
+        finally:
+            # Batalkan item yang masih berjalan di stream_batch
+            await results.aclose()
+            if reader is not None:
+                reader.close()
+    
+    return IncrementalStreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(request: JobSubmitRequest):
+    """
+    Endpoint untuk mengirim aduan/laporan sebagai job asynchronous
+    Job id langsung dikembalikan; hasil diambil melalui GET /jobs/{job_id} atau callback_url
+    """
+    try:
+        job = await job_queue.submit(request, request.callback_url)
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error submitting job: {str(e)}"
         )
-        
+    
+    return JobSubmitResponse(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=job["created_at"]
+    )
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    """
+    Endpoint untuk melihat kedalaman antrean job dan statistik worker
+    """
+    try:
+        stats = await job_queue.get_stats()
     except Exception as e:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error during processing: {str(e)}"
+            status_code=503,
+            detail=f"Error getting job stats: {str(e)}"
         )
+    
+    return {
+        "success": True,
+        "data": stats,
+        "timestamp": datetime.now()
+    }
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Endpoint untuk polling status dan hasil job
+    """
+    try:
+        job = await job_queue.get(job_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error getting job: {str(e)}"
+        )
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        max_attempts=job["max_attempts"],
+        result=job["result"],
+        error=job["error"],
+        callback_url=job["callback_url"],
+        callback_status=job["callback_status"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        completed_at=job["completed_at"]
+    )
 
 @app.get("/units")
 async def get_available_units():
@@ -172,7 +475,7 @@ async def get_available_units():
             "timestamp": datetime.now(),
             "source": "database"
         }
-        
+    
     except Exception as e:
         # Fallback to static data
         from config import FALLBACK_UNIT_KERJA_DATA
@@ -207,13 +510,57 @@ async def refresh_unit_kerja_cache():
             "message": "Unit kerja cache refreshed successfully",
             "timestamp": datetime.now()
         }
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error refreshing cache: {str(e)}"
         )
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Endpoint untuk melihat statistik result cache (hit/miss)
+    """
+    return {
+        "success": True,
+        "data": result_cache.get_stats(),
+        "near_duplicate": near_duplicate_index.get_stats(),
+        "timestamp": datetime.now()
+    }
+
+@app.post("/cache/near-duplicates/rebuild")
+async def rebuild_near_duplicate_index():
+    """
+    Endpoint untuk membangun ulang index near-duplicate dari extraction_data
+    """
+    try:
+        rows = await near_duplicate_index.rebuild()
+        
+        return {
+            "success": True,
+            "message": f"Near-duplicate index rebuilt from {rows} extraction_data rows",
+            "data": near_duplicate_index.get_stats(),
+            "timestamp": datetime.now()
+        }
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error rebuilding near-duplicate index: {str(e)}"
+        )
+
+@app.get("/usage/stats")
+async def get_usage_stats():
+    """
+    Endpoint untuk melihat pemakaian token ArkModel per from_field/type dan status budget per source
+    """
+    return {
+        "success": True,
+        "data": token_usage.get_stats(),
+        "timestamp": datetime.now()
+    }
+
 @app.get("/database/status")
 async def get_database_status():
     """
@@ -225,13 +572,19 @@ async def get_database_status():
         return {
             "success": True,
             "database_connected": is_connected,
+            "pool": db_pool.get_stats(),
+            "write_behind": write_behind.get_stats(),
+            "unit_kerja_cache": unit_kerja_service.get_stats(),
             "timestamp": datetime.now()
         }
-        
+    
     except Exception as e:
         return {
             "success": False,
             "database_connected": False,
+            "pool": db_pool.get_stats(),
+            "write_behind": write_behind.get_stats(),
+            "unit_kerja_cache": unit_kerja_service.get_stats(),
             "error": str(e),
             "timestamp": datetime.now()
         }
@@ -0,0 +1,249 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# Bucket default (detik) untuk latency request dan ArkModel
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Operasi lokal yang jauh lebih cepat: parse JSON, acquire pool, query database
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Umur cache unit kerja saat dipakai (detik)
+AGE_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type_name = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    """Counter monoton per kombinasi label"""
+    
+    type_name = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(_Metric):
+    """Nilai sesaat; bisa diisi langsung atau dibaca dari fungsi saat /metrics dipanggil"""
+    
+    type_name = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Optional[float]]] = None
+    
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+    
+    def set_function(self, function: Callable[[], Optional[float]]):
+        """Nilai dihitung saat render, sehingga tidak ada biaya di jalur request"""
+        self._function = function
+    
+    def render(self) -> List[str]:
+        lines = self.header()
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                print(f"Error collecting metric {self.name}: {e}")
+                value = None
+            if value is not None:
+                lines.append(f"{self.name} {_format_value(value)}")
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram(_Metric):
+    """Histogram dengan bucket tetap; observe hanya bisect dan dua penjumlahan"""
+    
+    type_name = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label: [jumlah per bucket (non-kumulatif, terakhir = +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._values[key] = state
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Catat durasi blok with (termasuk jika blok melempar exception)"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+    
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Kumpulan metric proses ini dalam format teks Prometheus (exposition format 0.0.4)"""
+    
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+    
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+    
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global registry dan metric yang dipakai lintas modul
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latency request HTTP per route", ("method", "route", "status")
+)
+arkmodel_request_duration = registry.histogram(
+    "arkmodel_request_duration_seconds", "Latency satu percobaan request ArkModel per operasi", ("operation", "mode")
+)
+arkmodel_queue_wait = registry.histogram(
+    "arkmodel_queue_wait_seconds", "Waktu tunggu di rate governor ArkModel sebelum request dikirim"
+)
+arkmodel_responses = registry.counter(
+    "arkmodel_responses_total", "Response ArkModel per operasi dan status code (timeout/error untuk kegagalan transport)", ("operation", "status")
+)
+arkmodel_retries = registry.counter(
+    "arkmodel_retries_total", "Retry request ArkModel per operasi", ("operation",)
+)
+arkmodel_tokens = registry.counter(
+    "arkmodel_tokens_total", "Pemakaian token ArkModel dari field usage response", ("operation", "type")
+)
+token_budget_exceeded = registry.counter(
+    "token_budget_exceeded_total", "Request dari source yang melewati budget token (throttle, cheap_model, rejected)", ("action",)
+)
+fallbacks = registry.counter(
+    "fallbacks_total", "Hasil mode degraded (fallback lokal) per tahap", ("stage",)
+)
+json_parse_duration = registry.histogram(
+    "json_parse_duration_seconds", "Waktu parse JSON output ArkModel per tahap", ("stage",), FAST_BUCKETS
+)
+db_pool_acquire_duration = registry.histogram(
+    "db_pool_acquire_duration_seconds", "Waktu tunggu acquire koneksi dari pool database", (), FAST_BUCKETS
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Durasi query database per jenis statement", ("statement",), FAST_BUCKETS
+)
+unit_kerja_cache_age = registry.histogram(
+    "unit_kerja_cache_age_seconds", "Umur cache unit kerja saat dipakai", (), AGE_BUCKETS
+)
+
+class RouteLabels:
+    """Template path route (mis. /jobs/{job_id}) dari endpoint yang dipilih router, agar kardinalitas tetap kecil"""
+    
+    def __init__(self):
+        self._routes: Optional[Dict[Any, str]] = None
+    
+    def __call__(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {
+                getattr(route, "endpoint", None): route.path
+                for route in getattr(scope.get("app"), "routes", [])
+                if getattr(route, "endpoint", None) is not None
+            }
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI murni untuk latency per route. Tidak memakai BaseHTTPMiddleware agar
+    body request NDJSON dan response streaming tetap mengalir tanpa di-buffer.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._route_label = RouteLabels()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status = [500]
+        
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Untuk response streaming, durasi dihitung sampai body terakhir terkirim
+            http_request_duration.observe(
+                time.perf_counter() - start_time,
+                method=scope.get("method", ""),
+                route=self._route_label(scope),
+                status=status[0]
+            )
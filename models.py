@@ -1,6 +1,9 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+import ipaddress
+from pydantic import BaseModel, validator
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
+from urllib.parse import urlsplit
+from config import settings
 
 class ExtractionRequest(BaseModel):
     content: str
@@ -17,6 +20,13 @@ class Emotion(BaseModel):
     emotion: str
     confidence: float
 
+class NearDuplicateMatch(BaseModel):
+    content_hash: str  # Hash konten asli yang hasilnya dipakai ulang
+    similarity: float  # Estimasi Jaccard (MinHash) terhadap konten asli
+    extraction_data_id: Optional[int] = None  # id baris extraction_data konten asli, jika dimuat dari database
+    content_preview: str
+    processed_at: datetime
+
 class ExtractionResult(BaseModel):
     topic: List[str]
     sentiment: str
@@ -26,6 +36,9 @@ class ExtractionResult(BaseModel):
     locations: List[str]
     hashtags: List[str]
     summary: str
+    mentions: List[str] = []  # Diekstrak lokal (regex), bukan oleh ArkModel
+    urls: List[str] = []  # Diekstrak lokal (regex), bukan oleh ArkModel
+    near_duplicate: Optional[NearDuplicateMatch] = None  # Diisi jika hasil dipakai ulang dari aduan yang hampir sama
 
 class ClassificationRequest(BaseModel):
     content: str
@@ -44,19 +57,127 @@ class ClassificationResult(BaseModel):
     recommended_unit: UnitKerja
     alternative_units: List[UnitKerja]
     classification_reason: str
+    source: str = "arkmodel"  # "arkmodel", "keyword" (pre-classifier lokal) atau "fallback" (mode degraded)
+    catalog_version: Optional[str] = None  # Versi katalog unit kerja yang dipakai saat klasifikasi
+    degraded: bool = False  # True jika ArkModel tidak tersedia dan hasil berasal dari klasifikasi lokal
+    near_duplicate: Optional[NearDuplicateMatch] = None  # Diisi jika hasil dipakai ulang dari aduan yang hampir sama
 
 class ProcessingRequest(BaseModel):
     content: str
     language: Optional[str] = "id"
     from_field: Optional[str] = None  # Field untuk mengetahui sumber aduan
     type: Optional[str] = None  # Field untuk mengetahui tipe aduan
+    failure_mode: Optional[Literal["fail", "partial"]] = None  # Default dari Settings (PROCESS_FAILURE_MODE)
+    mode: Optional[Literal["separate", "combined"]] = None  # Default dari Settings (PROCESS_MODE)
+
+class StageTimings(BaseModel):
+    extraction: Optional[float] = None
+    classification: Optional[float] = None
+    combined: Optional[float] = None  # Durasi request tunggal pada mode "combined"
+    total: float
 
 class ProcessingResponse(BaseModel):
-    extraction: ExtractionResult
-    classification: ClassificationResult
+    extraction: Optional[ExtractionResult] = None
+    classification: Optional[ClassificationResult] = None
+    errors: Optional[Dict[str, str]] = None  # Error per tahap jika mode "partial"
+    cache_hit: bool = False  # True jika seluruh hasil diambil dari result cache
+    degraded: bool = False  # True jika ArkModel tidak tersedia dan klasifikasi berasal dari fallback lokal
     processing_time: float
+    stage_timings: Optional[StageTimings] = None
+    timestamp: datetime
+
+class ProcessingStreamEvent(BaseModel):
+    event: str  # "field" (satu field tahap sudah lengkap), "error" (tahap gagal) atau "result" (hasil akhir)
+    stage: Optional[str] = None  # "extraction" atau "classification"
+    field: Optional[str] = None
+    value: Optional[Any] = None  # Nilai mentah dari ArkModel; nilai final ada di event "result"
+    error: Optional[str] = None
+    result: Optional[ProcessingResponse] = None
+
+class BatchProcessingRequest(BaseModel):
+    items: List[ProcessingRequest]
+    concurrency: Optional[int] = None  # Default dari Settings, dibatasi batch_max_concurrency
+
+class BatchItemResult(BaseModel):
+    index: int  # Posisi item pada request
+    success: bool
+    result: Optional[ProcessingResponse] = None
+    error: Optional[str] = None
+
+class BatchStats(BaseModel):
+    total_items: int
+    succeeded: int
+    failed: int
+    cache_hits: int
+    total_time: float
+    p50_item_time: float
+    p95_item_time: float
+
+class BatchProcessingResponse(BaseModel):
+    results: List[BatchItemResult]
+    stats: BatchStats
     timestamp: datetime
 
+def _host_allowed(host: str, allowed_hosts: List[str]) -> bool:
+    return any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in allowed_hosts)
+
+def callback_allowed_hosts() -> List[str]:
+    """Host dari JOB_CALLBACK_ALLOWED_HOSTS (huruf kecil)"""
+    return [item.strip().lower() for item in settings.job_callback_allowed_hosts.split(",") if item.strip()]
+
+def callback_host_allowed(host: str) -> bool:
+    """True jika host ada di allowlist callback (dipercaya operator, boleh alamat internal)"""
+    return _host_allowed(host.lower(), callback_allowed_hosts())
+
+def validate_callback_url(url: str) -> str:
+    """
+    Cegah SSRF: hanya http/https, host dari allowlist (jika diisi), bukan alamat internal.
+    Hostname di-resolve lagi oleh worker tepat sebelum callback dikirim (lihat JobQueue._resolve_callback).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an absolute http or https URL")
+    host = parts.hostname.lower()
+    allowed_hosts = callback_allowed_hosts()
+    if _host_allowed(host, allowed_hosts):
+        return url
+    if allowed_hosts:
+        raise ValueError(f"callback_url host '{host}' is not in JOB_CALLBACK_ALLOWED_HOSTS")
+    if host == "localhost" or host.endswith(".localhost"):
+        raise ValueError("callback_url must not point to an internal address")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return url
+    if not address.is_global:
+        raise ValueError("callback_url must not point to an internal address")
+    return url
+
+class JobSubmitRequest(ProcessingRequest):
+    callback_url: Optional[str] = None  # URL yang menerima POST hasil job setelah selesai
+    
+    @validator("callback_url")
+    def check_callback_url(cls, value: Optional[str]) -> Optional[str]:
+        return validate_callback_url(value) if value else value
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    attempts: int
+    max_attempts: int
+    result: Optional[ProcessingResponse] = None
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+    callback_status: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str] = None
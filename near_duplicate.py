@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set, Tuple
+import numpy as np
+from config import settings
+from database import db_pool
+from result_cache import normalize_content
+
+# Prime terbesar di bawah 2^32: nilai hash muat di uint32 dan a*x+b tidak overflow di uint64
+HASH_PRIME = 4294967291
+
+# Kandidat LSH selalu diverifikasi dengan estimasi similarity, jadi false negative lebih mahal dari false positive
+FALSE_POSITIVE_WEIGHT = 0.3
+FALSE_NEGATIVE_WEIGHT = 0.7
+
+# extraction_data tidak menyimpan versi katalog unit kerja, jadi hanya hasil ekstraksi yang dimuat ulang
+NEAR_DUPLICATE_REBUILD_SQL = """
+    SELECT id, content, language,
+           topic, sentiment, sentiment_score, emotions, entities, locations, hashtags, summary,
+           EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - created_at)) AS age
+    FROM extraction_data
+    WHERE created_at > CURRENT_TIMESTAMP - $1 * INTERVAL '1 second'
+      AND sentiment IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT $2
+"""
+
+def _shingles(content: str, size: int) -> Set[str]:
+    """Shingle kata (w-shingling) dari konten ternormalisasi"""
+    tokens = re.findall(r"\w+", normalize_content(content))
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pilih (bands, rows) LSH yang meminimalkan false positive/negative berbobot di sekitar threshold"""
+    def integrate(fn, start: float, end: float) -> float:
+        points = np.linspace(start, end, 101)
+        return float(np.mean(fn(points))) * (end - start)
+    
+    best, best_error = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        false_positive = integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+        false_negative = integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+        error = FALSE_POSITIVE_WEIGHT * false_positive + FALSE_NEGATIVE_WEIGHT * false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+class _Entry:
+    """Satu konten yang sudah diproses; hasil disimpan sebagai JSON agar memori per entri tetap kecil"""
+    
+    __slots__ = ("content_hash", "language", "signature", "band_keys", "created_at",
+                 "extraction", "classification", "catalog_version", "extraction_data_id", "content_preview")
+    
+    def __init__(self, content_hash: str, language: str, signature: np.ndarray, band_keys: List[int], content_preview: str):
+        self.content_hash = content_hash
+        self.language = language
+        self.signature = signature
+        self.band_keys = band_keys
+        self.created_at = time.time()
+        self.extraction: Optional[str] = None
+        self.classification: Optional[str] = None
+        self.catalog_version: Optional[str] = None
+        self.extraction_data_id: Optional[int] = None
+        self.content_preview = content_preview
+
+class NearDuplicateIndex:
+    """
+    Index MinHash + LSH atas konten yang baru diproses, untuk memakai ulang hasil ArkModel
+    pada aduan yang hampir sama (laporan hoax terkoordinasi, template copy-paste).
+    Jumlah entri dibatasi dan entri di luar jendela waktu dibuang; index bisa dibangun ulang dari extraction_data.
+    """
+    
+    def __init__(self, num_perm: int, threshold: float, shingle_size: int, max_entries: int, window: float):
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.window = window
+        self.bands, self.rows = _optimal_bands(num_perm, threshold)
+        
+        # Permutasi h(x) = (a*x + b) mod p, deterministik agar signature sama di setiap worker
+        generator = np.random.RandomState(1)
+        self._a = generator.randint(1, HASH_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, HASH_PRIME, size=num_perm, dtype=np.uint64)
+        
+        self._reset()
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.rebuilds = 0
+        self.last_rebuild_rows = 0
+        self.last_rebuild_duration = 0.0
+        self.last_rebuild_error: Optional[str] = None
+    
+    def _reset(self):
+        # Urutan entri = urutan waktu diproses, sehingga eviksi selalu dari depan
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_hash: Dict[str, int] = {}
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(self.bands)]
+        self._next_id = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.near_duplicate_enabled and self.max_entries > 0
+    
+    def signature(self, content: str) -> Optional[np.ndarray]:
+        """Signature MinHash (num_perm nilai uint32), None untuk konten tanpa kata"""
+        shingles = _shingles(content, self.shingle_size)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        values = (np.outer(hashes, self._a) + self._b) % np.uint64(HASH_PRIME)
+        return values.min(axis=0).astype(np.uint32)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+    
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        if self._by_hash.get(entry.content_hash) == entry_id:
+            del self._by_hash[entry.content_hash]
+        for band, key in enumerate(entry.band_keys):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
+    
+    def _evict(self):
+        """Buang entri di luar jendela waktu dan entri tertua di atas batas ukuran"""
+        cutoff = time.time() - self.window
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if entry.created_at >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._remove(entry_id)
+            self.evicted += 1
+    
+    def add(self, content: str, language: str = "id", extraction: Optional[Dict[str, Any]] = None,
+            classification: Optional[Dict[str, Any]] = None, catalog_version: Optional[str] = None,
+            extraction_data_id: Optional[int] = None, created_at: Optional[float] = None):
+        """Simpan hasil untuk konten; konten yang sama (setelah normalisasi) memperbarui entri yang ada"""
+        if not self.enabled:
+            return
+        content_hash = hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()[:16]
+        entry_id = self._by_hash.get(content_hash)
+        if entry_id is not None:
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            entry.created_at = time.time()
+        else:
+            signature = self.signature(content)
+            if signature is None:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = _Entry(content_hash, language or "id", signature, self._band_keys(signature), content[:200])
+            self._entries[entry_id] = entry
+            self._by_hash[content_hash] = entry_id
+            for band, key in enumerate(entry.band_keys):
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+        
+        if created_at is not None:
+            entry.created_at = created_at
+        if extraction is not None:
+            entry.extraction = json.dumps(extraction, default=str)
+        if classification is not None:
+            entry.classification = json.dumps(classification, default=str)
+            entry.catalog_version = catalog_version
+        if extraction_data_id is not None:
+            entry.extraction_data_id = extraction_data_id
+        self._evict()
+    
+    def find(self, content: str, language: str = "id", part: str = "extraction", catalog_version: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Cari konten yang hampir sama dengan hasil untuk part ("extraction" atau "classification").
+        Mengembalikan (hasil tersimpan, info konten asli) atau None. Hasil klasifikasi hanya dipakai
+        ulang jika dibuat dengan versi katalog unit kerja yang sama.
+        """
+        if not self.enabled:
+            return None
+        self._evict()
+        signature = self.signature(content)
+        if signature is None:
+            return None
+        
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+        
+        best: Optional[Tuple[float, _Entry, str]] = None
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            stored = entry.extraction if part == "extraction" else entry.classification
+            if stored is None or entry.language != (language or "id"):
+                continue
+            if part == "classification" and entry.catalog_version != catalog_version:
+                continue
+            # Estimasi Jaccard: proporsi nilai MinHash yang sama
+            similarity = float(np.count_nonzero(entry.signature == signature)) / self.num_perm
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, entry, stored)
+        
+        if best is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        similarity, entry, stored = best
+        return json.loads(stored), {
+            "content_hash": entry.content_hash,
+            "similarity": round(similarity, 4),
+            "extraction_data_id": entry.extraction_data_id,
+            "content_preview": entry.content_preview,
+            "processed_at": datetime.now() - timedelta(seconds=time.time() - entry.created_at)
+        }
+    
+    async def rebuild(self) -> int:
+        """
+        Bangun ulang index dari baris extraction_data dalam jendela waktu.
+        Hanya hasil ekstraksi yang dimuat: versi katalog saat klasifikasi tidak tersimpan, sehingga
+        klasifikasi lama bisa merekomendasikan unit dari katalog yang sudah berubah.
+        """
+        start_time = time.perf_counter()
+        started_at = time.time()
+        try:
+            async with db_pool.acquire() as conn:
+                rows = await conn.fetch(NEAR_DUPLICATE_REBUILD_SQL, float(self.window), self.max_entries)
+        except Exception as e:
+            self.last_rebuild_error = str(e)
+            raise
+        
+        # Entri yang ditambahkan selama query tetap dipertahankan
+        recent = [entry for entry in self._entries.values() if entry.created_at >= started_at]
+        self._reset()
+        now = time.time()
+        for row in reversed(rows):
+            self.add(
+                row["content"], row["language"],
+                extraction=_row_extraction(row),
+                extraction_data_id=row["id"],
+                created_at=now - float(row["age"])
+            )
+        for entry in recent:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._by_hash[entry.content_hash] = entry_id
+            for band, key in enumerate(entry.band_keys):
+                self._buckets[band].setdefault(key, set()).add(entry_id)
+        self._evict()
+        
+        self.rebuilds += 1
+        self.last_rebuild_rows = len(rows)
+        self.last_rebuild_duration = time.perf_counter() - start_time
+        self.last_rebuild_error = None
+        return len(rows)
+    
+    def start(self):
+        """Rebuild di background saat startup agar aplikasi tidak menunggu query extraction_data"""
+        if not self.enabled or (self._rebuild_task is not None and not self._rebuild_task.done()):
+            return
+        self._rebuild_task = asyncio.create_task(self._background_rebuild())
+    
+    async def _background_rebuild(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            print(f"Error rebuilding near-duplicate index: {e}")
+    
+    async def stop(self):
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            await asyncio.gather(self._rebuild_task, return_exceptions=True)
+            self._rebuild_task = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "window": self.window,
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "rows": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evicted": self.evicted,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_rows": self.last_rebuild_rows,
+            "last_rebuild_duration": self.last_rebuild_duration,
+            "last_rebuild_error": self.last_rebuild_error
+        }
+
+def _row_extraction(row) -> Dict[str, Any]:
+    """Hasil ekstraksi dari satu baris extraction_data"""
+    return {
+        "topic": row["topic"] or [],
+        "sentiment": row["sentiment"],
+        "sentiment_score": float(row["sentiment_score"] or 0),
+        "emotions": [json.loads(value) for value in row["emotions"] or []],
+        "entities": [json.loads(value) for value in row["entities"] or []],
+        "locations": row["locations"] or [],
+        "hashtags": row["hashtags"] or [],
+        "summary": row["summary"] or ""
+    }
+
+# Global instance
+near_duplicate_index = NearDuplicateIndex(
+    num_perm=settings.near_duplicate_num_perm,
+    threshold=settings.near_duplicate_threshold,
+    shingle_size=settings.near_duplicate_shingle_size,
+    max_entries=settings.near_duplicate_max_entries,
+    window=settings.near_duplicate_window
+)
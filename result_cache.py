@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Type
+from pydantic import BaseModel
+from config import settings
+from database import db_pool
+from token_usage import model_downgraded
+
+RESULT_CACHE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS result_cache (
+        cache_key VARCHAR(64) PRIMARY KEY,
+        endpoint VARCHAR(50) NOT NULL,
+        value TEXT NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+RESULT_CACHE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_result_cache_last_accessed
+    ON result_cache (last_accessed)
+"""
+
+def normalize_content(content: str) -> str:
+    """Normalisasi konten agar repost/forward dengan spasi atau kapitalisasi berbeda tetap cocok"""
+    return re.sub(r"\s+", " ", content or "").strip().casefold()
+
+def build_cache_key(endpoint: str, content: str, language: str, model_name: str, catalog_version: str = "") -> str:
+    """Hash dari konten ternormalisasi, bahasa, endpoint, model dan versi katalog unit kerja"""
+    parts = [endpoint, language or "", model_name or "", catalog_version or "", normalize_content(content)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class MemoryCacheBackend:
+    """Cache in-memory dengan TTL dan batas ukuran LRU"""
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def size(self) -> int:
+        return len(self._entries)
+
+class PostgresCacheBackend:
+    """Cache di tabel result_cache PostgreSQL agar hasil bertahan setelah restart"""
+    
+    # Pangkas entri kedaluwarsa dan kelebihan ukuran setiap N kali set
+    PRUNE_EVERY = 100
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._table_ready = False
+        self._table_lock = asyncio.Lock()
+        self._sets_since_prune = 0
+    
+    async def _ensure_table(self, conn):
+        if self._table_ready:
+            return
+        async with self._table_lock:
+            if self._table_ready:
+                return
+            await conn.execute(RESULT_CACHE_TABLE_SQL)
+            await conn.execute(RESULT_CACHE_INDEX_SQL)
+            self._table_ready = True
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with db_pool.acquire() as conn:
+                await self._ensure_table(conn)
+                value = await conn.fetchval("""
+                    UPDATE result_cache SET last_accessed = CURRENT_TIMESTAMP
+                    WHERE cache_key = $1 AND expires_at > CURRENT_TIMESTAMP
+                    RETURNING value
+                """, key)
+        except Exception as e:
+            print(f"Error reading result cache: {e}")
+            return None
+        
+        return json.loads(value) if value else None
+    
+    async def set(self, key: str, value: Dict[str, Any], endpoint: str = ""):
+        try:
+            async with db_pool.acquire() as conn:
+                await self._ensure_table(conn)
+                await conn.execute("""
+                    INSERT INTO result_cache (cache_key, endpoint, value, expires_at)
+                    VALUES ($1, $2, $3, CURRENT_TIMESTAMP + $4 * INTERVAL '1 second')
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        value = EXCLUDED.value,
+                        expires_at = EXCLUDED.expires_at,
+                        last_accessed = CURRENT_TIMESTAMP
+                """, key, endpoint, json.dumps(value, default=str), float(self.ttl))
+                
+                self._sets_since_prune += 1
+                if self._sets_since_prune >= self.PRUNE_EVERY:
+                    self._sets_since_prune = 0
+                    await self._prune(conn)
+        except Exception as e:
+            print(f"Error writing result cache: {e}")
+    
+    async def _prune(self, conn):
+        """Hapus entri kedaluwarsa dan entri paling lama tidak diakses di atas batas ukuran"""
+        await conn.execute("DELETE FROM result_cache WHERE expires_at <= CURRENT_TIMESTAMP")
+        await conn.execute("""
+            DELETE FROM result_cache WHERE cache_key IN (
+                SELECT cache_key FROM result_cache
+                ORDER BY last_accessed DESC
+                OFFSET $1
+            )
+        """, self.max_entries)
+
+class ResultCache:
+    """Cache hasil ekstraksi/klasifikasi berbasis hash konten"""
+    
+    def __init__(self, backend: str, max_entries: int, ttl: float):
+        self.backend_name = backend.lower()
+        self.memory = None
+        self.postgres = None
+        if self.backend_name in ("memory", "postgres"):
+            # Backend postgres tetap memakai memory sebagai lapisan pertama
+            self.memory = MemoryCacheBackend(max_entries, ttl)
+        if self.backend_name == "postgres":
+            self.postgres = PostgresCacheBackend(max_entries, ttl)
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.memory is not None
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        
+        value = await self.memory.get(key)
+        if value is None and self.postgres is not None:
+            value = await self.postgres.get(key)
+            if value is not None:
+                await self.memory.set(key, value)
+        
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    async def set(self, key: str, value: Dict[str, Any], endpoint: str = ""):
+        if not self.enabled:
+            return
+        await self.memory.set(key, value)
+        if self.postgres is not None:
+            await self.postgres.set(key, value, endpoint)
+    
+    async def get_or_compute(self, key: str, endpoint: str, compute: Callable[[], Awaitable[BaseModel]], model_cls: Type[BaseModel]) -> Tuple[BaseModel, bool]:
+        """Ambil hasil dari cache, atau jalankan compute dan simpan hasilnya"""
+        cached = await self.get(key)
+        if cached is not None:
+            return model_cls(**cached), True
+        
+        result = await compute()
+        # Hasil mode degraded tidak di-cache agar tidak bertahan setelah ArkModel pulih,
+        # hasil cheap_model tidak di-cache karena key memakai model utama
+        if not getattr(result, "degraded", False) and not model_downgraded():
+            await self.set(key, result.dict(), endpoint)
+        return result, False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": self.memory.size() if self.memory is not None else 0,
+            "max_entries": settings.result_cache_max_entries,
+            "ttl": settings.result_cache_ttl
+        }
+
+# Global instance
+result_cache = ResultCache(
+    backend=settings.result_cache_backend,
+    max_entries=settings.result_cache_max_entries,
+    ttl=settings.result_cache_ttl
+)
@@ -1,46 +1,180 @@
+import asyncio
 import json
+import math
 import re
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Union, Callable, Awaitable
 from datetime import datetime
 from arkmodel_client import ArkModelClient
-from models import ExtractionResult, ClassificationResult, UnitKerja, Emotion, Entity
+from config import settings
+from models import (
+    ExtractionResult,
+    ClassificationResult,
+    UnitKerja,
+    Emotion,
+    Entity,
+    ProcessingResponse,
+    ProcessingRequest,
+    StageTimings,
+    BatchItemResult,
+    BatchStats,
+    BatchProcessingResponse,
+    ProcessingStreamEvent,
+    NearDuplicateMatch
+)
 from unit_kerja_service import unit_kerja_service
+from result_cache import result_cache, build_cache_key
+from write_behind import persist_result
+from keyword_classifier import keyword_classifier
+from fallback_classifier import fallback_classifier
+from local_extractor import local_extractor
+from json_stream import IncrementalJSONParser
+from near_duplicate import near_duplicate_index
+from metrics import json_parse_duration, fallbacks
+from tracing import tracer
+from token_usage import model_downgraded
+
+# Dipanggil dengan (nama field, nilai) setiap kali satu field hasil streaming sudah lengkap
+FieldEmitter = Callable[[str, Any], None]
+
+def emit_fields(emit: FieldEmitter, result: Any):
+    """Emit seluruh field hasil yang sudah jadi (cache hit atau klasifikasi lokal)"""
+    for field, value in result.dict().items():
+        emit(field, value)
 
 class DataExtractionService:
     def __init__(self):
         self.arkmodel_client = ArkModelClient()
     
+    @tracer.traced("DataExtractionService.extract_from_content")
     async def extract_from_content(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> ExtractionResult:
         """Ekstraksi data dari konten menggunakan ArkModel"""
+        reused = self.find_near_duplicate(content, language)
+        if reused is not None:
+            return reused
+        
         try:
             # Panggil ArkModel untuk ekstraksi
-            response = await self.arkmodel_client.extract_data(content, language)
+            response = await self.arkmodel_client.extract_data(content, language, from_field, type, skip_local_fields=self.skip_local_fields)
             
             # Parse response dari ArkModel
             ai_response = response.get("choices", [{}])[0].get("message", {}).get("content", "{}")
             
             # Parse JSON response dari AI
             try:
-                extracted_data = json.loads(ai_response)
+                with json_parse_duration.time(stage="extraction"), tracer.span("json.parse", {"stage": "extraction"}):
+                    extracted_data = json.loads(ai_response)
             except json.JSONDecodeError as e:
                 raise Exception(f"Failed to parse ArkModel response as JSON: {str(e)}")
             
-            # Validasi dan format data
-            return ExtractionResult(
-                topic=extracted_data.get("topic", []),
-                sentiment=extracted_data.get("sentiment", "neutral"),
-                sentiment_score=float(extracted_data.get("sentiment_score", 0.5)),
-                emotions=self._parse_emotions(extracted_data.get("emotions", [])),
-                entities=self._parse_entities(extracted_data.get("entities", [])),
-                locations=extracted_data.get("locations", []),
-                hashtags=extracted_data.get("hashtags", []),
-                summary=extracted_data.get("summary", "")
-            )
-            
+            result = self.build_result(extracted_data, content)
+        
         except Exception as e:
             # Jika ArkModel gagal, raise error
             raise Exception(f"ArkModel extraction failed: {str(e)}")
+        
+        if not model_downgraded():
+            near_duplicate_index.add(content, language, extraction=result.dict())
+        return result
+    
+    @property
+    def local_extraction_mode(self) -> str:
+        return settings.local_extraction_mode.lower()
+    
+    @property
+    def skip_local_fields(self) -> bool:
+        """Prompt ArkModel tidak meminta locations dan hashtags karena sudah diekstrak lokal"""
+        return self.local_extraction_mode == "skip"
     
+    async def get_cache_key(self, content: str, language: str = "id") -> str:
+        """Cache key ekstraksi (tidak bergantung pada katalog unit kerja)"""
+        return build_cache_key(f"extract:{self.local_extraction_mode}", content, language, self.arkmodel_client.model_name)
+    
+    async def extract_cached(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> Tuple[ExtractionResult, bool]:
+        """Ekstraksi dengan result cache, mengembalikan (hasil, cache_hit)"""
+        cache_key = await self.get_cache_key(content, language)
+        return await result_cache.get_or_compute(
+            cache_key,
+            "extract",
+            lambda: self.extract_from_content(content, language, from_field, type),
+            ExtractionResult
+        )
+    
+    async def extract_streaming(self, content: str, language: str, emit: FieldEmitter, from_field: str = None, type: str = None) -> Tuple[ExtractionResult, bool]:
+        """Ekstraksi dengan result cache dan stream ArkModel, mengembalikan (hasil, cache_hit)"""
+        cache_key = await self.get_cache_key(content, language)
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            result = ExtractionResult(**cached)
+            emit_fields(emit, result)
+            return result, True
+        
+        reused = self.find_near_duplicate(content, language)
+        if reused is not None:
+            emit_fields(emit, reused)
+            await result_cache.set(cache_key, reused.dict(), "extract")
+            return reused, False
+        
+        parser = IncrementalJSONParser()
+        try:
+            async for delta in self.arkmodel_client.stream_extract_data(content, language, self.skip_local_fields, from_field, type):
+                for path, value in parser.feed(delta):
+                    emit(path[0], value)
+            
+            try:
+                with json_parse_duration.time(stage="extraction"), tracer.span("json.parse", {"stage": "extraction"}):
+                    extracted_data = parser.result()
+            except ValueError as e:
+                raise Exception(f"Failed to parse ArkModel response as JSON: {str(e)}")
+        
+        except Exception as e:
+            raise Exception(f"ArkModel extraction failed: {str(e)}")
+        
+        result = self.build_result(extracted_data, content)
+        if not model_downgraded():
+            near_duplicate_index.add(content, language, extraction=result.dict())
+            await result_cache.set(cache_key, result.dict(), "extract")
+        return result, False
+    
+    def find_near_duplicate(self, content: str, language: str = "id") -> Optional[ExtractionResult]:
+        """Hasil ekstraksi aduan yang hampir sama dari index near-duplicate, field lokal diambil dari konten ini"""
+        match = near_duplicate_index.find(content, language, "extraction")
+        if match is None:
+            return None
+        data, original = match
+        data.pop("near_duplicate", None)
+        result = self._merge_local(ExtractionResult(**data), content)
+        result.near_duplicate = NearDuplicateMatch(**original)
+        return result
+    
+    def build_result(self, extracted_data: Dict[str, Any], content: Optional[str] = None) -> ExtractionResult:
+        """Validasi dan format data hasil ekstraksi, digabung dengan ekstraksi lokal jika konten diberikan"""
+        result = ExtractionResult(
+            topic=extracted_data.get("topic", []),
+            sentiment=extracted_data.get("sentiment", "neutral"),
+            sentiment_score=float(extracted_data.get("sentiment_score", 0.5)),
+            emotions=self._parse_emotions(extracted_data.get("emotions", [])),
+            entities=self._parse_entities(extracted_data.get("entities", [])),
+            locations=extracted_data.get("locations", []),
+            hashtags=extracted_data.get("hashtags", []),
+            summary=extracted_data.get("summary", "")
+        )
+        
+        if content is None:
+            return result
+        return self._merge_local(result, content)
+    
+    def _merge_local(self, result: ExtractionResult, content: str) -> ExtractionResult:
+        """Gabungkan hashtag/lokasi lokal dan isi mention/URL sesuai local_extraction_mode"""
+        if self.local_extraction_mode not in ("merge", "skip"):
+            return result
+        
+        local = local_extractor.extract(content)
+        result.hashtags = local_extractor.merge_hashtags(local["hashtags"], result.hashtags)
+        result.locations = local_extractor.merge_locations(local["locations"], result.locations)
+        result.mentions = local["mentions"]
+        result.urls = local["urls"]
+        return result
     
     def _parse_emotions(self, emotions_data: List[Dict]) -> List[Emotion]:
         """Parse emotions data"""
@@ -69,47 +203,584 @@ class ContentClassificationService:
     def __init__(self):
         self.arkmodel_client = ArkModelClient()
     
+    @tracer.traced("ContentClassificationService.classify_content")
     async def classify_content(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> ClassificationResult:
         """Klasifikasi konten untuk menentukan unit kerja"""
+        # Satu snapshot katalog dipakai untuk prompt dan versi di hasil
+        catalog = await self.arkmodel_client.get_catalog()
+        
+        local_result = self._classify_local(content, catalog)
+        if local_result is not None:
+            return local_result
+        
+        reused = self.find_near_duplicate(content, language, catalog.version)
+        if reused is not None:
+            return reused
+        
         try:
             # Panggil ArkModel untuk klasifikasi
-            response = await self.arkmodel_client.classify_content(content, language)
+            response = await self.arkmodel_client.classify_content(content, language, from_field, type, catalog=catalog)
             
             # Parse response dari ArkModel
             ai_response = response.get("choices", [{}])[0].get("message", {}).get("content", "{}")
             
             try:
-                classification_data = json.loads(ai_response)
+                with json_parse_duration.time(stage="classification"), tracer.span("json.parse", {"stage": "classification"}):
+                    classification_data = json.loads(ai_response)
             except json.JSONDecodeError as e:
                 raise Exception(f"Failed to parse ArkModel classification response as JSON: {str(e)}")
             
-            # Format hasil klasifikasi
-            recommended_unit_data = classification_data.get("recommended_unit", {})
-            recommended_unit = UnitKerja(
-                name=recommended_unit_data.get("name", "BSrE"),
-                email=recommended_unit_data.get("email", "aduanbsre@bssn.go.id"),
-                description=recommended_unit_data.get("description", "BSrE merupakan layanan di BSSN yang mengurus tentang sertifikat elektronik dan tanda tangan digital"),
-                confidence=float(recommended_unit_data.get("confidence", 0.5)),
-                matched_keywords=recommended_unit_data.get("matched_keywords", [])
+            result = self.build_result(classification_data, catalog.version)
+        
+        except Exception as e:
+            if settings.degraded_fallback_enabled:
+                print(f"ArkModel classification failed, using local fallback: {e}")
+                fallbacks.inc(stage="classification")
+                return fallback_classifier.classify(content)
+            # Jika ArkModel gagal, raise error
+            raise Exception(f"ArkModel classification failed: {str(e)}")
+        
+        if not model_downgraded():
+            near_duplicate_index.add(content, language, classification=result.dict(), catalog_version=catalog.version)
+        return result
+    
+    def find_near_duplicate(self, content: str, language: str, catalog_version: str) -> Optional[ClassificationResult]:
+        """Hasil klasifikasi aduan yang hampir sama dengan versi katalog yang sama, dari index near-duplicate"""
+        match = near_duplicate_index.find(content, language, "classification", catalog_version)
+        if match is None:
+            return None
+        data, original = match
+        data.pop("near_duplicate", None)
+        result = ClassificationResult(**data)
+        result.catalog_version = catalog_version
+        result.near_duplicate = NearDuplicateMatch(**original)
+        return result
+    
+    def _classify_local(self, content: str, catalog) -> Optional[ClassificationResult]:
+        """Hasil pre-classifier keyword jika cukup yakin, selain itu None"""
+        if not settings.keyword_preclassifier_enabled:
+            return None
+        return keyword_classifier.classify(content, catalog)
+    
+    async def classify_streaming(self, content: str, language: str, emit: FieldEmitter, from_field: str = None, type: str = None) -> Tuple[ClassificationResult, bool]:
+        """Klasifikasi dengan result cache dan stream ArkModel, mengembalikan (hasil, cache_hit)"""
+        catalog = await self.arkmodel_client.get_catalog()
+        cache_key = await self.get_cache_key(content, language, catalog.version)
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            result = ClassificationResult(**cached)
+            emit_fields(emit, result)
+            return result, True
+        
+        result = self._classify_local(content, catalog) or self.find_near_duplicate(content, language, catalog.version)
+        if result is not None:
+            emit_fields(emit, result)
+        else:
+            parser = IncrementalJSONParser()
+            try:
+                async for delta in self.arkmodel_client.stream_classify_content(content, language, catalog=catalog, from_field=from_field, type=type):
+                    for path, value in parser.feed(delta):
+                        emit(path[0], value)
+                
+                try:
+                    with json_parse_duration.time(stage="classification"), tracer.span("json.parse", {"stage": "classification"}):
+                        classification_data = parser.result()
+                except ValueError as e:
+                    raise Exception(f"Failed to parse ArkModel classification response as JSON: {str(e)}")
+                
+                result = self.build_result(classification_data, catalog.version)
+                if not model_downgraded():
+                    near_duplicate_index.add(content, language, classification=result.dict(), catalog_version=catalog.version)
+            
+            except Exception as e:
+                if not settings.degraded_fallback_enabled:
+                    raise Exception(f"ArkModel classification failed: {str(e)}")
+                print(f"ArkModel classification failed, using local fallback: {e}")
+                fallbacks.inc(stage="classification")
+                # Field yang sudah terkirim digantikan oleh hasil fallback
+                result = fallback_classifier.classify(content)
+                emit_fields(emit, result)
+        
+        if not result.degraded and not model_downgraded():
+            await result_cache.set(cache_key, result.dict(), "classify")
+        return result, False
+    
+    async def get_cache_key(self, content: str, language: str = "id", catalog_version: Optional[str] = None) -> str:
+        """Cache key klasifikasi, termasuk versi katalog unit kerja"""
+        if catalog_version is None:
+            catalog_version = await unit_kerja_service.get_catalog_version()
+        return build_cache_key("classify", content, language, self.arkmodel_client.model_name, catalog_version)
+    
+    async def classify_cached(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> Tuple[ClassificationResult, bool]:
+        """Klasifikasi dengan result cache, mengembalikan (hasil, cache_hit)"""
+        cache_key = await self.get_cache_key(content, language)
+        return await result_cache.get_or_compute(
+            cache_key,
+            "classify",
+            lambda: self.classify_content(content, language, from_field, type),
+            ClassificationResult
+        )
+    
+    def build_result(self, classification_data: Dict[str, Any], catalog_version: Optional[str] = None) -> ClassificationResult:
+        """Format data hasil klasifikasi"""
+        recommended_unit_data = classification_data.get("recommended_unit", {})
+        recommended_unit = UnitKerja(
+            name=recommended_unit_data.get("name", "BSrE"),
+            email=recommended_unit_data.get("email", "aduanbsre@bssn.go.id"),
+            description=recommended_unit_data.get("description", "BSrE merupakan layanan di BSSN yang mengurus tentang sertifikat elektronik dan tanda tangan digital"),
+            confidence=float(recommended_unit_data.get("confidence", 0.5)),
+            matched_keywords=recommended_unit_data.get("matched_keywords", [])
+        )
+        
+        alternative_units = []
+        for alt_data in classification_data.get("alternative_units", []):
+            alternative_units.append(UnitKerja(
+                name=alt_data.get("name", ""),
+                email=alt_data.get("email", ""),
+                description=alt_data.get("description", ""),
+                confidence=float(alt_data.get("confidence", 0.0)),
+                matched_keywords=alt_data.get("matched_keywords", [])
+            ))
+        
+        return ClassificationResult(
+            recommended_unit=recommended_unit,
+            alternative_units=alternative_units,
+            classification_reason=classification_data.get("classification_reason", "Berdasarkan analisis konten"),
+            catalog_version=catalog_version
+        )
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile sederhana (nearest-rank) dari daftar nilai"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+class ComplaintProcessingService:
+    """Menjalankan ekstraksi dan klasifikasi secara bersamaan untuk /process"""
+    
+    def __init__(self, extraction_service: DataExtractionService, classification_service: ContentClassificationService):
+        self.extraction_service = extraction_service
+        self.classification_service = classification_service
+        self.arkmodel_client = ArkModelClient()
+    
+    async def _run_stage(self, stage: str, coro):
+        """Jalankan satu tahap dan catat durasinya"""
+        start_time = time.time()
+        try:
+            result = await coro
+            return stage, result, None, time.time() - start_time
+        except Exception as e:
+            return stage, None, e, time.time() - start_time
+    
+    @tracer.traced("ComplaintProcessingService.process")
+    async def process(self, content: str, language: str = "id", from_field: str = None, type: str = None, failure_mode: Optional[str] = None, mode: Optional[str] = None) -> ProcessingResponse:
+        """Ekstraksi dan klasifikasi konten, hasilnya diantrekan untuk disimpan ke database"""
+        try:
+            result = await self._process(content, language, from_field, type, failure_mode, mode)
+        except Exception as e:
+            persist_result("process", content, language, from_field, type, error=str(e))
+            raise
+        
+        self._persist_response(content, language, from_field, type, result)
+        return result
+    
+    def _persist_response(self, content: str, language: str, from_field: Optional[str], type: Optional[str], result: ProcessingResponse):
+        persist_result(
+            "process", content, language, from_field, type,
+            extraction=result.extraction,
+            classification=result.classification,
+            processing_time=result.processing_time,
+            error="; ".join(result.errors.values()) if result.errors else None
+        )
+    
+    async def _process(self, content: str, language: str = "id", from_field: str = None, type: str = None, failure_mode: Optional[str] = None, mode: Optional[str] = None) -> ProcessingResponse:
+        """Ekstraksi dan klasifikasi konten secara paralel atau dalam satu prompt"""
+        start_time = time.time()
+        mode = (mode or settings.process_mode).lower()
+        try:
+            if mode == "combined":
+                return await self._process_combined(content, language, from_field, type)
+            return await self._process_separate(content, language, from_field, type, failure_mode)
+        except Exception as e:
+            if not settings.degraded_fallback_enabled:
+                raise
+            print(f"ArkModel processing failed, using local fallback: {e}")
+            return self._process_degraded(content, str(e), start_time)
+    
+    def _process_degraded(self, content: str, error: str, start_time: float) -> ProcessingResponse:
+        """Response mode degraded: klasifikasi lokal, ekstraksi tidak tersedia tanpa ArkModel"""
+        fallbacks.inc(stage="processing")
+        classification = fallback_classifier.classify(content)
+        processing_time = time.time() - start_time
+        return ProcessingResponse(
+            extraction=None,
+            classification=classification,
+            errors={"extraction": error},
+            degraded=True,
+            processing_time=processing_time,
+            stage_timings=StageTimings(total=processing_time),
+            timestamp=datetime.now()
+        )
+    
+    async def _process_separate(self, content: str, language: str = "id", from_field: str = None, type: str = None, failure_mode: Optional[str] = None) -> ProcessingResponse:
+        """Ekstraksi dan klasifikasi dengan dua request ArkModel paralel"""
+        return await self._run_separate({
+            "extraction": self.extraction_service.extract_cached(content, language, from_field, type),
+            "classification": self.classification_service.classify_cached(content, language, from_field, type)
+        }, failure_mode)
+    
+    async def _run_separate(self, stages: Dict[str, Awaitable[Tuple[Any, bool]]], failure_mode: Optional[str] = None, on_error: Optional[Callable[[str, Exception], None]] = None) -> ProcessingResponse:
+        """Jalankan tahap-tahap (hasil, cache_hit) secara paralel dan gabungkan hasilnya"""
+        failure_mode = (failure_mode or settings.process_failure_mode).lower()
+        start_time = time.time()
+        
+        tasks = [asyncio.create_task(self._run_stage(stage, coro)) for stage, coro in stages.items()]
+        
+        results = {}
+        cache_hits = {}
+        errors = {}
+        timings = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                stage, result, error, elapsed = await next_done
+                timings[stage] = elapsed
+                if error is None:
+                    results[stage], cache_hits[stage] = result
+                    continue
+                
+                # Mode "fail": batalkan tahap lain, tidak perlu menunggu hasilnya
+                if failure_mode != "partial":
+                    raise error
+                errors[stage] = str(error)
+                if on_error is not None:
+                    on_error(stage, error)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        
+        if not results:
+            raise Exception("; ".join(errors.values()))
+        
+        processing_time = time.time() - start_time
+        
+        return ProcessingResponse(
+            extraction=results.get("extraction"),
+            classification=results.get("classification"),
+            errors=errors or None,
+            # Tahap yang gagal tidak dihitung sebagai cache hit
+            cache_hit=len(cache_hits) == len(stages) and all(cache_hits.values()),
+            degraded=any(getattr(result, "degraded", False) for result in results.values()),
+            processing_time=processing_time,
+            stage_timings=StageTimings(
+                extraction=timings.get("extraction"),
+                classification=timings.get("classification"),
+                total=processing_time
+            ),
+            timestamp=datetime.now()
+        )
+    
+    async def _process_combined(self, content: str, language: str = "id", from_field: str = None, type: str = None) -> ProcessingResponse:
+        """Ekstraksi dan klasifikasi dengan satu request ke ArkModel"""
+        start_time = time.time()
+        
+        catalog = await self.arkmodel_client.get_catalog()
+        cache_keys, cached = await self._get_combined_cached(content, language, catalog, start_time)
+        if cached is not None:
+            return cached
+        
+        reused = await self._get_combined_near_duplicate(content, language, catalog, cache_keys, start_time)
+        if reused is not None:
+            return reused
+        
+        try:
+            response = await self.arkmodel_client.process_combined(
+                content, language, from_field, type, catalog=catalog, skip_local_fields=self.extraction_service.skip_local_fields
             )
             
-            alternative_units = []
-            for alt_data in classification_data.get("alternative_units", []):
-                alternative_units.append(UnitKerja(
-                    name=alt_data.get("name", ""),
-                    email=alt_data.get("email", ""),
-                    description=alt_data.get("description", ""),
-                    confidence=float(alt_data.get("confidence", 0.0)),
-                    matched_keywords=alt_data.get("matched_keywords", [])
-                ))
+            # Parse response dari ArkModel
+            ai_response = response.get("choices", [{}])[0].get("message", {}).get("content", "{}")
+            
+            try:
+                with json_parse_duration.time(stage="combined"), tracer.span("json.parse", {"stage": "combined"}):
+                    combined_data = json.loads(ai_response)
+            except json.JSONDecodeError as e:
+                raise Exception(f"Failed to parse ArkModel combined response as JSON: {str(e)}")
+        
+        except Exception as e:
+            raise Exception(f"ArkModel combined processing failed: {str(e)}")
+        
+        return await self._build_combined_response(content, language, catalog, combined_data, cache_keys, start_time)
+    
+    async def _get_combined_cached(self, content: str, language: str, catalog, start_time: float) -> Tuple[Tuple[str, str], Optional[ProcessingResponse]]:
+        """Cache key kedua tahap, beserta response jika keduanya ada di cache"""
+        # Gunakan cache per tahap yang sama dengan /extract dan /classify
+        extraction_key = await self.extraction_service.get_cache_key(content, language)
+        classification_key = await self.classification_service.get_cache_key(content, language, catalog.version)
+        cached_extraction = await result_cache.get(extraction_key)
+        cached_classification = await result_cache.get(classification_key)
+        if cached_extraction is None or cached_classification is None:
+            return (extraction_key, classification_key), None
+        
+        processing_time = time.time() - start_time
+        return (extraction_key, classification_key), ProcessingResponse(
+            extraction=ExtractionResult(**cached_extraction),
+            classification=ClassificationResult(**cached_classification),
+            cache_hit=True,
+            processing_time=processing_time,
+            stage_timings=StageTimings(total=processing_time),
+            timestamp=datetime.now()
+        )
+    
+    async def _get_combined_near_duplicate(self, content: str, language: str, catalog, cache_keys: Tuple[str, str], start_time: float) -> Optional[ProcessingResponse]:
+        """Response dari index near-duplicate jika hasil ekstraksi dan klasifikasi keduanya tersedia"""
+        extraction_result = self.extraction_service.find_near_duplicate(content, language)
+        if extraction_result is None:
+            return None
+        classification_result = self.classification_service.find_near_duplicate(content, language, catalog.version)
+        if classification_result is None:
+            return None
+        
+        extraction_key, classification_key = cache_keys
+        await result_cache.set(extraction_key, extraction_result.dict(), "extract")
+        await result_cache.set(classification_key, classification_result.dict(), "classify")
+        
+        processing_time = time.time() - start_time
+        return ProcessingResponse(
+            extraction=extraction_result,
+            classification=classification_result,
+            processing_time=processing_time,
+            stage_timings=StageTimings(total=processing_time),
+            timestamp=datetime.now()
+        )
+    
+    async def _build_combined_response(self, content: str, language: str, catalog, combined_data: Dict[str, Any], cache_keys: Tuple[str, str], start_time: float) -> ProcessingResponse:
+        """Bangun hasil kedua tahap dari output combined lalu simpan ke cache"""
+        try:
+            extraction_result = self.extraction_service.build_result(combined_data.get("extraction") or {}, content)
+            classification_result = self.classification_service.build_result(combined_data.get("classification") or {}, catalog.version)
+        except Exception as e:
+            raise Exception(f"ArkModel combined processing failed: {str(e)}")
+        
+        if not model_downgraded():
+            near_duplicate_index.add(
+                content, language,
+                extraction=extraction_result.dict(),
+                classification=classification_result.dict(),
+                catalog_version=catalog.version
+            )
             
-            return ClassificationResult(
-                recommended_unit=recommended_unit,
-                alternative_units=alternative_units,
-                classification_reason=classification_data.get("classification_reason", "Berdasarkan analisis konten")
+            extraction_key, classification_key = cache_keys
+            await result_cache.set(extraction_key, extraction_result.dict(), "extract")
+            await result_cache.set(classification_key, classification_result.dict(), "classify")
+        
+        processing_time = time.time() - start_time
+        
+        return ProcessingResponse(
+            extraction=extraction_result,
+            classification=classification_result,
+            processing_time=processing_time,
+            stage_timings=StageTimings(
+                combined=processing_time,
+                total=processing_time
+            ),
+            timestamp=datetime.now()
+        )
+    
+    async def process_stream(self, content: str, language: str = "id", from_field: str = None, type: str = None, failure_mode: Optional[str] = None, mode: Optional[str] = None) -> AsyncIterator[ProcessingStreamEvent]:
+        """
+        Seperti process, tetapi yield event "field" segera setelah setiap field dari ArkModel lengkap
+        (mis. recommended_unit sebelum classification_reason), lalu satu event "result" atau "error".
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def run():
+            try:
+                result = await self._process_streaming(content, language, from_field, type, failure_mode, mode, events.put_nowait)
+                self._persist_response(content, language, from_field, type, result)
+                events.put_nowait(ProcessingStreamEvent(event="result", result=result))
+            except Exception as e:
+                persist_result("process", content, language, from_field, type, error=str(e))
+                events.put_nowait(ProcessingStreamEvent(event="error", error=f"Error during processing: {str(e)}"))
+            events.put_nowait(None)
+        
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Client memutus koneksi: hentikan stream ArkModel yang masih berjalan
+            task.cancel()
+    
+    async def _process_streaming(self, content: str, language: str, from_field: Optional[str], type: Optional[str], failure_mode: Optional[str], mode: Optional[str], publish: Callable[[ProcessingStreamEvent], None]) -> ProcessingResponse:
+        """Versi streaming dari _process; setiap field yang lengkap dikirim lewat publish"""
+        start_time = time.time()
+        mode = (mode or settings.process_mode).lower()
+        
+        def emitter(stage: str) -> FieldEmitter:
+            return lambda field, value: publish(ProcessingStreamEvent(event="field", stage=stage, field=field, value=value))
+        
+        try:
+            if mode == "combined":
+                return await self._stream_combined(content, language, from_field, type, emitter)
+            return await self._run_separate(
+                {
+                    "extraction": self.extraction_service.extract_streaming(content, language, emitter("extraction"), from_field, type),
+                    "classification": self.classification_service.classify_streaming(content, language, emitter("classification"), from_field, type)
+                },
+                failure_mode,
+                on_error=lambda stage, error: publish(ProcessingStreamEvent(event="error", stage=stage, error=str(error)))
             )
+        except Exception as e:
+            if not settings.degraded_fallback_enabled:
+                raise
+            print(f"ArkModel processing failed, using local fallback: {e}")
+            result = self._process_degraded(content, str(e), start_time)
+            emit_fields(emitter("classification"), result.classification)
+            return result
+    
+    async def _stream_combined(self, content: str, language: str, from_field: Optional[str], type: Optional[str], emitter: Callable[[str], FieldEmitter]) -> ProcessingResponse:
+        """Mode combined dengan stream ArkModel: field extraction.* dan classification.* dikirim saat lengkap"""
+        start_time = time.time()
+        
+        catalog = await self.arkmodel_client.get_catalog()
+        cache_keys, cached = await self._get_combined_cached(content, language, catalog, start_time)
+        if cached is None:
+            cached = await self._get_combined_near_duplicate(content, language, catalog, cache_keys, start_time)
+        if cached is not None:
+            emit_fields(emitter("extraction"), cached.extraction)
+            emit_fields(emitter("classification"), cached.classification)
+            return cached
+        
+        emitters = {"extraction": emitter("extraction"), "classification": emitter("classification")}
+        parser = IncrementalJSONParser(max_depth=2)
+        try:
+            async for delta in self.arkmodel_client.stream_process_combined(
+                content, language, catalog=catalog, skip_local_fields=self.extraction_service.skip_local_fields,
+                from_field=from_field, type=type
+            ):
+                for path, value in parser.feed(delta):
+                    if len(path) == 2 and path[0] in emitters:
+                        emitters[path[0]](path[1], value)
             
+            try:
+                with json_parse_duration.time(stage="combined"), tracer.span("json.parse", {"stage": "combined"}):
+                    combined_data = parser.result()
+            except ValueError as e:
+                raise Exception(f"Failed to parse ArkModel combined response as JSON: {str(e)}")
+        
         except Exception as e:
-            # Jika ArkModel gagal, raise error
-            raise Exception(f"ArkModel classification failed: {str(e)}")
+            raise Exception(f"ArkModel combined processing failed: {str(e)}")
+        
+        return await self._build_combined_response(content, language, catalog, combined_data, cache_keys, start_time)
+    
+    def _resolve_concurrency(self, concurrency: Optional[int]) -> int:
+        """Batasi concurrency batch sesuai Settings"""
+        concurrency = concurrency or settings.batch_default_concurrency
+        return max(1, min(concurrency, settings.batch_max_concurrency))
+    
+    async def _process_item(self, index: int, item: ProcessingRequest) -> Tuple[BatchItemResult, float]:
+        """Proses satu item batch, mengembalikan (hasil, durasi)"""
+        start_time = time.time()
+        try:
+            result = await self.process(
+                content=item.content,
+                language=item.language,
+                from_field=item.from_field,
+                type=item.type,
+                failure_mode=item.failure_mode,
+                mode=item.mode
+            )
+            return BatchItemResult(index=index, success=True, result=result), time.time() - start_time
+        except Exception as e:
+            return BatchItemResult(index=index, success=False, error=f"Error during processing: {str(e)}"), time.time() - start_time
+    
+    async def _process_item_limited(self, index: int, item: ProcessingRequest, semaphore: asyncio.Semaphore) -> Tuple[BatchItemResult, float]:
+        """Proses satu item batch setelah mendapat slot concurrency (waktu antre tidak dihitung)"""
+        async with semaphore:
+            return await self._process_item(index, item)
+    
+    async def process_batch(self, items: List[ProcessingRequest], concurrency: Optional[int] = None) -> BatchProcessingResponse:
+        """Proses banyak aduan dengan concurrency terbatas, hasil sesuai urutan input"""
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(self._resolve_concurrency(concurrency))
+        
+        outcomes = await asyncio.gather(*[
+            self._process_item_limited(index, item, semaphore)
+            for index, item in enumerate(items)
+        ])
+        
+        results = [result for result, _ in outcomes]
+        item_times = [elapsed for _, elapsed in outcomes]
+        succeeded = sum(1 for result in results if result.success)
+        
+        return BatchProcessingResponse(
+            results=results,
+            stats=BatchStats(
+                total_items=len(results),
+                succeeded=succeeded,
+                failed=len(results) - succeeded,
+                cache_hits=sum(1 for result in results if result.success and result.result.cache_hit),
+                total_time=time.time() - start_time,
+                p50_item_time=percentile(item_times, 50),
+                p95_item_time=percentile(item_times, 95)
+            ),
+            timestamp=datetime.now()
+        )
     
+    async def stream_batch(self, items: AsyncIterator[Union[ProcessingRequest, Exception]], concurrency: Optional[int] = None) -> AsyncIterator[BatchItemResult]:
+        """
+        Proses item batch dari iterator dan yield hasil segera setelah selesai (urutan penyelesaian).
+        Item yang sedang diproses ditambah hasil yang belum dikirim tidak pernah melebihi batas
+        concurrency, sehingga memori tetap datar berapapun ukuran batch.
+        Item berupa Exception (misalnya baris NDJSON yang tidak valid) menjadi entri error.
+        """
+        limit = self._resolve_concurrency(concurrency)
+        slots = asyncio.Semaphore(limit)
+        completed: asyncio.Queue = asyncio.Queue()
+        running = set()
+        
+        async def run(index: int, item: Union[ProcessingRequest, Exception]):
+            if isinstance(item, Exception):
+                result = BatchItemResult(index=index, success=False, error=f"Invalid item: {str(item)}")
+            else:
+                result, _ = await self._process_item(index, item)
+            await completed.put(result)
+        
+        async def produce():
+            try:
+                index = 0
+                async for item in items:
+                    await slots.acquire()
+                    task = asyncio.create_task(run(index, item))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                    index += 1
+                
+                # Tunggu semua item selesai dan dikirim
+                for _ in range(limit):
+                    await slots.acquire()
+                await completed.put(None)
+            except Exception as e:
+                await completed.put(e)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                result = await completed.get()
+                if result is None:
+                    break
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+                # Slot baru dilepas setelah hasil dikirim ke client
+                slots.release()
+        finally:
+            producer.cancel()
+            for task in list(running):
+                task.cancel()
@@ -7,6 +7,8 @@ import time
 
 # Konfigurasi
 BASE_URL = "http://localhost:8000"
+# Hostname yang resolve ke 127.0.0.1 (localtest.me), untuk test SSRF callback
+PRIVATE_CALLBACK_URL = "http://localtest.me:8000/health"
 
 def test_health():
     """Test health check endpoint"""
@@ -48,6 +50,30 @@ def test_classify():
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     print("-" * 50)
 
+def test_classify_single_keyword():
+    """Test satu keyword saja tidak cukup untuk melewati ArkModel (pre-classifier lokal)"""
+    print("Testing classification dengan satu keyword...")
+    
+    test_data = {
+        "content": "Mohon bantuan terkait tanda tangan digital saya",
+        "language": "id"
+    }
+    
+    response = requests.post(f"{BASE_URL}/classify", json=test_data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 200:
+        source = response.json()["data"]["source"]
+        print(f"Source: {source}")
+        if source != "keyword":
+            print("✅ Satu keyword diteruskan ke ArkModel")
+        else:
+            print("❌ Satu keyword langsung diklasifikasi lokal")
+    else:
+        print(f"Error: {response.text}")
+    
+    print("-" * 50)
+
 def test_process():
     """Test complete processing endpoint"""
     print("Testing complete processing endpoint...")
@@ -96,6 +122,168 @@ def test_process():
         
         print("-" * 50)
 
+def test_process_batch():
+    """Test batch processing endpoint"""
+    print("Testing batch processing endpoint...")
+    
+    test_data = {
+        "items": [
+            {
+                "content": "Sertifikat elektronik saya tidak bisa dipakai untuk tanda tangan digital.",
+                "language": "id",
+                "from_field": "website",
+                "type": "Email"
+            },
+            {
+                "content": "Ada berita hoax yang beredar di media sosial tentang BSSN.",
+                "language": "id",
+                "from_field": "mobile_app",
+                "type": "SMS"
+            }
+        ],
+        "concurrency": 2
+    }
+    
+    response = requests.post(f"{BASE_URL}/process/batch", json=test_data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 200:
+        result = response.json()
+        for item in result["results"]:
+            if item["success"]:
+                print(f"[{item['index']}] Recommended Unit: {item['result']['classification']['recommended_unit']['name']}")
+            else:
+                print(f"[{item['index']}] Error: {item['error']}")
+        print(f"Stats: {json.dumps(result['stats'], indent=2)}")
+    else:
+        print(f"Error: {response.text}")
+    
+    print("-" * 50)
+
+def test_process_stream():
+    """Test streaming processing endpoint"""
+    print("Testing streaming processing endpoint...")
+    
+    test_data = {
+        "content": "Ada berita hoax yang beredar di media sosial tentang BSSN.",
+        "language": "id",
+        "from_field": "mobile_app",
+        "type": "SMS"
+    }
+    
+    start_time = time.time()
+    with requests.post(f"{BASE_URL}/process/stream", json=test_data, stream=True) as response:
+        print(f"Status: {response.status_code}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            elapsed = time.time() - start_time
+            if event["event"] == "field":
+                print(f"[{elapsed:.2f}s] {event['stage']}.{event['field']}")
+            elif event["event"] == "result":
+                print(f"[{elapsed:.2f}s] Recommended Unit: {event['result']['classification']['recommended_unit']['name']}")
+            else:
+                print(f"[{elapsed:.2f}s] Error: {event['error']}")
+    
+    print("-" * 50)
+
+def test_process_batch_stream_disconnect():
+    """Test client yang putus di tengah /process/batch/stream tidak terus memakai ArkModel"""
+    print("Testing disconnect di tengah batch stream...")
+    
+    def upstream_calls():
+        return requests.get(f"{BASE_URL}/health").json()["arkmodel_single_flight"]["upstream_calls"]
+    
+    stamp = time.time()
+    items = [{"content": f"Laporan gangguan layanan nomor {i} ({stamp})"} for i in range(20)]
+    before = upstream_calls()
+    
+    # Baca satu hasil lalu tutup koneksi
+    with requests.post(f"{BASE_URL}/process/batch/stream", json={"items": items, "concurrency": 1}, stream=True) as response:
+        print(f"Status: {response.status_code}")
+        for line in response.iter_lines():
+            if line:
+                print(f"First result index: {json.loads(line)['index']}")
+                break
+    
+    time.sleep(5)
+    calls = upstream_calls() - before
+    print(f"Upstream calls setelah disconnect: {calls} (maksimal tanpa deteksi disconnect: {len(items) * 2})")
+    if calls < len(items) * 2:
+        print("✅ Item sisa dibatalkan setelah client putus")
+    else:
+        print("❌ Semua item tetap diproses setelah client putus")
+    
+    print("-" * 50)
+
+def test_jobs():
+    """Test asynchronous job endpoints"""
+    print("Testing job endpoints...")
+    
+    test_data = {
+        "content": "Ada berita hoax yang beredar di media sosial tentang BSSN.",
+        "language": "id",
+        "from_field": "mobile_app",
+        "type": "SMS"
+    }
+    
+    response = requests.post(f"{BASE_URL}/jobs", json=test_data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 202:
+        job_id = response.json()["job_id"]
+        print(f"Job ID: {job_id}")
+        
+        # Polling hasil job
+        for _ in range(30):
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(1)
+        
+        print(f"Job Status: {job['status']} (attempts: {job['attempts']})")
+        if job["status"] == "succeeded":
+            print(f"Recommended Unit: {job['result']['classification']['recommended_unit']['name']}")
+        else:
+            print(f"Error: {job['error']}")
+    else:
+        print(f"Error: {response.text}")
+    
+    print("-" * 50)
+
+def test_job_callback_private_host():
+    """Test callback ke hostname yang resolve ke alamat internal harus ditolak worker"""
+    print("Testing job callback ke hostname dengan alamat internal...")
+    
+    # Hostname publik yang DNS-nya mengarah ke 127.0.0.1: lolos validasi URL, ditolak saat di-resolve worker
+    test_data = {
+        "content": "Ada berita hoax yang beredar di media sosial tentang BSSN.",
+        "callback_url": PRIVATE_CALLBACK_URL
+    }
+    
+    response = requests.post(f"{BASE_URL}/jobs", json=test_data)
+    print(f"Status: {response.status_code}")
+    
+    if response.status_code == 202:
+        job_id = response.json()["job_id"]
+        for _ in range(30):
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed") and job.get("callback_status"):
+                break
+            time.sleep(1)
+        
+        callback_status = job.get("callback_status") or ""
+        print(f"Callback Status: {callback_status}")
+        if callback_status.startswith("error:"):
+            print("✅ Callback ke alamat internal ditolak")
+        else:
+            print("❌ Callback ke alamat internal terkirim")
+    else:
+        print(f"Error: {response.text}")
+    
+    print("-" * 50)
+
 def test_units():
     """Test units endpoint"""
     print("Testing units endpoint...")
@@ -104,6 +292,34 @@ def test_units():
     print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     print("-" * 50)
 
+def test_metrics():
+    """Test metrics endpoint"""
+    print("Testing metrics endpoint...")
+    response = requests.get(f"{BASE_URL}/metrics")
+    print(f"Status: {response.status_code}")
+    print(f"Content-Type: {response.headers.get('content-type')}")
+    
+    if response.status_code == 200:
+        for line in response.text.splitlines():
+            if line.startswith(("http_request_duration_seconds_count", "arkmodel_responses_total", "arkmodel_tokens_total")):
+                print(line)
+    else:
+        print(f"Error: {response.text}")
+    
+    print("-" * 50)
+
+def test_request_id():
+    """Test header X-Request-ID dan statistik tracing"""
+    print("Testing request id...")
+    response = requests.get(f"{BASE_URL}/health", headers={"X-Request-ID": "test-request-1"})
+    print(f"Status: {response.status_code}")
+    print(f"X-Request-ID (dari client): {response.headers.get('x-request-id')}")
+    
+    response = requests.get(f"{BASE_URL}/health")
+    print(f"X-Request-ID (dibuat server): {response.headers.get('x-request-id')}")
+    print(f"Tracing: {json.dumps(response.json().get('tracing'), indent=2)}")
+    print("-" * 50)
+
 def main():
     """Run all tests"""
     print("Smart Reporting API Test Suite")
@@ -119,12 +335,36 @@ def main():
         # Test classification
         test_classify()
         
+        # Test pre-classifier dengan satu keyword
+        test_classify_single_keyword()
+        
         # Test complete processing
         test_process()
         
+        # Test batch processing
+        test_process_batch()
+        
+        # Test streaming processing
+        test_process_stream()
+        
+        # Test disconnect batch stream
+        test_process_batch_stream_disconnect()
+        
+        # Test asynchronous jobs
+        test_jobs()
+        
+        # Test SSRF callback job
+        test_job_callback_private_host()
+        
         # Test units
         test_units()
         
+        # Test metrics
+        test_metrics()
+        
+        # Test request id dan tracing
+        test_request_id()
+        
         print("\nAll tests completed!")
         
     except requests.exceptions.ConnectionError:
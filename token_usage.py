@@ -0,0 +1,308 @@
+import asyncio
+import contextvars
+import json
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+from database import db_pool
+from metrics import token_budget_exceeded
+
+TOKEN_USAGE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS token_usage (
+        id SERIAL PRIMARY KEY,
+        period_start TIMESTAMP NOT NULL,
+        from_field VARCHAR(255) NOT NULL,
+        type VARCHAR(255) NOT NULL,
+        operation VARCHAR(50) NOT NULL,
+        model VARCHAR(255) NOT NULL,
+        requests INTEGER NOT NULL DEFAULT 0,
+        prompt_tokens BIGINT NOT NULL DEFAULT 0,
+        completion_tokens BIGINT NOT NULL DEFAULT 0,
+        total_tokens BIGINT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (period_start, from_field, type, operation, model)
+    )
+"""
+
+# Beberapa worker bisa mem-flush periode yang sama: jumlahkan, jangan timpa
+TOKEN_USAGE_UPSERT_SQL = """
+    INSERT INTO token_usage (period_start, from_field, type, operation, model, requests, prompt_tokens, completion_tokens, total_tokens)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+    ON CONFLICT (period_start, from_field, type, operation, model) DO UPDATE SET
+        requests = token_usage.requests + EXCLUDED.requests,
+        prompt_tokens = token_usage.prompt_tokens + EXCLUDED.prompt_tokens,
+        completion_tokens = token_usage.completion_tokens + EXCLUDED.completion_tokens,
+        total_tokens = token_usage.total_tokens + EXCLUDED.total_tokens,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# True jika request ArkModel terakhir dalam context ini diturunkan ke cheap_model oleh admit()
+_downgraded: contextvars.ContextVar[bool] = contextvars.ContextVar("token_budget_downgraded", default=False)
+
+def model_downgraded() -> bool:
+    """Hasil dari cheap_model tidak disimpan ke result cache/index near-duplicate milik model utama"""
+    return _downgraded.get()
+
+BUDGET_ACTIONS = ("throttle", "cheap_model")
+# Key budget yang berlaku untuk setiap source tanpa budget sendiri (dihitung per source)
+DEFAULT_BUDGET_KEY = "*"
+
+def parse_budgets(value: str, default_action: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Budget per source dari JSON, mis. {"twitter": 200000, "email": {"tokens": 50000, "action": "cheap_model"}}.
+    Angka saja berarti batas token per jendela dengan action default.
+    """
+    if not value or not value.strip():
+        return {}
+    try:
+        raw = json.loads(value)
+    except ValueError as e:
+        print(f"Invalid TOKEN_BUDGETS, budgets disabled: {e}")
+        return {}
+    
+    budgets = {}
+    for source, budget in raw.items():
+        if not isinstance(budget, dict):
+            budget = {"tokens": budget}
+        action = budget.get("action", default_action)
+        if action not in BUDGET_ACTIONS:
+            print(f"Unknown token budget action '{action}' for source '{source}', using throttle")
+            action = "throttle"
+        budgets[source] = {"tokens": int(budget.get("tokens") or 0), "action": action}
+    return budgets
+
+class TokenUsageTracker:
+    """
+    Pemakaian token ArkModel per from_field/type/operasi/model.
+    Diagregasi in-memory per periode lalu di-flush berkala ke tabel token_usage (upsert),
+    sekaligus menjaga jendela geser per source untuk budget.
+    """
+    
+    def __init__(self, flush_interval: float, period: int, budgets: Dict[str, Dict[str, Any]], budget_window: int, max_wait: float, cheap_model: str):
+        self.flush_interval = flush_interval
+        self.period = max(60, period)
+        self.budgets = budgets
+        self.budget_window = budget_window
+        self.max_wait = max_wait
+        self.cheap_model = cheap_model
+        # (period_start, from_field, type, operation, model) -> [requests, prompt, completion, total]
+        self._pending: Dict[Tuple[int, str, str, str, str], List[int]] = {}
+        # (from_field, type) -> [requests, prompt, completion, total] sejak proses start
+        self._totals: Dict[Tuple[str, str], List[int]] = {}
+        # source -> {menit: total token}, untuk jendela geser budget
+        self._windows: Dict[str, Dict[int, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_failures = 0
+        self.last_flush_error: Optional[str] = None
+        self.throttled = 0
+        self.cheap_model_requests = 0
+        self.rejected = 0
+    
+    async def start(self):
+        """Pastikan tabel ada lalu jalankan flusher"""
+        if self._task is not None or not settings.token_usage_enabled:
+            return
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute(TOKEN_USAGE_TABLE_SQL)
+        except Exception as e:
+            print(f"Error preparing token_usage table: {e}")
+        
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush sisa agregat saat shutdown"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+    
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    def record(self, from_field: Optional[str], type: Optional[str], operation: str, model: str, usage: Dict[str, Any]):
+        """Catat field usage dari satu response ArkModel"""
+        if not settings.token_usage_enabled:
+            return
+        from_field = (from_field or "")[:255]
+        type = (type or "")[:255]
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        total_tokens = int(usage.get("total_tokens") or prompt_tokens + completion_tokens)
+        now = time.time()
+        
+        period_start = int(now // self.period * self.period)
+        for key, aggregates in (
+            ((period_start, from_field, type, operation, model), self._pending),
+            ((from_field, type), self._totals)
+        ):
+            values = aggregates.get(key)
+            if values is None:
+                values = aggregates[key] = [0, 0, 0, 0]
+            values[0] += 1
+            values[1] += prompt_tokens
+            values[2] += completion_tokens
+            values[3] += total_tokens
+        
+        if self._get_budget(from_field) is not None:
+            window = self._windows.setdefault(from_field, {})
+            minute = int(now // 60)
+            window[minute] = window.get(minute, 0) + total_tokens
+    
+    def _get_budget(self, source: str) -> Optional[Dict[str, Any]]:
+        return self.budgets.get(source) or self.budgets.get(DEFAULT_BUDGET_KEY)
+    
+    def window_usage(self, source: str) -> int:
+        """Total token source dalam jendela budget terakhir"""
+        window = self._windows.get(source)
+        if not window:
+            return 0
+        oldest = int(time.time() // 60) - self.budget_window // 60
+        for minute in [minute for minute in window if minute <= oldest]:
+            del window[minute]
+        return sum(window.values())
+    
+    def _over_budget(self, source: str, budget: Dict[str, Any]) -> bool:
+        return budget["tokens"] > 0 and self.window_usage(source) >= budget["tokens"]
+    
+    def _available_at(self, source: str, budget: Dict[str, Any]) -> float:
+        """Waktu (epoch) saat bucket menit tertua yang cukup sudah keluar dari jendela sehingga source di bawah budget"""
+        window = self._windows.get(source) or {}
+        remaining = sum(window.values())
+        for minute in sorted(window):
+            remaining -= window[minute]
+            if remaining < budget["tokens"]:
+                return float((minute + self.budget_window // 60) * 60)
+        return time.time()
+    
+    async def admit(self, payload: Dict[str, Any], from_field: Optional[str]) -> Dict[str, Any]:
+        """
+        Cek budget source sebelum request ke ArkModel. Jika terlampaui: pakai model murah (cheap_model),
+        atau tunggu sampai max_wait lalu raise (throttle) sehingga fallback degraded yang mengambil alih.
+        """
+        _downgraded.set(False)
+        if not self.budgets:
+            return payload
+        source = (from_field or "")[:255]
+        budget = self._get_budget(source)
+        if budget is None or not self._over_budget(source, budget):
+            return payload
+        
+        if budget["action"] == "cheap_model" and self.cheap_model:
+            self.cheap_model_requests += 1
+            token_budget_exceeded.inc(action="cheap_model")
+            _downgraded.set(True)
+            return dict(payload, model=self.cheap_model)
+        
+        self.throttled += 1
+        token_budget_exceeded.inc(action="throttle")
+        deadline = time.time() + self.max_wait
+        # Tunggu hanya jika bucket menit tertua kedaluwarsa sebelum max_wait, selain itu langsung tolak
+        while True:
+            available_at = self._available_at(source, budget)
+            if available_at > deadline:
+                break
+            await asyncio.sleep(max(0.0, available_at - time.time()))
+            if not self._over_budget(source, budget):
+                return payload
+        
+        self.rejected += 1
+        token_budget_exceeded.inc(action="rejected")
+        raise Exception(
+            f"Token budget exceeded for source '{source}' "
+            f"({self.window_usage(source)}/{budget['tokens']} tokens in {self.budget_window}s)"
+        )
+    
+    async def flush(self) -> int:
+        """Tulis agregat yang tertunda ke token_usage; dikembalikan ke buffer jika gagal"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        records = [
+            (datetime.fromtimestamp(period_start), from_field, type, operation, model, *values)
+            for (period_start, from_field, type, operation, model), values in pending.items()
+        ]
+        
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.executemany(TOKEN_USAGE_UPSERT_SQL, records)
+            self.rows_written += len(records)
+            self.last_flush_error = None
+            return len(records)
+        except Exception as e:
+            print(f"Error flushing token usage: {e}")
+            self.flush_failures += 1
+            self.last_flush_error = str(e)[:200]
+            # Gabungkan kembali agar dicoba lagi pada flush berikutnya
+            for key, values in pending.items():
+                current = self._pending.setdefault(key, [0, 0, 0, 0])
+                for i, value in enumerate(values):
+                    current[i] += value
+            return 0
+        finally:
+            self.flushes += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        sources: Dict[str, Dict[str, Any]] = {}
+        for (from_field, type), (requests, prompt_tokens, completion_tokens, total_tokens) in self._totals.items():
+            source = sources.setdefault(from_field, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "types": {}})
+            source["requests"] += requests
+            source["prompt_tokens"] += prompt_tokens
+            source["completion_tokens"] += completion_tokens
+            source["total_tokens"] += total_tokens
+            source["types"][type] = {
+                "requests": requests,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": total_tokens
+            }
+        
+        budgets = {}
+        for source in set(self.budgets) | set(self._windows):
+            budget = self._get_budget(source)
+            if budget is None or source == DEFAULT_BUDGET_KEY:
+                continue
+            used = self.window_usage(source)
+            budgets[source] = {
+                "tokens": budget["tokens"],
+                "used": used,
+                "action": budget["action"],
+                "exceeded": budget["tokens"] > 0 and used >= budget["tokens"]
+            }
+        
+        return {
+            "enabled": settings.token_usage_enabled,
+            "sources": sources,
+            "budgets": budgets,
+            "budget_window": self.budget_window,
+            "throttled": self.throttled,
+            "cheap_model_requests": self.cheap_model_requests,
+            "rejected": self.rejected,
+            "pending_rows": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "flush_failures": self.flush_failures,
+            "last_flush_error": self.last_flush_error
+        }
+
+# Global instance
+token_usage = TokenUsageTracker(
+    flush_interval=settings.token_usage_flush_interval,
+    period=settings.token_usage_period,
+    budgets=parse_budgets(settings.token_budgets, settings.token_budget_action),
+    budget_window=settings.token_budget_window,
+    max_wait=settings.token_budget_max_wait,
+    cheap_model=settings.token_budget_cheap_model
+)
@@ -0,0 +1,409 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from config import settings
+from metrics import RouteLabels
+
+EXPORTERS = ("file", "otlp", "none")
+
+# Nilai enum OTLP (opentelemetry/proto/trace/v1/trace.proto)
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+
+# Request id dari client hanya dipakai jika aman untuk header dan log; selain itu dibuat baru
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+# W3C Trace Context: version-trace_id-parent_id-flags
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+def get_request_id() -> Optional[str]:
+    """Request id (header X-Request-ID) dari request HTTP yang sedang diproses"""
+    return _request_id.get()
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_span_id, sampled) dari header traceparent, None jika tidak valid"""
+    if not value:
+        return None
+    match = TRACEPARENT_PATTERN.match(value.strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class Trace:
+    """Span-span dari satu trace; keputusan export diambil saat root span lokal selesai"""
+    
+    def __init__(self, trace_id: str, forced: bool = False):
+        self.trace_id = trace_id
+        # Parent dari pemanggil (traceparent) sudah memutuskan trace ini disampling
+        self.forced = forced
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+        self.error = False
+        self.finished = False
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_span_id", "name", "kind", "attributes", "start_ns", "end_ns", "status_code", "status_message")
+    
+    def __init__(self, trace: Trace, name: str, parent_span_id: Optional[str], kind: int, attributes: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status_code = STATUS_CODE_UNSET
+        self.status_message: Optional[str] = None
+    
+    def set_name(self, name: str):
+        self.name = name
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def set_error(self, message: str):
+        self.status_code = STATUS_CODE_ERROR
+        self.status_message = message[:500]
+        self.trace.error = True
+    
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+    
+    def to_otlp(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"code": self.status_code}
+        if self.status_message:
+            status["message"] = self.status_message
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": status
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+class _NoopSpan:
+    """Dipakai saat tracing nonaktif agar pemanggil tidak perlu memeriksa"""
+    
+    def set_name(self, name: str):
+        pass
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def set_error(self, message: str):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Tracing ringan per request: span bersarang lewat contextvars, tanpa dependency OpenTelemetry.
+    Trace selalu diekspor jika ada error atau root span >= slow_threshold detik, selebihnya disampling
+    dengan sample_rate. Export berkala dalam format OTLP JSON: ke file (satu request export per baris)
+    atau ke endpoint OTLP/HTTP (mis. OpenTelemetry Collector, Jaeger, Tempo).
+    """
+    
+    def __init__(self, enabled: bool, sample_rate: float, slow_threshold: float, exporter: str, file_path: str,
+                 file_max_bytes: int, otlp_endpoint: str, export_interval: float, max_queue: int, max_spans: int,
+                 service_name: str):
+        if exporter not in EXPORTERS:
+            print(f"Unknown tracing exporter '{exporter}', using none")
+            exporter = "none"
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.exporter = exporter
+        self.file_path = file_path
+        self.file_max_bytes = file_max_bytes
+        self.otlp_endpoint = otlp_endpoint
+        self.export_interval = export_interval
+        self.max_queue = max_queue
+        self.max_spans = max_spans
+        self.service_name = service_name
+        self._rng = random.Random()
+        self._queue: List[Trace] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.traces_started = 0
+        self.traces_sampled_out = 0
+        self.traces_dropped = 0
+        self.traces_exported = 0
+        self.spans_exported = 0
+        self.export_failures = 0
+        self.last_export_error: Optional[str] = None
+    
+    async def start(self):
+        if self._task is not None or not self.enabled or self.exporter == "none":
+            return
+        if self.exporter == "otlp":
+            self._client = httpx.AsyncClient(timeout=10.0)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Ekspor trace yang tersisa saat shutdown"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.export_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    def detach(self):
+        """Untuk task background: span berikutnya menjadi root trace baru, bukan child span pemicu task"""
+        _current_span.set(None)
+    
+    def current_span(self):
+        """Span aktif di context ini (NOOP_SPAN jika tidak ada)"""
+        return _current_span.get() or NOOP_SPAN
+    
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL,
+             remote_parent: Optional[Tuple[str, str, bool]] = None, root: bool = True):
+        """
+        Span di sekitar blok with; menjadi child dari span aktif, atau root trace baru jika tidak ada.
+        remote_parent (dari traceparent) hanya dipakai untuk root. root=False: tanpa span aktif
+        tidak dicatat (operasi kecil yang juga sering dipanggil task background).
+        """
+        parent = _current_span.get() if self.enabled else None
+        is_root = parent is None or parent.trace.finished
+        if not self.enabled or (is_root and not root):
+            yield NOOP_SPAN
+            return
+        
+        if not is_root:
+            trace = parent.trace
+            parent_span_id = parent.span_id
+        elif remote_parent is not None:
+            trace = Trace(remote_parent[0], forced=remote_parent[2])
+            parent_span_id = remote_parent[1]
+        else:
+            trace = Trace(os.urandom(16).hex())
+            parent_span_id = None
+        if is_root:
+            self.traces_started += 1
+        
+        span = Span(trace, name, parent_span_id, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except asyncio.CancelledError:
+            span.set_attribute("cancelled", True)
+            raise
+        except Exception as e:
+            span.set_error(f"{e.__class__.__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            self._end(span, is_root)
+    
+    def traced(self, name: str):
+        """Decorator: fungsi async dijalankan di dalam span bernama name"""
+        def decorator(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await function(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def _end(self, span: Span, is_root: bool):
+        span.end_ns = time.time_ns()
+        trace = span.trace
+        if trace.finished:
+            # Task background yang selesai setelah root span: trace sudah diputuskan
+            return
+        if len(trace.spans) < self.max_spans:
+            trace.spans.append(span)
+        else:
+            trace.dropped_spans += 1
+        if not is_root:
+            return
+        
+        trace.finished = True
+        keep = (
+            trace.forced
+            or trace.error
+            or (self.slow_threshold > 0 and span.duration >= self.slow_threshold)
+            or self._rng.random() < self.sample_rate
+        )
+        if not keep or self.exporter == "none":
+            self.traces_sampled_out += 1
+            return
+        if len(self._queue) >= self.max_queue:
+            self.traces_dropped += 1
+            return
+        if trace.dropped_spans:
+            span.set_attribute("tracing.dropped_spans", trace.dropped_spans)
+        self._queue.append(trace)
+    
+    def _build_export_request(self, traces: List[Trace]) -> Dict[str, Any]:
+        """ExportTraceServiceRequest OTLP dalam encoding JSON"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({
+                    "service.name": self.service_name,
+                    "service.version": settings.app_version
+                })},
+                "scopeSpans": [{
+                    "scope": {"name": "tracing"},
+                    "spans": [span.to_otlp() for trace in traces for span in trace.spans]
+                }]
+            }]
+        }
+    
+    def _append_file(self, line: str):
+        # Rotasi sederhana satu generasi agar file tidak tumbuh tanpa batas
+        if self.file_max_bytes > 0 and os.path.exists(self.file_path) and os.path.getsize(self.file_path) >= self.file_max_bytes:
+            os.replace(self.file_path, self.file_path + ".1")
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    
+    async def flush(self) -> int:
+        """Ekspor trace yang antre, kembalikan jumlah trace yang berhasil diekspor"""
+        if not self._queue:
+            return 0
+        traces, self._queue = self._queue, []
+        request = self._build_export_request(traces)
+        try:
+            if self.exporter == "otlp":
+                response = await self._client.post(self.otlp_endpoint, json=request)
+                response.raise_for_status()
+            else:
+                line = json.dumps(request, ensure_ascii=False, separators=(",", ":"))
+                await asyncio.get_running_loop().run_in_executor(None, self._append_file, line)
+        except Exception as e:
+            print(f"Error exporting traces: {e}")
+            self.export_failures += 1
+            self.last_export_error = str(e)
+            self.traces_dropped += len(traces)
+            return 0
+        
+        self.traces_exported += len(traces)
+        self.spans_exported += sum(len(trace.spans) for trace in traces)
+        self.last_export_error = None
+        return len(traces)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "exporter": self.exporter,
+            "sample_rate": self.sample_rate,
+            "slow_threshold": self.slow_threshold,
+            "traces_started": self.traces_started,
+            "traces_sampled_out": self.traces_sampled_out,
+            "traces_dropped": self.traces_dropped,
+            "traces_exported": self.traces_exported,
+            "spans_exported": self.spans_exported,
+            "queued": len(self._queue),
+            "export_failures": self.export_failures,
+            "last_export_error": self.last_export_error
+        }
+
+# Global instance
+tracer = Tracer(
+    enabled=settings.tracing_enabled,
+    sample_rate=settings.tracing_sample_rate,
+    slow_threshold=settings.tracing_slow_threshold,
+    exporter=settings.tracing_exporter,
+    file_path=settings.tracing_file,
+    file_max_bytes=settings.tracing_file_max_bytes,
+    otlp_endpoint=settings.tracing_otlp_endpoint,
+    export_interval=settings.tracing_export_interval,
+    max_queue=settings.tracing_max_queue,
+    max_spans=settings.tracing_max_spans,
+    service_name=settings.tracing_service_name
+)
+
+class TracingMiddleware:
+    """
+    Middleware ASGI murni: request id per request (header X-Request-ID dari client, atau dibuat baru)
+    yang selalu dikembalikan di response, dan root span per request. Header traceparent dari
+    pemanggil dipakai sebagai parent sehingga trace tersambung dengan sistem pemanggil.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._route_label = RouteLabels()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        remote_parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+        status = [500]
+        
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = dict(message, headers=list(message.get("headers") or []) + [request_id_header])
+            await send(message)
+        
+        method = scope.get("method", "")
+        token = _request_id.set(request_id)
+        try:
+            with tracer.span(method, {"request.id": request_id, "http.request.method": method, "url.path": scope.get("path", "")},
+                             kind=SPAN_KIND_SERVER, remote_parent=remote_parent) as span:
+                try:
+                    await self.app(scope, receive, send_with_request_id)
+                finally:
+                    # Nama span memakai template route (kardinalitas kecil), diketahui setelah routing
+                    route = self._route_label(scope)
+                    span.set_name(f"{method} {route}")
+                    span.set_attribute("http.route", route)
+                    span.set_attribute("http.response.status_code", status[0])
+                    if status[0] >= 500:
+                        span.set_error(f"HTTP {status[0]}")
+        finally:
+            _request_id.reset(token)
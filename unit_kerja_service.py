@@ -1,29 +1,229 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 import asyncio
-from database import get_all_unit_kerja, test_database_connection
+import hashlib
+import time
+from config import settings, FALLBACK_UNIT_KERJA_DATA
+from database import (
+    db_pool,
+    fetch_unit_kerja,
+    test_database_connection,
+    connect_listener,
+    ensure_unit_kerja_notify_trigger,
+    UNIT_KERJA_CHANNEL,
+    POOL_RETRY_INTERVAL
+)
+from metrics import unit_kerja_cache_age
+from tracing import tracer
+
+class UnitCatalog:
+    """
+    Snapshot katalog unit kerja dengan fragmen prompt yang sudah dirender.
+    Dibangun sekali per refresh; versinya adalah hash dari fragmen lengkap.
+    """
+    
+    HEADER = "Unit Kerja yang tersedia:\n"
+    
+    def __init__(self, unit_kerja_dict: Dict[str, Dict[str, Any]]):
+        self.data = unit_kerja_dict
+        # Baris per unit tanpa nomor urut, agar subset hasil routing cukup di-join
+        self.unit_lines = {
+            name: f"{name} ({data['email']}) - {data['description']}\n   Keywords: {', '.join(data['keywords'])}\n"
+            for name, data in unit_kerja_dict.items()
+        }
+        self.prompt_fragment = self.render(list(self.unit_lines.keys()))
+        self.version = hashlib.sha256(self.prompt_fragment.encode("utf-8")).hexdigest()[:16]
+    
+    def render(self, names: Optional[List[str]] = None) -> str:
+        """Fragmen prompt untuk unit yang dipilih (default seluruh katalog), dinomori ulang"""
+        if names is None:
+            return self.prompt_fragment
+        lines = [self.unit_lines[name] for name in names if name in self.unit_lines]
+        return self.HEADER + "".join(f"{i}. {line}" for i, line in enumerate(lines, 1))
 
 class UnitKerjaService:
+    """
+    Cache katalog unit kerja dengan stale-while-revalidate.
+    Data yang sudah kedaluwarsa tetap dikembalikan sementara satu task background me-refresh-nya;
+    jika refresh gagal, data terakhir yang berhasil dimuat tetap dipakai.
+    Setiap worker juga LISTEN ke channel unit_kerja_changed sehingga perubahan tabel
+    langsung me-refresh cache di semua proses.
+    """
+    
     def __init__(self):
         self._unit_kerja_cache = None
         self._cache_timestamp = None
-        self._cache_duration = 300  # 5 minutes cache
+        self._cache_duration = settings.unit_kerja_refresh_interval
+        self._catalog: Optional[UnitCatalog] = None
+        self._fallback_catalog: Optional[UnitCatalog] = None
+        self._refresh_listeners: List[Callable[[Dict[str, Dict[str, Any]]], None]] = []
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_pending = False
+        self._listen_task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        self._trigger_ready = False
+        self.notifications_received = 0
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.consecutive_failures = 0
+        self._last_failure_time: Optional[float] = None
+        self.stale_served = 0
+        self.last_refresh_duration: Optional[float] = None
+        self.last_refresh_error: Optional[str] = None
+    
+    async def start(self):
+        """Muat katalog saat startup agar request pertama tidak menunggu database"""
+        await self._refresh()
+        if settings.unit_kerja_listen_enabled and self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        """Hentikan subscriber LISTEN dan refresh background yang masih berjalan"""
+        for task in (self._listen_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._listen_task = None
+        self._refresh_task = None
+    
+    @property
+    def listening(self) -> bool:
+        """True jika koneksi LISTEN aktif dan trigger NOTIFY terpasang"""
+        return self._listen_conn is not None and self._trigger_ready
+    
+    def get_refresh_interval(self) -> float:
+        """Interval polling; lebih panjang selama perubahan tabel dikabarkan lewat NOTIFY"""
+        if self.listening:
+            return max(self._cache_duration, settings.unit_kerja_listen_refresh_interval)
+        return self._cache_duration
+    
+    def get_cache_age(self) -> Optional[float]:
+        """Detik sejak data terakhir dimuat dari database, None jika belum pernah"""
+        return time.time() - self._cache_timestamp if self._cache_timestamp is not None else None
     
+    def _is_stale(self) -> bool:
+        return self._cache_timestamp is None or (time.time() - self._cache_timestamp) >= self.get_refresh_interval()
+    
+    def get_retry_delay(self) -> float:
+        """Jeda sebelum refresh dicoba lagi; berlipat dua setiap kegagalan berturut-turut"""
+        if self.consecutive_failures == 0:
+            return 0.0
+        delay = settings.unit_kerja_retry_interval * 2 ** (self.consecutive_failures - 1)
+        return min(delay, self.get_refresh_interval())
+    
+    def _backing_off(self) -> bool:
+        """True jika refresh terakhir gagal dan jeda retry belum lewat"""
+        if self._last_failure_time is None or self.consecutive_failures == 0:
+            return False
+        return (time.time() - self._last_failure_time) < self.get_retry_delay()
+    
+    @tracer.traced("UnitKerjaService.get_unit_kerja_data")
     async def get_unit_kerja_data(self, force_refresh: bool = False) -> Dict[str, Dict[str, Any]]:
         """Get unit kerja data with caching"""
-        import time
-        
-        current_time = time.time()
+        span = tracer.current_span()
+        if not force_refresh and self._unit_kerja_cache is not None:
+            if self._cache_timestamp is not None:
+                unit_kerja_cache_age.observe(time.time() - self._cache_timestamp)
+            if self._is_stale():
+                # Kembalikan data lama, refresh cukup dijalankan sekali di background
+                self.stale_served += 1
+                self._schedule_refresh()
+                span.set_attribute("unit_kerja.cache", "stale")
+            else:
+                span.set_attribute("unit_kerja.cache", "hit")
+            return self._unit_kerja_cache
         
-        # Check if cache is valid
-        if (not force_refresh and 
-            self._unit_kerja_cache is not None and 
-            self._cache_timestamp is not None and 
-            (current_time - self._cache_timestamp) < self._cache_duration):
+        span.set_attribute("unit_kerja.cache", "refresh" if force_refresh else "miss")
+        # Selama database gagal, jangan query ulang di setiap request sebelum jeda retry lewat
+        if force_refresh or not self._backing_off():
+            await self._refresh(force=force_refresh)
+        if self._unit_kerja_cache is not None:
             return self._unit_kerja_cache
         
-        try:
-            # Get data from database
-            unit_kerja_list = await get_all_unit_kerja()
+        # Belum pernah berhasil memuat data dari database
+        return FALLBACK_UNIT_KERJA_DATA
+    
+    def _schedule_refresh(self, force: bool = False):
+        if not force and self._backing_off():
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            # Perubahan datang saat refresh berjalan: ulangi setelah refresh ini selesai
+            self._refresh_pending = self._refresh_pending or force
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh(force))
+    
+    async def _background_refresh(self, force: bool):
+        # Refresh ini bisa selesai setelah request pemicunya, jadi dicatat sebagai trace sendiri
+        tracer.detach()
+        await self._refresh(force=force)
+        while self._refresh_pending:
+            self._refresh_pending = False
+            await self._refresh(force=True)
+    
+    async def _listen(self):
+        """Subscriber LISTEN dengan reconnect; notifikasi yang terlewat ditutup dengan satu refresh"""
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = await connect_listener()
+                try:
+                    await ensure_unit_kerja_notify_trigger(conn)
+                    self._trigger_ready = True
+                except Exception as e:
+                    # Tanpa trigger hanya /units/refresh yang dikabarkan; polling tetap interval pendek
+                    print(f"Error installing unit_kerja notify trigger: {e}")
+                    self._trigger_ready = False
+                
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: closed.set())
+                await conn.add_listener(UNIT_KERJA_CHANNEL, self._on_notification)
+                self._listen_conn = conn
+                if connected_before:
+                    self._schedule_refresh(force=True)
+                connected_before = True
+                
+                await closed.wait()
+                print("Unit kerja LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error listening for unit kerja changes: {e}")
+            finally:
+                self._listen_conn = None
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            
+            await asyncio.sleep(POOL_RETRY_INTERVAL)
+    
+    def _on_notification(self, conn, pid: int, channel: str, payload: str):
+        # Abaikan broadcast /units/refresh dari worker ini sendiri (sudah di-refresh)
+        if payload == str(conn.get_server_pid()):
+            return
+        self.notifications_received += 1
+        self._schedule_refresh(force=True)
+    
+    @tracer.traced("UnitKerjaService._refresh")
+    async def _refresh(self, force: bool = False) -> bool:
+        """Muat ulang katalog dari database; hanya satu refresh yang berjalan pada satu waktu"""
+        attempts = self.refresh_count + self.refresh_failures
+        async with self._refresh_lock:
+            # Refresh lain selesai selama menunggu lock: pakai hasilnya, jangan query ulang
+            if not force and self.refresh_count + self.refresh_failures != attempts:
+                return self.consecutive_failures == 0
+            
+            start_time = time.perf_counter()
+            try:
+                unit_kerja_list = await fetch_unit_kerja()
+            except Exception as e:
+                print(f"Error getting unit kerja data: {e}")
+                self.refresh_failures += 1
+                self.consecutive_failures += 1
+                self._last_failure_time = time.time()
+                self.last_refresh_error = str(e)
+                return False
+            finally:
+                self.last_refresh_duration = time.perf_counter() - start_time
             
             # Convert to dictionary format
             unit_kerja_dict = {}
@@ -36,25 +236,50 @@ class UnitKerjaService:
             
             # Update cache
             self._unit_kerja_cache = unit_kerja_dict
-            self._cache_timestamp = current_time
-            
-            return unit_kerja_dict
-            
-        except Exception as e:
-            print(f"Error getting unit kerja data: {e}")
-            # Return fallback data
-            return {
-                "BSrE": {
-                    "email": "aduanbsre@bssn.go.id",
-                    "description": "BSrE merupakan layanan di BSSN yang mengurus tentang sertifikat elektronik dan tanda tangan digital",
-                    "keywords": ["sertifikat elektronik", "tanda tangan digital", "digital signature", "certificate", "enkripsi", "kriptografi"]
-                },
-                "Dalinfo": {
-                    "email": "laporkonten@bssn.go.id",
-                    "description": "Dalinfo merupakan unit kerja yang mengurus tentang berita hoax/disinformasi dan sejenisnya, beberapa pelaporan seputar pelanggaran dimedia sosial dapat dilaporkan",
-                    "keywords": ["hoax", "disinformasi", "misinformasi", "fake news", "media sosial", "pelanggaran", "konten", "berita palsu"]
-                }
-            }
+            self._cache_timestamp = time.time()
+            self._catalog = UnitCatalog(unit_kerja_dict)
+            self.refresh_count += 1
+            self.consecutive_failures = 0
+            self.last_refresh_error = None
+            self._notify_refresh_listeners(unit_kerja_dict)
+            return True
+    
+    def register_refresh_listener(self, listener: Callable[[Dict[str, Dict[str, Any]]], None]):
+        """Daftarkan callback yang dipanggil dengan data baru setiap kali cache di-refresh"""
+        self._refresh_listeners.append(listener)
+        # Bangun langsung jika cache sudah terisi
+        if self._unit_kerja_cache is not None:
+            listener(self._unit_kerja_cache)
+    
+    def _notify_refresh_listeners(self, unit_kerja_dict: Dict[str, Dict[str, Any]]):
+        for listener in self._refresh_listeners:
+            try:
+                listener(unit_kerja_dict)
+            except Exception as e:
+                print(f"Error in unit kerja refresh listener: {e}")
+    
+    async def get_catalog(self) -> UnitCatalog:
+        """Get snapshot katalog beserta fragmen prompt yang sudah dirender"""
+        unit_kerja_dict = await self.get_unit_kerja_data()
+        if self._catalog is not None and unit_kerja_dict is self._unit_kerja_cache:
+            return self._catalog
+        if unit_kerja_dict is FALLBACK_UNIT_KERJA_DATA:
+            return self.get_fallback_catalog()
+        return UnitCatalog(unit_kerja_dict)
+    
+    def get_fallback_catalog(self) -> UnitCatalog:
+        """Katalog dari FALLBACK_UNIT_KERJA_DATA; tidak disimpan di cache, tetapi cukup dirender sekali"""
+        if self._fallback_catalog is None:
+            self._fallback_catalog = UnitCatalog(FALLBACK_UNIT_KERJA_DATA)
+        return self._fallback_catalog
+    
+    def get_cached_catalog(self) -> Optional[UnitCatalog]:
+        """Snapshot katalog terakhir tanpa menyentuh database (None jika belum pernah dimuat)"""
+        return self._catalog
+    
+    async def get_catalog_version(self) -> str:
+        """Get versi katalog unit kerja yang sedang di-cache"""
+        return (await self.get_catalog()).version
     
     async def get_unit_kerja_list(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """Get unit kerja as list"""
@@ -72,8 +297,39 @@ class UnitKerjaService:
         return unit_kerja_list
     
     async def refresh_cache(self):
-        """Force refresh cache"""
-        await self.get_unit_kerja_data(force_refresh=True)
+        """Force refresh cache di worker ini lalu kabarkan ke worker lain lewat NOTIFY"""
+        if not await self._refresh(force=True):
+            raise Exception(f"Refresh failed, keeping last known data: {self.last_refresh_error}")
+        
+        listen_conn = self._listen_conn
+        if listen_conn is None:
+            return
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute("SELECT pg_notify($1, $2)", UNIT_KERJA_CHANNEL, str(listen_conn.get_server_pid()))
+        except Exception as e:
+            print(f"Error broadcasting unit kerja refresh: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Umur cache, durasi refresh terakhir dan jumlah kegagalan refresh"""
+        return {
+            "loaded": self._unit_kerja_cache is not None,
+            "units": len(self._unit_kerja_cache) if self._unit_kerja_cache is not None else 0,
+            "catalog_version": self._catalog.version if self._catalog is not None else None,
+            "cache_age": self.get_cache_age(),
+            "refresh_interval": self.get_refresh_interval(),
+            "listening": self.listening,
+            "notifications_received": self.notifications_received,
+            "stale": self._unit_kerja_cache is not None and self._is_stale(),
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_delay": self.get_retry_delay(),
+            "stale_served": self.stale_served,
+            "last_refresh_duration": self.last_refresh_duration,
+            "last_refresh_error": self.last_refresh_error
+        }
     
     async def test_connection(self) -> bool:
         """Test database connection"""
@@ -0,0 +1,102 @@
+import math
+import re
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from unit_kerja_service import unit_kerja_service
+
+def _tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", (text or "").casefold())
+
+def _features(text: str) -> Dict[str, float]:
+    """Fitur kata utuh ditambah char n-gram (3-5) agar imbuhan seperti ber-/-an tetap cocok"""
+    counts: Dict[str, float] = {}
+    for token in _tokenize(text):
+        counts["w:" + token] = counts.get("w:" + token, 0.0) + 1.0
+        padded = f"#{token}#"
+        for n in (3, 4, 5):
+            for i in range(len(padded) - n + 1):
+                gram = "c:" + padded[i:i + n]
+                counts[gram] = counts.get(gram, 0.0) + 1.0
+    return counts
+
+class UnitSimilarityIndex:
+    """
+    Index TF-IDF lokal atas deskripsi dan keywords unit kerja.
+    Dipakai untuk memilih top-K kandidat unit sehingga prompt klasifikasi tidak memuat seluruh katalog.
+    """
+    
+    # Keywords diulang agar bobotnya lebih besar dari deskripsi panjang
+    KEYWORD_BOOST = 3
+    
+    def __init__(self):
+        self._names: List[str] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._idf: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+    
+    def rebuild(self, unit_kerja_data: Dict[str, Dict[str, Any]]):
+        """Bangun matriks TF-IDF (unit x fitur) dari katalog unit kerja"""
+        names = list(unit_kerja_data.keys())
+        documents = []
+        for name in names:
+            data = unit_kerja_data[name]
+            keywords = " ".join(data.get("keywords", []))
+            documents.append(_features(" ".join([name, data.get("description", "")] + [keywords] * self.KEYWORD_BOOST)))
+        
+        vocabulary: Dict[str, int] = {}
+        for features in documents:
+            for feature in features:
+                vocabulary.setdefault(feature, len(vocabulary))
+        
+        matrix = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+        for row, features in enumerate(documents):
+            for feature, count in features.items():
+                matrix[row, vocabulary[feature]] = 1.0 + math.log(count)
+        
+        document_frequency = (matrix > 0).sum(axis=0)
+        idf = (np.log((1.0 + len(names)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        
+        self._names = names
+        self._vocabulary = vocabulary
+        self._idf = idf
+        self._matrix = matrix
+    
+    @property
+    def ready(self) -> bool:
+        return self._matrix is not None and len(self._names) > 0
+    
+    def rank(self, content: str) -> List[Tuple[str, float]]:
+        """Skor cosine similarity konten terhadap setiap unit, diurutkan dari tertinggi"""
+        if not self.ready:
+            return []
+        
+        query = np.zeros(len(self._vocabulary), dtype=np.float32)
+        for feature, count in _features(content).items():
+            column = self._vocabulary.get(feature)
+            if column is not None:
+                query[column] = 1.0 + math.log(count)
+        query *= self._idf
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        
+        scores = self._matrix @ (query / norm)
+        order = np.argsort(-scores)
+        return [(self._names[i], float(scores[i])) for i in order]
+    
+    def select_candidates(self, content: str, top_k: int, min_score: float) -> Optional[List[str]]:
+        """
+        Nama unit top-K dengan skor >= min_score.
+        None berarti routing tidak yakin (tidak ada unit yang lolos), sehingga seluruh katalog dipakai.
+        """
+        ranked = [(name, score) for name, score in self.rank(content)[:top_k] if score >= min_score]
+        if not ranked:
+            return None
+        return [name for name, _ in ranked]
+
+# Global instance
+unit_similarity_index = UnitSimilarityIndex()
+unit_kerja_service.register_refresh_listener(unit_similarity_index.rebuild)
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import math
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+from database import db_pool
+from models import ExtractionResult, ClassificationResult
+
+RAW_DATA_COLUMNS = ["content", "language", "from_field", "type"]
+
+LOG_DATA_COLUMNS = ["action", "status"]
+
+EXTRACTION_DATA_COLUMNS = [
+    "content", "language", "from_field", "type",
+    "topic", "sentiment", "sentiment_score", "emotions", "entities", "locations", "hashtags", "summary",
+    "recommended_unit_name", "recommended_unit_email", "recommended_unit_desc",
+    "recommended_unit_confidence", "recommended_unit_match_key", "alternative_units",
+    "classification_reason", "processing_time"
+]
+
+TABLE_COLUMNS = {
+    "raw_data": RAW_DATA_COLUMNS,
+    "log_data": LOG_DATA_COLUMNS,
+    "extraction_data": EXTRACTION_DATA_COLUMNS
+}
+
+# Batas kolom NUMERIC(5, 4) (sentiment_score, recommended_unit_confidence)
+SCORE_LIMIT = 9.9999
+
+# Penanda berhenti untuk flusher
+_STOP = object()
+
+class WriteBehindBuffer:
+    """
+    Antrean in-process untuk menulis hasil ke database di luar jalur response.
+    Record di-flush per batch dengan COPY saat jumlahnya mencapai batas atau interval habis.
+    Jika COPY batch gagal, record ditulis ulang per tabel lalu per record sehingga hanya
+    record yang ditolak database yang dibuang.
+    """
+    
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_duration = 0.0
+    
+    async def start(self):
+        """Jalankan flusher saat startup aplikasi"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush semua record yang tersisa saat shutdown"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+    
+    def enqueue(self, table: str, record: Tuple) -> bool:
+        """Tambahkan record tanpa menunggu; record dibuang jika antrean penuh (backpressure)"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((table, record))
+            self.enqueued += 1
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._flush(batch)
+        
+        # Kosongkan sisa antrean sebelum berhenti
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+    
+    async def _flush(self, batch: List[Tuple[str, Tuple]]):
+        """Tulis satu batch, dikelompokkan per tabel"""
+        start_time = time.perf_counter()
+        grouped: Dict[str, List[Tuple]] = {}
+        for table, record in batch:
+            grouped.setdefault(table, []).append(record)
+        
+        try:
+            async with db_pool.acquire() as conn:
+                try:
+                    async with conn.transaction():
+                        for table, records in grouped.items():
+                            await self._copy(conn, table, records)
+                    self.written += len(batch)
+                except Exception as e:
+                    print(f"Error flushing write-behind batch, retrying per table: {e}")
+                    for table, records in grouped.items():
+                        await self._flush_table(conn, table, records)
+        except Exception as e:
+            # Database tidak tersedia: seluruh batch gagal
+            print(f"Error flushing write-behind buffer: {e}")
+            self.failed += len(batch)
+        finally:
+            self.flushes += 1
+            self.last_flush_duration = time.perf_counter() - start_time
+    
+    async def _copy(self, conn, table: str, records: List[Tuple]):
+        await conn.copy_records_to_table(table, records=records, columns=TABLE_COLUMNS[table])
+    
+    async def _flush_table(self, conn, table: str, records: List[Tuple]):
+        """Tulis satu tabel; jika gagal, tulis per record dan buang hanya record yang ditolak"""
+        try:
+            await self._copy(conn, table, records)
+            self.written += len(records)
+            return
+        except Exception as e:
+            if len(records) == 1:
+                print(f"Error writing {table} record, dropped: {e}")
+                self.failed += 1
+                return
+        for record in records:
+            await self._flush_table(conn, table, [record])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.persist_enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_duration": self.last_flush_duration
+        }
+
+# Global instance
+write_behind = WriteBehindBuffer(
+    max_queue_size=settings.persist_queue_max_size,
+    batch_size=settings.persist_batch_size,
+    flush_interval=settings.persist_flush_interval
+)
+
+def _truncate(value: Optional[str], length: int) -> Optional[str]:
+    return value[:length] if value is not None else None
+
+def _score(value: Optional[float]) -> Optional[float]:
+    """Skor dari output ArkModel disesuaikan dengan NUMERIC(5, 4); NaN/inf disimpan sebagai NULL"""
+    if value is None or not math.isfinite(value):
+        return None
+    return round(max(-SCORE_LIMIT, min(SCORE_LIMIT, value)), 4)
+
+def _extraction_columns(extraction: Optional[ExtractionResult]) -> Tuple:
+    if extraction is None:
+        return (None,) * 8
+    return (
+        extraction.topic,
+        _truncate(extraction.sentiment, 100),
+        _score(extraction.sentiment_score),
+        [json.dumps(emotion.dict(), ensure_ascii=False) for emotion in extraction.emotions],
+        [json.dumps(entity.dict(), ensure_ascii=False) for entity in extraction.entities],
+        extraction.locations,
+        extraction.hashtags,
+        extraction.summary
+    )
+
+def _classification_columns(classification: Optional[ClassificationResult]) -> Tuple:
+    if classification is None:
+        return (None,) * 7
+    recommended = classification.recommended_unit
+    return (
+        _truncate(recommended.name, 255),
+        _truncate(recommended.email, 100),
+        recommended.description,
+        _score(recommended.confidence),
+        recommended.matched_keywords,
+        [json.dumps(unit.dict(), ensure_ascii=False) for unit in classification.alternative_units],
+        classification.classification_reason
+    )
+
+def persist_result(action: str, content: str, language: str = "id", from_field: str = None, type: str = None,
+                   extraction: Optional[ExtractionResult] = None, classification: Optional[ClassificationResult] = None,
+                   processing_time: Optional[float] = None, error: Optional[str] = None):
+    """Antrekan raw_data, extraction_data dan log_data untuk satu request yang diproses"""
+    if not settings.persist_enabled:
+        return
+    
+    # Sesuaikan dengan panjang kolom (kolom hasil ArkModel disesuaikan di _extraction_columns dan
+    # _classification_columns); record lain yang tetap ditolak dibuang sendiri, bukan seluruh batch
+    language = (language or "id")[:10]
+    from_field = (from_field or "")[:255]
+    type = (type or "")[:255]
+    
+    write_behind.enqueue("raw_data", (content, language, from_field, type))
+    if extraction is not None or classification is not None:
+        write_behind.enqueue(
+            "extraction_data",
+            (content, language, from_field, type)
+            + _extraction_columns(extraction)
+            + _classification_columns(classification)
+            + (processing_time,)
+        )
+    status = "success" if error is None else f"error: {error}"[:100]
+    write_behind.enqueue("log_data", (action, status))